@@ -5,6 +5,7 @@ from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from app.services.ckan_service import ckan_service
 from app.db.supabase import supabase_service
+from app.services.company_suggest import company_suggest_service
 
 def get_ckan_service():
     """
@@ -24,6 +25,16 @@ def get_supabase_service():
     """
     return supabase_service
 
+def get_suggest_service():
+    """
+    Dependency to get the company suggestion service.
+    
+    Returns:
+        The company suggestion service instance
+    """
+    return company_suggest_service
+
 # Define annotated dependencies for use in route handlers
 CKANService = Annotated[type(ckan_service), Depends(get_ckan_service)]
-SupabaseService = Annotated[type(supabase_service), Depends(get_supabase_service)] 
\ No newline at end of file
+SupabaseService = Annotated[type(supabase_service), Depends(get_supabase_service)]
+SuggestService = Annotated[type(company_suggest_service), Depends(get_suggest_service)]
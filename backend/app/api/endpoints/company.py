@@ -1,35 +1,80 @@
 """
 Company details endpoints for the API.
 """
-from fastapi import APIRouter, Path, HTTPException, Depends, Request, Response
-from app.api.dependencies import CKANService, SupabaseService
+from fastapi import APIRouter, BackgroundTasks, Path, HTTPException, Depends, Request, Response
+from app.api.dependencies import CKANService, SupabaseService, SuggestService
+from app.core.config import settings
 from app.models.company import CompanyResponse, SearchHistoryItem
+from app.services.ckan_client import CKANUnavailableError
+from app.services import ckan_fields
 from datetime import datetime
+import asyncio
 import json
 
 router = APIRouter()
 
+def _section_result(tasks, done, name):
+    """
+    Get the result of a concurrently fetched company section.
+    
+    Re-raises the lookup's own exception, or a TimeoutError if the lookup
+    did not finish before the overall deadline, so each section can keep
+    handling its failure on its own.
+    """
+    task = tasks[name]
+    if task not in done:
+        raise TimeoutError(f"{name} lookup did not finish within {settings.COMPANY_DETAILS_TIMEOUT}s")
+    return task.result()
+
 @router.get("/company/{reg_number}", response_model=CompanyResponse)
 async def get_company_details(
     request: Request,
     response: Response,
+    background_tasks: BackgroundTasks,
     reg_number: str = Path(..., description="Company registration number"),
     ckan_service: CKANService = None,
     supabase_service: SupabaseService = None,
+    suggest_service: SuggestService = None,
 ):
     """
     Get detailed information for a specific company.
     """
     try:
+        # Malformed and recently unknown numbers are answered without any lookups
+        if await ckan_service.is_known_missing(reg_number):
+            raise HTTPException(status_code=404, detail=f"Company with registration number {reg_number} not found")
+        
+        # Run all independent lookups concurrently under one overall deadline
+        tasks = {
+            "registry": asyncio.create_task(ckan_service.get_company_by_reg_number(reg_number, fields=ckan_fields.REGISTRY_FIELDS)),
+            "supabase": asyncio.create_task(asyncio.to_thread(supabase_service.get_company_data, reg_number)),
+            "capital": asyncio.create_task(ckan_service.get_company_capital_data(reg_number, fields=ckan_fields.CAPITAL_FIELDS)),
+            "beneficiaries": asyncio.create_task(ckan_service.get_company_beneficiaries(reg_number, fields=ckan_fields.BENEFICIARY_FIELDS)),
+            "members": asyncio.create_task(ckan_service.get_company_members(reg_number, fields=ckan_fields.MEMBER_FIELDS)),
+            "business": asyncio.create_task(ckan_service.get_company_business_data(reg_number, fields=ckan_fields.BUSINESS_FIELDS)),
+            "liquidation": asyncio.create_task(ckan_service.get_company_liquidation_data(reg_number, fields=ckan_fields.LIQUIDATION_FIELDS)),
+            "officers": asyncio.create_task(ckan_service.get_company_officers(reg_number, fields=ckan_fields.OFFICER_FIELDS)),
+            "stockholders": asyncio.create_task(ckan_service.get_company_stockholders(reg_number, fields=ckan_fields.STOCKHOLDER_FIELDS)),
+            "taxpayer_ratings": asyncio.create_task(ckan_service.get_taxpayer_ratings(reg_number, fields=ckan_fields.TAXPAYER_RATING_FIELDS)),
+        }
+        done, pending = await asyncio.wait(tasks.values(), timeout=settings.COMPANY_DETAILS_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        
         # Get company details from CKAN API
-        record = ckan_service.get_company_by_reg_number(reg_number)
+        try:
+            record = _section_result(tasks, done, "registry")
+        except TimeoutError as timeout_error:
+            raise HTTPException(status_code=504, detail=f"Timed out getting company details: {timeout_error}")
+        except CKANUnavailableError as unavailable_error:
+            raise HTTPException(status_code=503, detail=f"Company registry is temporarily unavailable: {unavailable_error}")
         
         if not record:
             raise HTTPException(status_code=404, detail=f"Company with registration number {reg_number} not found")
         
         # Try to get supplementary data from Supabase
         try:
-            supabase_data = supabase_service.get_company_data(reg_number)
+            supabase_data = _section_result(tasks, done, "supabase")
             # Merge data if available
             if supabase_data:
                 # Update only the fields that exist in Supabase data
@@ -43,7 +88,7 @@ async def get_company_details(
         # Get company capital data from second CKAN resource
         capital_data = []
         try:
-            capital_records = ckan_service.get_company_capital_data(reg_number)
+            capital_records = _section_result(tasks, done, "capital")
             # Convert all capital records to have string values
             for capital_record in capital_records:
                 capital_record_clean = {}
@@ -61,7 +106,7 @@ async def get_company_details(
         # Get company beneficial owners from third CKAN resource
         beneficiary_data = []
         try:
-            beneficiary_records = ckan_service.get_company_beneficiaries(reg_number)
+            beneficiary_records = _section_result(tasks, done, "beneficiaries")
             # Convert all beneficiary records to have string values
             for beneficiary_record in beneficiary_records:
                 beneficiary_record_clean = {}
@@ -79,7 +124,7 @@ async def get_company_details(
         # Get company members data from fourth CKAN resource
         members_data = []
         try:
-            members_records = ckan_service.get_company_members(reg_number)
+            members_records = _section_result(tasks, done, "members")
             # Convert all members records to have string values
             for member_record in members_records:
                 member_record_clean = {}
@@ -97,7 +142,7 @@ async def get_company_details(
         # Get company business activity data from fifth CKAN resource
         business_data = []
         try:
-            business_records = ckan_service.get_company_business_data(reg_number)
+            business_records = _section_result(tasks, done, "business")
             # Convert all business records to have string values
             for business_record in business_records:
                 business_record_clean = {}
@@ -116,7 +161,7 @@ async def get_company_details(
         liquidation_data = []
         has_liquidation_process = False
         try:
-            liquidation_records = ckan_service.get_company_liquidation_data(reg_number)
+            liquidation_records = _section_result(tasks, done, "liquidation")
             # Convert all liquidation records to have string values
             for liquidation_record in liquidation_records:
                 liquidation_record_clean = {}
@@ -138,7 +183,7 @@ async def get_company_details(
         # Get company officers data from seventh CKAN resource
         officers_data = []
         try:
-            officers_records = ckan_service.get_company_officers(reg_number)
+            officers_records = _section_result(tasks, done, "officers")
             # Convert all officers records to have string values
             for officer_record in officers_records:
                 officer_record_clean = {}
@@ -156,7 +201,7 @@ async def get_company_details(
         # Get company stockholders data from eighth CKAN resource
         stockholders_data = []
         try:
-            stockholders_records = ckan_service.get_company_stockholders(reg_number)
+            stockholders_records = _section_result(tasks, done, "stockholders")
             # Convert all stockholders records to have string values
             for stockholder_record in stockholders_records:
                 stockholder_record_clean = {}
@@ -174,7 +219,7 @@ async def get_company_details(
         # Get taxpayer ratings data from ninth CKAN resource
         taxpayer_ratings = []
         try:
-            rating_records = ckan_service.get_taxpayer_ratings(reg_number)
+            rating_records = _section_result(tasks, done, "taxpayer_ratings")
             # Convert all rating records to TaxpayerRatingData objects
             for rating_record in rating_records:
                 from app.models.company import TaxpayerRatingData
@@ -201,6 +246,9 @@ async def get_company_details(
             # Log the error but continue
             print(f"Error checking company type: {type_error}")
         
+        # Count the view towards the company's typeahead popularity
+        background_tasks.add_task(suggest_service.record_view, reg_number)
+        
         # Store search in history cookie
         company_name = record.get("name", "")
         try:
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Path, HTTPException, Query
 from typing import Optional
+import asyncio
+from app.core.config import settings
+from app.db.health_scores import health_score_store
 from app.services.ckan_service import ckan_service
+from app.services.ckan_fields import HEALTH_SCORE_FIELDS, TAXPAYER_RATING_FIELDS
 from app.services.financial_analysis import financial_analysis_service
-from app.models.financial import BalanceSheet, IncomeStatement, CashFlowStatement, FinancialHealthAssessment
+from app.services.financial_batch import HEALTH_SCORE_YEARS, scoring_version
+from app.services.financial_trends import trend_engine
+from app.services.industry_benchmarks import industry_benchmark_service, nace_code, statement_ratios
+from app.models.financial import BalanceSheet, IncomeStatement, CashFlowStatement, FinancialHealthAssessment, FinancialTrendsResponse, IndustryBenchmarksResponse
 
 router = APIRouter()
 
@@ -13,13 +20,17 @@ async def get_financial_statements(
 ):
     """Get comprehensive financial statements for a company."""
     try:
+        # Fetch the annual report list once and share it with every statement fetcher
+        statement_index = await ckan_service.get_financial_statement_index(reg_number)
         if year:
-            balance_sheets = ckan_service.get_balance_sheets(reg_number, year)
-            income_statements = ckan_service.get_income_statements(reg_number, year)
-            cash_flows = ckan_service.get_cash_flow_statements(reg_number, year)
-            statements_info = [stmt for stmt in ckan_service.get_financial_statements(reg_number) if stmt.get("year") == year]
+            balance_sheets, income_statements, cash_flows = await asyncio.gather(
+                ckan_service.get_balance_sheets(reg_number, year, statement_index),
+                ckan_service.get_income_statements(reg_number, year, statement_index),
+                ckan_service.get_cash_flow_statements(reg_number, year, statement_index)
+            )
+            statements_info = statement_index.for_year(year)
         else:
-            multi_year_data = ckan_service.get_multi_year_financial_data(reg_number)
+            multi_year_data = await ckan_service.get_multi_year_financial_data(reg_number, statement_index=statement_index)
             balance_sheets = multi_year_data.get("balance_sheets", [])
             income_statements = multi_year_data.get("income_statements", [])
             cash_flows = multi_year_data.get("cash_flows", [])
@@ -58,7 +69,7 @@ async def get_balance_sheet_data(
 ):
     """Get balance sheet data for a company."""
     try:
-        balance_sheets = ckan_service.get_balance_sheets(reg_number, year)
+        balance_sheets = await ckan_service.get_balance_sheets(reg_number, year)
         
         if not balance_sheets:
             raise HTTPException(status_code=404, detail=f"No balance sheet data found for company {reg_number}")
@@ -82,7 +93,7 @@ async def get_income_statement_data(
 ):
     """Get income statement data for a company."""
     try:
-        income_statements = ckan_service.get_income_statements(reg_number, year)
+        income_statements = await ckan_service.get_income_statements(reg_number, year)
         
         if not income_statements:
             raise HTTPException(status_code=404, detail=f"No income statement data found for company {reg_number}")
@@ -106,7 +117,7 @@ async def get_cash_flow_data(
 ):
     """Get cash flow statement data for a company."""
     try:
-        cash_flows = ckan_service.get_cash_flow_statements(reg_number, year)
+        cash_flows = await ckan_service.get_cash_flow_statements(reg_number, year)
         
         if not cash_flows:
             raise HTTPException(status_code=404, detail=f"No cash flow data found for company {reg_number}")
@@ -127,7 +138,7 @@ async def get_cash_flow_data(
 async def test_financial_data(reg_number: str):
     """Simple test endpoint to check if financial data exists."""
     try:
-        statements = ckan_service.get_financial_statements(reg_number)
+        statements = await ckan_service.get_financial_statements(reg_number)
         return {
             "registration_number": reg_number,
             "message": "Financial endpoint working!",
@@ -148,10 +159,13 @@ async def debug_financial_data(reg_number: str):
         print(f"\n🔍 DEBUG: Checking financial data for {reg_number}")
         
         # Get raw data from all sources
-        balance_sheets = ckan_service.get_balance_sheets(reg_number)
-        income_statements = ckan_service.get_income_statements(reg_number)
-        cash_flows = ckan_service.get_cash_flow_statements(reg_number)
-        statements_info = ckan_service.get_financial_statements(reg_number)
+        statement_index = await ckan_service.get_financial_statement_index(reg_number)
+        balance_sheets, income_statements, cash_flows = await asyncio.gather(
+            ckan_service.get_balance_sheets(reg_number, statement_index=statement_index),
+            ckan_service.get_income_statements(reg_number, statement_index=statement_index),
+            ckan_service.get_cash_flow_statements(reg_number, statement_index=statement_index)
+        )
+        statements_info = statement_index.statements
         
         # Debug output
         debug_info = {
@@ -199,15 +213,24 @@ async def get_company_health_score(
 ):
     """Get comprehensive financial health score including taxpayer ratings."""
     try:
-        # Get financial data
-        multi_year_data = ckan_service.get_multi_year_financial_data(reg_number, years)
+        # Answer from the materialized scores, computed over the default number of years
+        if settings.HEALTH_SCORES_ENABLED and years == HEALTH_SCORE_YEARS:
+            try:
+                stored = await asyncio.to_thread(health_score_store.get, reg_number, scoring_version())
+                if stored is not None:
+                    return stored
+            except Exception as e:
+                print(f"Error reading materialized health scores: {e}")
+        
+        # Get financial data and taxpayer ratings
+        multi_year_data, taxpayer_ratings = await asyncio.gather(
+            ckan_service.get_multi_year_financial_data(reg_number, years, fields=HEALTH_SCORE_FIELDS),
+            ckan_service.get_taxpayer_ratings(reg_number, fields=TAXPAYER_RATING_FIELDS)
+        )
         balance_sheets_data = multi_year_data.get("balance_sheets", [])
         income_statements_data = multi_year_data.get("income_statements", [])
         cash_flows_data = multi_year_data.get("cash_flows", [])
         
-        # Get taxpayer ratings
-        taxpayer_ratings = ckan_service.get_taxpayer_ratings(reg_number)
-        
         if not balance_sheets_data or not income_statements_data:
             raise HTTPException(status_code=404, detail=f"Insufficient financial data for health assessment of company {reg_number}")
         
@@ -232,3 +255,84 @@ async def get_company_health_score(
     except Exception as e:
         print(f"Health score calculation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error calculating health score: {str(e)}")
+
+
+@router.get("/financial/{reg_number}/trends", response_model=FinancialTrendsResponse)
+async def get_financial_trends(
+    reg_number: str = Path(..., description="Company registration number"),
+    years: Optional[int] = Query(5, description="Number of years to analyze")
+):
+    """Get multi-year revenue, profit and asset growth, volatility and trend directions."""
+    try:
+        multi_year_data = await ckan_service.get_multi_year_financial_data(reg_number, years, fields=HEALTH_SCORE_FIELDS)
+        balance_sheets = [BalanceSheet(**sheet) for sheet in multi_year_data.get("balance_sheets", [])]
+        income_statements = [IncomeStatement(**stmt) for stmt in multi_year_data.get("income_statements", [])]
+
+        trends = trend_engine.from_statements(balance_sheets, income_statements).company_trends()
+        if not trends["years_analyzed"]:
+            raise HTTPException(status_code=404, detail=f"Insufficient financial data for trend analysis of company {reg_number}")
+
+        ratios_by_year = financial_analysis_service.calculate_multi_year_ratios(balance_sheets, income_statements)
+        ratios_trend = [
+            {"year": year, **ratios_by_year[year].model_dump(exclude_none=True)}
+            for year in trends["years_analyzed"]
+        ]
+
+        return FinancialTrendsResponse(registration_number=reg_number, ratios_trend=ratios_trend, **trends)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Financial trends error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error calculating financial trends: {str(e)}")
+
+
+@router.get("/financial/{reg_number}/benchmarks", response_model=IndustryBenchmarksResponse)
+async def get_industry_benchmarks(
+    reg_number: str = Path(..., description="Company registration number"),
+    year: Optional[int] = Query(None, description="Financial year (default: latest with statements)")
+):
+    """Compare a company's financial ratios with its industry's distribution in the same year."""
+    try:
+        if not industry_benchmark_service.is_ready():
+            raise HTTPException(status_code=503, detail="Industry benchmarks have not been built")
+
+        if year:
+            statement_index = await ckan_service.get_financial_statement_index(reg_number)
+            balance_sheets, income_statements, business_data = await asyncio.gather(
+                ckan_service.get_balance_sheets(reg_number, year, statement_index),
+                ckan_service.get_income_statements(reg_number, year, statement_index),
+                ckan_service.get_company_business_data(reg_number)
+            )
+        else:
+            multi_year_data, business_data = await asyncio.gather(
+                ckan_service.get_multi_year_financial_data(reg_number, fields=HEALTH_SCORE_FIELDS),
+                ckan_service.get_company_business_data(reg_number)
+            )
+            balance_sheets = multi_year_data.get("balance_sheets", [])
+            income_statements = multi_year_data.get("income_statements", [])
+
+        # Benchmark the latest year having both statements
+        years = {sheet.get("year") for sheet in balance_sheets} & {stmt.get("year") for stmt in income_statements}
+        years.discard(None)
+        if not years:
+            raise HTTPException(status_code=404, detail=f"Insufficient financial data for benchmarking company {reg_number}")
+        year = max(years)
+
+        balance_sheet = next(sheet for sheet in balance_sheets if sheet.get("year") == year)
+        income_statement = next(stmt for stmt in income_statements if stmt.get("year") == year)
+        code = nace_code(business_data)
+        benchmarks = industry_benchmark_service.benchmarks(code, year, statement_ratios(balance_sheet, income_statement))
+
+        return IndustryBenchmarksResponse(
+            registration_number=reg_number,
+            nace_code=code,
+            year=year,
+            benchmarks=benchmarks
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Industry benchmark error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error calculating industry benchmarks: {str(e)}")
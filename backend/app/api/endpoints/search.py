@@ -1,26 +1,47 @@
 """
 Search endpoints for the API.
 """
+from typing import List
 from fastapi import APIRouter, Query, HTTPException
-from app.api.dependencies import CKANService, SupabaseService
-from app.models.company import CompanySearch, CompanyListResponse, CompanyResponse
+from app.api.dependencies import CKANService, SupabaseService, SuggestService
+from app.models.company import CompanySearch, CompanyListResponse, CompanyResponse, CompanySuggestResponse, CompanySuggestion
+from app.services.ckan_client import CKANUnavailableError
+from app.services.ckan_fields import REGISTRY_FIELDS
 
 router = APIRouter()
 
 @router.get("/search", response_model=CompanyListResponse)
 async def search_companies(
-    q: str = Query(..., description="Search query"),
+    q: str = Query(None, description="Search query; optional with a filter or facets"),
     limit: int = Query(10, description="Maximum number of results to return"),
     offset: int = Query(0, description="Offset for pagination"),
+    fuzzy: bool = Query(True, description="Tolerate misspelled words"),
+    region: List[str] = Query(None, description="Only companies in these regions"),
+    type: List[str] = Query(None, description="Only companies of these types, e.g. SIA"),
+    regtype: List[str] = Query(None, description="Only companies in these registers"),
+    status: List[str] = Query(None, description="Only active, terminated or closed companies"),
+    facets: bool = Query(False, description="Count the results per region, type, register and status"),
+    cursor: str = Query(None, description="next_cursor of the previous page; replaces offset"),
     ckan_service: CKANService = None,
     supabase_service: SupabaseService = None,
 ):
     """
     Search for companies by name, registration number, etc.
+    
+    Repeat a filter parameter to accept several values; different filters
+    must all match. To page, pass the previous response's next_cursor
+    together with the same query and filters. The query may only be left
+    out when filtering or counting facets.
     """
+    filters = {"region": region, "type": type, "regtype": regtype, "status": status}
+    q = (q or "").strip()
+    if not q and not facets and not any(filters.values()):
+        raise HTTPException(status_code=422, detail="A search query, a filter or facets=true is required")
     try:
         # Search using CKAN API
-        result = ckan_service.search_companies(q, limit, offset)
+        result = await ckan_service.search_companies(
+            q, limit, offset, fields=REGISTRY_FIELDS, fuzzy=fuzzy, filters=filters, facets=facets, cursor=cursor
+        )
         
         # Process the response into our model
         records = result.get("records", [])
@@ -73,11 +94,42 @@ async def search_companies(
                 print(f"Validation error for record: {validation_error}")
                 # Continue without this record
         
-        return CompanyListResponse(count=total, companies=companies)
+        return CompanyListResponse(
+            count=total,
+            companies=companies,
+            facets=result.get("facets"),
+            facets_partial=result.get("facets_partial"),
+            next_cursor=result.get("next_cursor")
+        )
+    except CKANUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Company registry is temporarily unavailable: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Print detailed error for debugging
         import traceback
         print(f"Search error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error searching companies: {str(e)}")
- 
\ No newline at end of file
+ 
+
+@router.get("/suggest", response_model=CompanySuggestResponse)
+async def suggest_companies(
+    q: str = Query(..., description="Partial company name or registration number"),
+    limit: int = Query(10, description="Maximum number of suggestions to return"),
+    suggest_service: SuggestService = None,
+):
+    """
+    Suggest companies while the user types, most popular first.
+    """
+    try:
+        records = await suggest_service.suggest(q, limit)
+        return CompanySuggestResponse(suggestions=[
+            CompanySuggestion(registration_number=str(record.get("regcode", "")), name=str(record.get("name") or ""))
+            for record in records
+        ])
+    except CKANUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Company registry is temporarily unavailable: {str(e)}")
+    except Exception as e:
+        print(f"Suggest error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error suggesting companies: {str(e)}")
@@ -17,6 +17,73 @@ class Settings(BaseSettings):
     CKAN_COMPANY_RESOURCE_ID: str = os.getenv("CKAN_COMPANY_RESOURCE_ID", 
                                             os.getenv("CKAN_RESOURCE_ID", "25e80bf3-f107-4ab4-89ef-251b5b9374e9"))
     
+    # HTTP client settings (timeout in seconds, pool sizes per worker process)
+    CKAN_TIMEOUT: float = float(os.getenv("CKAN_TIMEOUT", "10"))
+    CKAN_MAX_CONNECTIONS: int = int(os.getenv("CKAN_MAX_CONNECTIONS", "100"))
+    CKAN_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("CKAN_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    # Outbound scheduling: request rate (per second), AIMD concurrency limit, and the
+    # share of that limit background jobs must leave to interactive requests
+    CKAN_RATE_LIMIT: float = float(os.getenv("CKAN_RATE_LIMIT", "20"))
+    CKAN_RATE_BURST: int = int(os.getenv("CKAN_RATE_BURST", "40"))
+    CKAN_CONCURRENCY_INITIAL: int = int(os.getenv("CKAN_CONCURRENCY_INITIAL", "10"))
+    CKAN_CONCURRENCY_MAX: int = int(os.getenv("CKAN_CONCURRENCY_MAX", "50"))
+    CKAN_INTERACTIVE_RESERVE: float = float(os.getenv("CKAN_INTERACTIVE_RESERVE", "0.25"))
+    # Request rate (per second) of the standalone mirror ingest and sync jobs
+    CKAN_JOB_RATE_LIMIT: float = float(os.getenv("CKAN_JOB_RATE_LIMIT", "5"))
+    # Request rate (per second) of all API workers and jobs together, shared through
+    # Redis when REDIS_URL is set (0 disables). Without Redis the limits and priority
+    # classes above only apply within each process, and only the separate job rate
+    # keeps bulk jobs from crowding out the API workers
+    CKAN_SHARED_RATE_LIMIT: float = float(os.getenv("CKAN_SHARED_RATE_LIMIT", "20"))
+    # Records per datastore_search page when reading every matching row
+    CKAN_PAGE_SIZE: int = int(os.getenv("CKAN_PAGE_SIZE", "1000"))
+    # Data source: "live" queries the CKAN API, "mirror" answers from the local mirror
+    CKAN_MODE: str = os.getenv("CKAN_MODE", "live")
+    CKAN_MIRROR_PATH: str = os.getenv("CKAN_MIRROR_PATH", "data/ckan_mirror.sqlite3")
+    # Days the mirror sync keeps its records of which companies changed
+    MIRROR_CHANGE_RETENTION_DAYS: float = float(os.getenv("MIRROR_CHANGE_RETENTION_DAYS", "30"))
+    # Local full-text index answering /api/search
+    SEARCH_INDEX_ENABLED: bool = os.getenv("SEARCH_INDEX_ENABLED", "True").lower() in ("true", "1", "t")
+    SEARCH_INDEX_PATH: str = os.getenv("SEARCH_INDEX_PATH", "data/company_search.sqlite3")
+    # Matches ranked per query at a time; deeper pages rank the next ones after the last served
+    SEARCH_RANK_TOP_N: int = int(os.getenv("SEARCH_RANK_TOP_N", "200"))
+    # Best text matches facet counts are taken over; a query with more reports partial counts
+    SEARCH_FACET_CANDIDATES: int = int(os.getenv("SEARCH_FACET_CANDIDATES", "10000"))
+    # Ranked results kept per query for paging: total rowid bytes across queries and for how long (seconds)
+    SEARCH_RESULT_SET_CACHE_BYTES: int = int(os.getenv("SEARCH_RESULT_SET_CACHE_BYTES", str(16 * 1024 * 1024)))
+    SEARCH_RESULT_SET_TTL: int = int(os.getenv("SEARCH_RESULT_SET_TTL", "300"))
+    # How often the in-memory suggestions and facets check whether the search index was refreshed (seconds)
+    SEARCH_INDEX_RELOAD_INTERVAL: int = int(os.getenv("SEARCH_INDEX_RELOAD_INTERVAL", "60"))
+    # Memory-mapped columnar copy of every annual report's statements, used once built
+    STATEMENT_STORE_ENABLED: bool = os.getenv("STATEMENT_STORE_ENABLED", "True").lower() in ("true", "1", "t")
+    STATEMENT_STORE_PATH: str = os.getenv("STATEMENT_STORE_PATH", "data/statement_store")
+    # Ratio distributions by NACE code and year, and the fewest companies a benchmark group may have
+    INDUSTRY_BENCHMARKS_PATH: str = os.getenv("INDUSTRY_BENCHMARKS_PATH", "data/industry_benchmarks.npz")
+    INDUSTRY_BENCHMARK_MIN_COMPANIES: int = int(os.getenv("INDUSTRY_BENCHMARK_MIN_COMPANIES", "20"))
+    # Health scores of every company, refreshed by the refresh_health_scores job
+    HEALTH_SCORES_ENABLED: bool = os.getenv("HEALTH_SCORES_ENABLED", "True").lower() in ("true", "1", "t")
+    HEALTH_SCORES_PATH: str = os.getenv("HEALTH_SCORES_PATH", "data/health_scores.sqlite3")
+    # Fetch multi-year statements with one datastore_search_sql join when the instance allows it
+    CKAN_SQL_ENABLED: bool = os.getenv("CKAN_SQL_ENABLED", "True").lower() in ("true", "1", "t")
+    # Response cache: in-process LRU plus Redis when REDIS_URL is set (TTLs in seconds)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    CKAN_CACHE_MAX_ENTRIES: int = int(os.getenv("CKAN_CACHE_MAX_ENTRIES", "5000"))
+    CKAN_CACHE_TTL_DEFAULT: float = float(os.getenv("CKAN_CACHE_TTL_DEFAULT", "21600"))
+    CKAN_CACHE_TTL_FINANCIAL: float = float(os.getenv("CKAN_CACHE_TTL_FINANCIAL", "86400"))
+    CKAN_CACHE_TTL_VOLATILE: float = float(os.getenv("CKAN_CACHE_TTL_VOLATILE", "900"))
+    # How long expired entries are kept to be served stale while CKAN is unavailable
+    CKAN_CACHE_STALE_TTL: float = float(os.getenv("CKAN_CACHE_STALE_TTL", "604800"))
+    # How long a registration number CKAN reported as unknown is answered with 404 without asking again
+    CKAN_NEGATIVE_CACHE_TTL: float = float(os.getenv("CKAN_NEGATIVE_CACHE_TTL", "3600"))
+    # Per-resource circuit breaker: open when the error rate over the last
+    # CKAN_BREAKER_WINDOW calls reaches the threshold, retry after the reset timeout
+    CKAN_BREAKER_ERROR_THRESHOLD: float = float(os.getenv("CKAN_BREAKER_ERROR_THRESHOLD", "0.5"))
+    CKAN_BREAKER_WINDOW: int = int(os.getenv("CKAN_BREAKER_WINDOW", "20"))
+    CKAN_BREAKER_MIN_CALLS: int = int(os.getenv("CKAN_BREAKER_MIN_CALLS", "5"))
+    CKAN_BREAKER_RESET_TIMEOUT: float = float(os.getenv("CKAN_BREAKER_RESET_TIMEOUT", "30"))
+    # Overall deadline in seconds for the concurrent lookups behind /company/{reg_number}
+    COMPANY_DETAILS_TIMEOUT: float = float(os.getenv("COMPANY_DETAILS_TIMEOUT", "12"))
+    
     # ===== FINANCIAL DATA RESOURCES =====
     # Annual Report Basic Information (Gada pārskatu pamatinformācija)
     CKAN_FINANCIAL_STATEMENTS_RESOURCE_ID: str = os.getenv("CKAN_FINANCIAL_STATEMENTS_RESOURCE_ID", "27fcc5ec-c63b-4bfd-bb08-01f073a52d04")
@@ -0,0 +1,196 @@
+"""
+Materialized financial health scores of every company.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from app.core.config import settings
+from app.models.financial import FinancialHealthAssessment
+
+# Assessment fields stored as columns; list fields are kept as JSON
+ASSESSMENT_FIELDS = [name for name in FinancialHealthAssessment.model_fields if name != "registration_number"]
+LIST_FIELDS = {
+    name for name, field in FinancialHealthAssessment.model_fields.items()
+    if getattr(field.annotation, "__origin__", None) is list
+}
+
+# Columns of health_scores in table order
+COLUMNS = ["registration_number", *ASSESSMENT_FIELDS, "inputs_hash"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS health_scores (
+    registration_number TEXT PRIMARY KEY,
+    {columns},
+    inputs_hash TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS health_score_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+""".format(columns=",\n    ".join(ASSESSMENT_FIELDS))
+
+
+def assessment_row(assessment: FinancialHealthAssessment, inputs_hash: str) -> tuple:
+    """Turn an assessment into a health_scores row."""
+    values = assessment.model_dump()
+    row = [assessment.registration_number]
+    for name in ASSESSMENT_FIELDS:
+        value = values.get(name)
+        if name in LIST_FIELDS:
+            value = json.dumps(value or [], ensure_ascii=False)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row.append(value)
+    row.append(inputs_hash)
+    return tuple(row)
+
+
+class HealthScoreStore:
+    """
+    SQLite table holding one FinancialHealthAssessment per company.
+
+    Rows are written by the refresh_health_scores job with a hash of the
+    statement values and scoring code they were computed from, so a refresh
+    only rewrites the companies whose score could have changed, and read by
+    the health-score endpoint with one primary key lookup. A refresh by new
+    scoring code, or of a table made for an older assessment model, starts
+    over from an empty table.
+    """
+
+    def __init__(self, path: str = None):
+        """Initialize the store; the database is opened lazily per thread."""
+        self.path = path or settings.HEALTH_SCORES_PATH
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.connection = conn
+        return conn
+
+    def _columns(self) -> List[str]:
+        """Get the columns the health_scores table was created with."""
+        return [row[1] for row in self.connection.execute("PRAGMA table_info(health_scores)")]
+
+    def is_current(self, scoring_version: str = None) -> bool:
+        """
+        Check whether the table matches the assessment model and scoring code.
+
+        Args:
+            scoring_version: The scoring code the rows must have been computed by
+
+        Returns:
+            True if the table has the model's columns and, if given, was
+            computed by scoring_version
+        """
+        # A matching table stays matching, so only that answer is remembered
+        if not getattr(self._local, "columns_current", False):
+            if self._columns() != COLUMNS:
+                return False
+            self._local.columns_current = True
+        return scoring_version is None or self.get_state("scoring_version") == scoring_version
+
+    def prepare(self, scoring_version: str) -> bool:
+        """
+        Recreate the table if it was computed by other scoring code or has other columns.
+
+        A table created before an assessment model change cannot take the new
+        rows, and its scores would all be rewritten anyway, so it is dropped
+        together with the refresh state rather than migrated.
+
+        Args:
+            scoring_version: The scoring code about to refresh the table
+
+        Returns:
+            True if the table was recreated
+        """
+        if self.is_current(scoring_version):
+            return False
+        with self.connection as conn:
+            conn.execute("DROP TABLE health_scores")
+            conn.execute("DELETE FROM health_score_state")
+        self.connection.executescript(_SCHEMA)
+        self._local.columns_current = True
+        return True
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Get a value recorded by the last refresh."""
+        row = self.connection.execute("SELECT value FROM health_score_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, values: Dict[str, Any]):
+        """Record values describing the last refresh."""
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO health_score_state VALUES (?, ?)",
+                [(key, None if value is None else str(value)) for key, value in values.items()]
+            )
+
+    def get(self, reg_number: str, scoring_version: str = None) -> Optional[FinancialHealthAssessment]:
+        """
+        Get a company's materialized assessment.
+
+        Args:
+            reg_number: The company registration number
+            scoring_version: Only answer if the table was computed by this scoring code
+
+        Returns:
+            The assessment, or None if the company is missing or the table is stale
+        """
+        if not self.is_current(scoring_version):
+            return None
+        row = self.connection.execute(
+            f"SELECT {', '.join(ASSESSMENT_FIELDS)} FROM health_scores WHERE registration_number = ?",
+            (reg_number,)
+        ).fetchone()
+        if row is None:
+            return None
+        values = dict(zip(ASSESSMENT_FIELDS, row))
+        for name in LIST_FIELDS:
+            values[name] = json.loads(values[name] or "[]")
+        return FinancialHealthAssessment(registration_number=reg_number, **values)
+
+    def get_hashes(self) -> Dict[str, str]:
+        """Get the inputs hash of every stored company."""
+        return dict(self.connection.execute("SELECT registration_number, inputs_hash FROM health_scores"))
+
+    def upsert(self, rows: Iterable[tuple]) -> int:
+        """
+        Insert or replace assessment rows made by assessment_row().
+
+        Returns:
+            The number of rows written
+        """
+        rows = list(rows)
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.connection as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO health_scores VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def delete(self, reg_numbers: Iterable[str]) -> int:
+        """
+        Remove companies that can no longer be scored.
+
+        Returns:
+            The number of rows removed
+        """
+        reg_numbers = list(reg_numbers)
+        with self.connection as conn:
+            conn.executemany("DELETE FROM health_scores WHERE registration_number = ?", [(reg,) for reg in reg_numbers])
+        return len(reg_numbers)
+
+
+# Create a singleton instance
+health_score_store = HealthScoreStore()
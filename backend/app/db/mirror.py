@@ -0,0 +1,371 @@
+"""
+Local SQLite mirror of the CKAN datastore resources.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+# Mirrored resources: name -> (resource id, field that lookups filter on)
+MIRROR_RESOURCES = {
+    "company": (settings.CKAN_COMPANY_RESOURCE_ID, "regcode"),
+    "financial_statements": (settings.CKAN_FINANCIAL_STATEMENTS_RESOURCE_ID, "legal_entity_registration_number"),
+    "balance_sheets": (settings.CKAN_BALANCE_SHEETS_RESOURCE_ID, "statement_id"),
+    "income_statements": (settings.CKAN_INCOME_STATEMENTS_RESOURCE_ID, "statement_id"),
+    "cash_flow_statements": (settings.CKAN_CASH_FLOW_STATEMENTS_RESOURCE_ID, "statement_id"),
+    "capital": (settings.CKAN_CAPITAL_RESOURCE_ID, "legal_entity_registration_number"),
+    "beneficiaries": (settings.CKAN_BENEFICIARY_RESOURCE_ID, "legal_entity_registration_number"),
+    "members": (settings.CKAN_MEMBERS_RESOURCE_ID, "at_legal_entity_registration_number"),
+    "business": (settings.CKAN_BUSINESS_RESOURCE_ID, "legal_entity_registration_number"),
+    "liquidation": (settings.CKAN_LIQUIDATION_RESOURCE_ID, "legal_entity_registration_number"),
+    "officers": (settings.CKAN_OFFICERS_RESOURCE_ID, "at_legal_entity_registration_number"),
+    "stockholders": (settings.CKAN_STOCKHOLDERS_RESOURCE_ID, "at_legal_entity_registration_number"),
+    "taxpayer_ratings": (settings.CKAN_TAXPAYER_RATINGS_RESOURCE_ID, "registracijas_kods"),
+}
+
+# Key field by resource id
+RESOURCE_KEY_FIELDS = {resource_id: key_field for resource_id, key_field in MIRROR_RESOURCES.values()}
+
+# Resources keyed by statement_id rather than by registration number
+STATEMENT_RESOURCES = ("balance_sheets", "income_statements", "cash_flow_statements")
+
+# Bookkeeping tables for incremental sync
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource_id TEXT PRIMARY KEY,
+    watermark_field TEXT NOT NULL,
+    watermark TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changed_entities (
+    registration_number TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    changed_at REAL NOT NULL,
+    PRIMARY KEY (registration_number, resource)
+);
+CREATE INDEX IF NOT EXISTS changed_entities_changed_at ON changed_entities (changed_at);
+"""
+
+
+def _table_name(resource_id: str) -> str:
+    """Get the SQLite table name holding a resource."""
+    return "resource_" + resource_id.replace("-", "_")
+
+
+def _key_value(value: Any) -> Optional[str]:
+    """Normalize a key field value for storage and lookup."""
+    return None if value is None else str(value)
+
+
+class MirrorStore:
+    """
+    SQLite store holding one table per mirrored CKAN resource.
+
+    Each row keeps the original record as JSON plus its key field in an
+    indexed column, and search() answers datastore_search style queries
+    so CKANService can use the mirror in place of the live API.
+    """
+
+    def __init__(self, path: str = None):
+        """Initialize the store; the database is opened lazily per thread."""
+        self.path = path or settings.CKAN_MIRROR_PATH
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.connection = conn
+        return conn
+
+    def has_resource(self, resource_id: str) -> bool:
+        """Check whether a resource has been loaded into the mirror."""
+        row = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (_table_name(resource_id),)
+        ).fetchone()
+        return row is not None
+
+    def start_load(self, resource_id: str):
+        """Create an empty staging table for a full reload of a resource."""
+        staging = _table_name(resource_id) + "_staging"
+        conn = self.connection
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        conn.execute(f'CREATE TABLE "{staging}" (_id INTEGER PRIMARY KEY, key TEXT, data TEXT NOT NULL)')
+        conn.commit()
+
+    def stage_records(self, resource_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add a batch of records to a resource's staging table.
+
+        Args:
+            resource_id: The CKAN resource id
+            records: The resource records, each including CKAN's '_id'
+
+        Returns:
+            The number of rows staged
+        """
+        staging = _table_name(resource_id) + "_staging"
+        key_field = RESOURCE_KEY_FIELDS.get(resource_id)
+        rows = [
+            (record["_id"], _key_value(record.get(key_field)), json.dumps(record, ensure_ascii=False))
+            for record in records
+        ]
+        with self.connection as conn:
+            conn.executemany(f'INSERT OR REPLACE INTO "{staging}" VALUES (?, ?, ?)', rows)
+        return len(rows)
+
+    def finish_load(self, resource_id: str):
+        """Swap a fully staged resource in place of the current copy."""
+        table = _table_name(resource_id)
+        staging = table + "_staging"
+        with self.connection as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_key" ON "{table}" (key)')
+            if resource_id == MIRROR_RESOURCES["financial_statements"][0]:
+                # Statement ids are resolved back to registration numbers during sync
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table}_statement_id" '
+                    f'ON "{table}" ' "(CAST(json_extract(data, '$.id') AS TEXT))"
+                )
+
+    def replace_resource(self, resource_id: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Replace the mirrored copy of a resource.
+
+        Records are loaded into a staging table which is swapped in once the
+        load completes, so readers never see a partially loaded resource.
+
+        Args:
+            resource_id: The CKAN resource id
+            records: The resource records, each including CKAN's '_id'
+
+        Returns:
+            The number of rows loaded
+        """
+        self.start_load(resource_id)
+        count = self.stage_records(resource_id, records)
+        self.finish_load(resource_id)
+        return count
+
+    def upsert_records(self, resource_id: str, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Insert or update records in a mirrored resource by CKAN '_id'.
+
+        Args:
+            resource_id: The CKAN resource id
+            records: The new or changed records
+
+        Returns:
+            The key field values of the upserted records
+        """
+        table = _table_name(resource_id)
+        key_field = RESOURCE_KEY_FIELDS.get(resource_id)
+        rows = [
+            (record["_id"], _key_value(record.get(key_field)), json.dumps(record, ensure_ascii=False))
+            for record in records
+        ]
+        with self.connection as conn:
+            conn.executemany(f'INSERT OR REPLACE INTO "{table}" VALUES (?, ?, ?)', rows)
+        return [row[1] for row in rows if row[1] is not None]
+
+    def iter_records(self, resource_id: str, batch_size: int = 10000) -> Iterable[List[Dict[str, Any]]]:
+        """
+        Stream every mirrored record of a resource in '_id' order.
+
+        Yields:
+            Lists of up to batch_size records
+        """
+        table = _table_name(resource_id)
+        last_id = -1
+        while True:
+            rows = self.connection.execute(
+                f'SELECT _id, data FROM "{table}" WHERE _id > ? ORDER BY _id LIMIT ?',
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [json.loads(row[1]) for row in rows]
+            last_id = rows[-1][0]
+
+    def count_records(self, resource_id: str) -> int:
+        """Get the number of mirrored rows of a resource."""
+        return self.connection.execute(f'SELECT COUNT(*) FROM "{_table_name(resource_id)}"').fetchone()[0]
+
+    def get_record(self, resource_id: str, row_id: int) -> Optional[Dict[str, Any]]:
+        """Get a mirrored record by its CKAN '_id'."""
+        row = self.connection.execute(
+            f'SELECT data FROM "{_table_name(resource_id)}" WHERE _id = ?', (row_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def current_watermark(self, resource_id: str, field: str = "_id") -> Optional[str]:
+        """Get the highest value of a watermark field among the mirrored rows."""
+        table = _table_name(resource_id)
+        if field == "_id":
+            row = self.connection.execute(f'SELECT MAX(_id) FROM "{table}"').fetchone()
+        else:
+            row = self.connection.execute(f'SELECT MAX(json_extract(data, ?)) FROM "{table}"', (f"$.{field}",)).fetchone()
+        return _key_value(row[0])
+
+    def get_watermark(self, resource_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Get the (field, value) watermark recorded by the last sync of a resource."""
+        row = self.connection.execute(
+            "SELECT watermark_field, watermark FROM sync_state WHERE resource_id = ?",
+            (resource_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_watermark(self, resource_id: str, field: str, value: Optional[str]):
+        """Record the watermark reached by a sync of a resource."""
+        with self.connection as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (resource_id, field, _key_value(value), time.time())
+            )
+
+    def registration_numbers_for_statements(self, statement_ids: Iterable[Any]) -> List[str]:
+        """Resolve annual report statement ids to company registration numbers."""
+        ids = sorted({_key_value(statement_id) for statement_id in statement_ids if statement_id is not None})
+        if not ids:
+            return []
+        table = _table_name(MIRROR_RESOURCES["financial_statements"][0])
+        reg_numbers = set()
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self.connection.execute(
+                f'SELECT DISTINCT key FROM "{table}" '
+                "WHERE CAST(json_extract(data, '$.id') AS TEXT) " f"IN ({placeholders})",
+                chunk
+            ).fetchall()
+            reg_numbers.update(row[0] for row in rows if row[0] is not None)
+        return sorted(reg_numbers)
+
+    def record_changes(self, resource: str, reg_numbers: Iterable[str]):
+        """Record that a resource changed for the given registration numbers."""
+        now = time.time()
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO changed_entities VALUES (?, ?, ?)",
+                [(reg_number, resource, now) for reg_number in set(reg_numbers)]
+            )
+
+    def changed_since(self, since: float) -> Dict[str, List[str]]:
+        """
+        Get the registration numbers changed since a point in time.
+
+        Args:
+            since: Unix timestamp
+
+        Returns:
+            Dictionary mapping registration number to the changed resource names
+        """
+        rows = self.connection.execute(
+            "SELECT registration_number, resource FROM changed_entities WHERE changed_at >= ? ORDER BY registration_number",
+            (since,)
+        ).fetchall()
+        changes = {}
+        for reg_number, resource in rows:
+            changes.setdefault(reg_number, []).append(resource)
+        return changes
+
+    def prune_changes(self, before: float):
+        """Forget change records older than a point in time."""
+        with self.connection as conn:
+            conn.execute("DELETE FROM changed_entities WHERE changed_at < ?", (before,))
+
+    def search(
+        self,
+        resource_id: str,
+        filters: Dict[str, Any] = None,
+        q: str = None,
+        limit: int = 100,
+        offset: int = 0,
+        fields: List[str] = None,
+        sort: str = None,
+        **params
+    ) -> Dict[str, Any]:
+        """
+        Answer a datastore_search style query from the mirror.
+
+        Args:
+            resource_id: The CKAN resource id
+            filters: Field equality filters; list values match any element
+            q: Full-text query; every term must appear somewhere in the record
+            limit: Maximum number of records to return
+            offset: Offset for pagination
+            fields: Optional list of fields to return
+            sort: Optional sort such as '_id' or 'year desc'
+
+        Returns:
+            Dictionary with 'records' and 'total' like datastore_search
+        """
+        table = _table_name(resource_id)
+        key_field = RESOURCE_KEY_FIELDS.get(resource_id)
+        where = []
+        args = []
+
+        for field, value in (filters or {}).items():
+            values = value if isinstance(value, list) else [value]
+            placeholders = ", ".join("?" for _ in values)
+            if field == key_field:
+                where.append(f"key IN ({placeholders})")
+            elif field == "_id":
+                where.append(f"_id IN ({placeholders})")
+            else:
+                where.append(f"CAST(json_extract(data, ?) AS TEXT) IN ({placeholders})")
+                args.append(f"$.{field}")
+            args.extend(_key_value(v) for v in values)
+
+        if q:
+            for term in q.split():
+                where.append("data LIKE ?")
+                args.append(f"%{term}%")
+
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        order_sql = "ORDER BY _id"
+        if sort:
+            sort_field, _, direction = sort.strip().partition(" ")
+            direction = "DESC" if direction.strip().lower() == "desc" else "ASC"
+            if sort_field == "_id":
+                order_sql = f"ORDER BY _id {direction}"
+            else:
+                order_sql = f"ORDER BY json_extract(data, ?) {direction}, _id"
+
+        conn = self.connection
+        try:
+            total = conn.execute(f'SELECT COUNT(*) FROM "{table}" {where_sql}', args).fetchone()[0]
+            page_args = list(args)
+            if sort and not order_sql.startswith("ORDER BY _id"):
+                page_args.append(f"$.{sort_field}")
+            rows = conn.execute(
+                f'SELECT data FROM "{table}" {where_sql} {order_sql} LIMIT ? OFFSET ?',
+                page_args + [limit if limit is not None else 100, offset or 0]
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise LookupError(f"Resource {resource_id} is not available in the mirror: {e}") from e
+
+        records = [json.loads(row[0]) for row in rows]
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(",")]
+        if fields:
+            records = [{field: record.get(field) for field in fields} for record in records]
+        return {"records": records, "total": total}
+
+
+# Create a singleton instance
+mirror_store = MirrorStore()
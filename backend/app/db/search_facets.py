@@ -0,0 +1,212 @@
+"""
+Facets of the company search index: region, type, register and status.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from app.services.company_names import fold_diacritics
+
+# Facet fields, and the registry columns holding the display text of a value
+FACET_FIELDS = ("region", "type", "regtype", "status")
+FACET_LABELS = {"type": "type_text", "regtype": "regtype_text"}
+
+
+def company_status(record: Dict[str, Any]) -> str:
+    """Get whether a company is active, terminated or closed."""
+    if record.get("terminated"):
+        return "terminated"
+    if record.get("closed"):
+        return "closed"
+    return "active"
+
+
+def facet_values(record: Dict[str, Any]) -> Dict[str, str]:
+    """Get a company's value for every facet field, '' where it has none."""
+    values = {field: "" if record.get(field) is None else str(record.get(field)) for field in FACET_FIELDS}
+    values["status"] = company_status(record)
+    return values
+
+
+def facet_token(field: str, value: str) -> Optional[str]:
+    """
+    Get the word standing for a facet value in the index, e.g. ('type', 'SIA') -> 'typesia'.
+
+    Returns:
+        The word, or None for an empty value
+    """
+    value = re.sub(r"[^0-9a-z]", "", fold_diacritics(str(value)).lower())
+    return f"{field}{value}" if value else None
+
+
+def facet_text(values: Dict[str, str]) -> str:
+    """Get the facet column text of a company from its facet values."""
+    tokens = (facet_token(field, values[field]) for field in FACET_FIELDS)
+    return " ".join(token for token in tokens if token)
+
+
+def facet_match(filters: Dict[str, List[str]]) -> Optional[str]:
+    """
+    Turn facet filters into an FTS5 query on the facet column.
+
+    Values of one field are alternatives, different fields must all match.
+
+    Args:
+        filters: Accepted values per facet field
+
+    Returns:
+        The MATCH expression, or None if there are no filters
+    """
+    parts = []
+    for field in FACET_FIELDS:
+        tokens = [facet_token(field, value) for value in filters.get(field) or []]
+        tokens = [f'"{token}"' for token in tokens if token]
+        if tokens:
+            parts.append(f"facets : ({' OR '.join(tokens)})")
+    return " AND ".join(parts) or None
+
+
+def matches_filters(record: Dict[str, Any], filters: Dict[str, List[str]]) -> bool:
+    """Check whether a company has one of the accepted values of every filtered field."""
+    values = facet_values(record)
+    for field, accepted in filters.items():
+        if accepted and facet_token(field, values.get(field, "")) not in {facet_token(field, value) for value in accepted}:
+            return False
+    return True
+
+
+def bitmap(rowids: Iterable[int]) -> int:
+    """Get the bitset with the given rowids' bits set."""
+    rowids = np.fromiter(rowids, dtype=np.int64)
+    if not len(rowids):
+        return 0
+    bits = np.zeros(int(rowids.max()) + 1, dtype=bool)
+    bits[rowids] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def bitmap_bytes(bits: int) -> bytes:
+    """Serialize a bitset, e.g. to store it in the index."""
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+class FacetIndex:
+    """
+    Bitsets of the index rowids having each facet value.
+
+    Counting how many matches of a query have a value is the popcount of
+    the query's match bitset ANDed with the value's bitset, so facet counts
+    cost a few big-integer operations per value instead of a registry scan.
+    """
+
+    def __init__(self):
+        """Initialize an empty facet index."""
+        self.bitmaps: Dict[str, Dict[str, int]] = {field: {} for field in FACET_FIELDS}
+        self.labels: Dict[str, Dict[str, str]] = {field: {} for field in FACET_FIELDS}
+        self.tokens: Dict[str, Dict[str, str]] = {field: {} for field in FACET_FIELDS}
+        self.all = 0
+
+    @classmethod
+    def build(cls, rows: Iterable[tuple]) -> "FacetIndex":
+        """
+        Build the bitsets from (rowid, values, labels) rows.
+
+        Args:
+            rows: Tuples of a rowid, a dictionary of facet values and one of value labels
+
+        Returns:
+            The built facet index
+        """
+        index = cls()
+        rowids = {field: {} for field in FACET_FIELDS}
+        everything = []
+        for rowid, values, labels in rows:
+            everything.append(rowid)
+            for field in FACET_FIELDS:
+                value = values.get(field)
+                if not value:
+                    continue
+                rowids[field].setdefault(value, []).append(rowid)
+                if labels.get(field):
+                    index.labels[field][value] = labels[field]
+        index.all = bitmap(everything)
+        for field, values in rowids.items():
+            for value, members in values.items():
+                index.bitmaps[field][value] = bitmap(members)
+                index.tokens[field][facet_token(field, value)] = value
+        return index
+
+    def rows(self) -> Iterable[tuple]:
+        """
+        Get the bitsets as (field, value, label, bytes) rows for storing.
+
+        The bitset of every company has the empty field and value.
+        """
+        yield "", "", None, bitmap_bytes(self.all)
+        for field, values in self.bitmaps.items():
+            for value, bits in values.items():
+                yield field, value, self.labels[field].get(value), bitmap_bytes(bits)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "FacetIndex":
+        """Load the bitsets from rows as returned by rows()."""
+        index = cls()
+        for field, value, label, data in rows:
+            bits = int.from_bytes(data, "little")
+            if not field:
+                index.all = bits
+                continue
+            index.bitmaps[field][value] = bits
+            index.tokens[field][facet_token(field, value)] = value
+            if label:
+                index.labels[field][value] = label
+        return index
+
+    def filter_bits(self, filters: Dict[str, List[str]], skip: str = None) -> int:
+        """
+        Get the bitset of companies passing the filters.
+
+        Args:
+            filters: Accepted values per facet field
+            skip: A field whose filter is left out
+
+        Returns:
+            The bitset of companies passing every other filter
+        """
+        bits = self.all
+        for field in FACET_FIELDS:
+            accepted = filters.get(field)
+            if field == skip or not accepted:
+                continue
+            field_bits = 0
+            for value in accepted:
+                value = self.tokens[field].get(facet_token(field, value))
+                if value is not None:
+                    field_bits |= self.bitmaps[field][value]
+            bits &= field_bits
+        return bits
+
+    def counts(self, matches: int, filters: Dict[str, List[str]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Count the matches having each facet value.
+
+        A field's counts apply every filter except the field's own, so they
+        show what choosing another value of the field would return.
+
+        Args:
+            matches: Bitset of the companies matching the text query
+            filters: Accepted values per facet field
+
+        Returns:
+            For every facet field, {'value', 'label', 'count'} dictionaries, most common first
+        """
+        counts = {}
+        for field in FACET_FIELDS:
+            base = matches & self.filter_bits(filters, skip=field)
+            values = []
+            for value, bits in self.bitmaps[field].items():
+                count = (base & bits).bit_count()
+                if count:
+                    values.append({"value": value, "label": self.labels[field].get(value), "count": count})
+            values.sort(key=lambda item: (-item["count"], item["value"]))
+            counts[field] = values
+        return counts
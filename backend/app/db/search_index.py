@@ -0,0 +1,704 @@
+"""
+Local full-text search index over the company registry.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from app.core.config import settings
+from app.db.search_facets import FACET_FIELDS, FACET_LABELS, FacetIndex, bitmap, facet_match, facet_text, facet_values
+from app.services.ckan_cache import LRUCache
+from app.services.company_names import TRIGRAMS_PER_EDIT, bounded_edit_distance, max_typos, name_words, trigrams
+
+# Indexed columns and their BM25 weights; matches in the name count most.
+# The last FTS column holds the facet words filters match, which do not rank.
+INDEXED_FIELDS = ("name", "without_quotes", "regcode", "address", "city")
+BM25_WEIGHTS = (10.0, 8.0, 6.0, 2.0, 1.0, 0.0)
+# Columns whose words make up the vocabulary typos are corrected against
+VOCABULARY_FIELDS = ("name", "without_quotes", "address", "city")
+# Words compared with a misspelled query word, and corrections kept for it
+MAX_CANDIDATES = 50
+MAX_CORRECTIONS = 5
+# Bumped when the index layout changes; an index built for another version
+# is not used until it has been rebuilt
+SCHEMA_VERSION = "2"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    rowid INTEGER PRIMARY KEY,
+    regcode TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS company_views (
+    regcode TEXT PRIMARY KEY,
+    views INTEGER NOT NULL
+);
+"""
+
+# Every word of the text columns with the number of companies using it, and
+# the trigrams of each word for finding words close to a misspelled one
+_VOCABULARY_TABLES = """
+CREATE TABLE IF NOT EXISTS "name_terms{suffix}" (
+    term TEXT PRIMARY KEY,
+    docs INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS "term_trigrams{suffix}" (
+    trigram TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (trigram, length, term)
+) WITHOUT ROWID;
+"""
+
+# Facet values and their display text per company, loaded into a FacetIndex
+_FACET_TABLE = """
+CREATE TABLE IF NOT EXISTS "company_facets{suffix}" (
+    rowid INTEGER PRIMARY KEY,
+    region TEXT, type TEXT, regtype TEXT, status TEXT,
+    type_text TEXT, regtype_text TEXT
+)
+"""
+
+# FacetIndex bitsets, written whenever the index is rebuilt or refreshed so
+# searches load them instead of building them from company_facets
+_FACET_BITSETS_TABLE = """
+CREATE TABLE IF NOT EXISTS "facet_bitsets{suffix}" (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    label TEXT,
+    bits BLOB NOT NULL,
+    PRIMARY KEY (field, value)
+)
+"""
+
+_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS "{name}" USING fts5(
+    name, without_quotes, regcode, address, city, facets,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def _match_query(alternatives: List[List[str]]) -> Optional[str]:
+    """
+    Turn query words into an FTS5 query: every word must match as a prefix.
+
+    Args:
+        alternatives: For each query word, the terms any of which may match it
+
+    Returns:
+        The MATCH expression, or None if there are no words
+    """
+    if not alternatives:
+        return None
+    parts = []
+    for terms in alternatives:
+        options = " OR ".join(f'"{term}"*' for term in terms)
+        parts.append(f"({options})" if len(terms) > 1 else options)
+    return " AND ".join(parts)
+
+
+def _text_match(match: str) -> str:
+    """Restrict a MATCH expression to the text columns."""
+    return f"{{{' '.join(INDEXED_FIELDS)}}} : ({match})"
+
+
+class RankedResults:
+    """
+    The matches of one query ranked so far, in (rank, rowid) order.
+
+    Only the best matches are ranked at first. A deeper page ranks the next
+    ones after the last (rank, rowid) key, so the list only grows at its end
+    and a deeper page never reorders the pages already served.
+    """
+
+    __slots__ = ("rowids", "last", "exhausted", "total", "lock")
+
+    # Rough bytes of the object itself, on top of its rowids
+    OVERHEAD = 256
+
+    def __init__(self):
+        self.rowids = array("q")
+        # (rank, rowid) of the last ranked match, None before the first ranking
+        self.last: Optional[tuple] = None
+        self.exhausted = False
+        # Number of matching companies, None until counted
+        self.total: Optional[int] = None
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes the cached results hold."""
+        return self.OVERHEAD + self.rowids.itemsize * len(self.rowids)
+
+
+class CompanySearchIndex:
+    """
+    SQLite FTS5 index over the company registry resource.
+
+    Each company is stored once as JSON next to an FTS5 row holding its
+    searchable columns, and search() ranks matches with BM25 so
+    /api/search can be answered locally instead of through CKAN's q=.
+    Facet filters match words in a separate FTS column, and facet counts
+    come from a FacetIndex of bitsets stored with the index. The best matches
+    of recent queries are ranked once and cached, so paging costs only the page.
+    """
+
+    def __init__(self, path: str = None):
+        """Initialize the index; the database is opened lazily per thread."""
+        self.path = path or settings.SEARCH_INDEX_PATH
+        self._local = threading.local()
+        self._facets: Optional[FacetIndex] = None
+        self._result_sets = LRUCache(max_entries=None, max_bytes=settings.SEARCH_RESULT_SET_CACHE_BYTES)
+        self._seen_refreshed_at: Optional[float] = None
+        self._checked_at = 0.0
+        self._facet_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.executescript(_VOCABULARY_TABLES.format(suffix=""))
+            conn.execute(_FACET_TABLE.format(suffix=""))
+            conn.execute(_FACET_BITSETS_TABLE.format(suffix=""))
+            conn.execute(_FTS_TABLE.format(name="company_fts"))
+            self._set_rank(conn, "company_fts")
+            self._local.connection = conn
+        return conn
+
+    @staticmethod
+    def _set_rank(conn: sqlite3.Connection, table: str):
+        """Make BM25 with the column weights the table's default ranking."""
+        rank = f"bm25({', '.join(str(weight) for weight in BM25_WEIGHTS)})"
+        # Writing the setting invalidates every other connection's cached
+        # configuration, so it is only written when it differs
+        current = conn.execute(f'SELECT v FROM "{table}_config" WHERE k = \'rank\'').fetchone()
+        if current is None or current[0] != rank:
+            conn.execute(f'INSERT INTO "{table}" ("{table}", rank) VALUES (\'rank\', ?)', (rank,))
+            conn.commit()
+
+    def is_ready(self) -> bool:
+        """Check whether the index exists, has the current layout and holds any companies."""
+        if not os.path.exists(self.path):
+            return False
+        conn = self.connection
+        version = conn.execute("SELECT value FROM index_state WHERE key = 'schema_version'").fetchone()
+        if version is None or version[0] != SCHEMA_VERSION:
+            return False
+        return conn.execute("SELECT 1 FROM companies LIMIT 1").fetchone() is not None
+
+    @staticmethod
+    def _rows(records: Iterable[Dict[str, Any]]) -> List[tuple]:
+        rows = []
+        for record in records:
+            regcode = record.get("regcode")
+            if regcode is None:
+                continue
+            values = tuple("" if record.get(field) is None else str(record.get(field)) for field in INDEXED_FIELDS)
+            facets = facet_values(record)
+            labels = tuple(record.get(FACET_LABELS[field]) for field in FACET_LABELS)
+            rows.append((
+                str(regcode), json.dumps(record, ensure_ascii=False), values + (facet_text(facets),),
+                tuple(facets[field] for field in FACET_FIELDS) + labels
+            ))
+        return rows
+
+    @staticmethod
+    def _add_terms(conn: sqlite3.Connection, terms: Counter, suffix: str = "", index_new: bool = True):
+        """
+        Count the companies using each word, indexing the trigrams of new words.
+
+        Args:
+            conn: Database connection
+            terms: Companies per word
+            suffix: Table suffix, '_staging' during a rebuild
+            index_new: Index trigrams now; a rebuild indexes them all at the end instead
+        """
+        new_terms = []
+        if index_new:
+            words = list(terms)
+            for start in range(0, len(words), 500):
+                chunk = words[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                known = {row[0] for row in conn.execute(
+                    f'SELECT term FROM "name_terms{suffix}" WHERE term IN ({placeholders})', chunk
+                )}
+                new_terms.extend(word for word in chunk if word not in known)
+        conn.executemany(
+            f'INSERT INTO "name_terms{suffix}" (term, docs) VALUES (?, ?) '
+            "ON CONFLICT (term) DO UPDATE SET docs = docs + excluded.docs",
+            terms.items()
+        )
+        CompanySearchIndex._add_trigrams(conn, new_terms, suffix)
+
+    @staticmethod
+    def _add_trigrams(conn: sqlite3.Connection, terms: Iterable[str], suffix: str = ""):
+        conn.executemany(
+            f'INSERT OR IGNORE INTO "term_trigrams{suffix}" (trigram, length, term) VALUES (?, ?, ?)',
+            ((trigram, len(term), term) for term in terms if not term.isdigit() for trigram in trigrams(term))
+        )
+
+    @staticmethod
+    def _vocabulary(values: tuple) -> set:
+        """Get the words of a company's vocabulary columns, diacritics folded."""
+        words = set()
+        for field, value in zip(INDEXED_FIELDS, values[:len(INDEXED_FIELDS)]):
+            if field in VOCABULARY_FIELDS:
+                words.update(name_words(value))
+        return words
+
+    def start_rebuild(self):
+        """Create empty staging tables for a full rebuild of the index."""
+        conn = self.connection
+        conn.execute("DROP TABLE IF EXISTS companies_staging")
+        conn.execute("DROP TABLE IF EXISTS company_fts_staging")
+        conn.execute("DROP TABLE IF EXISTS name_terms_staging")
+        conn.execute("DROP TABLE IF EXISTS term_trigrams_staging")
+        conn.execute("DROP TABLE IF EXISTS company_facets_staging")
+        conn.execute("DROP TABLE IF EXISTS facet_bitsets_staging")
+        conn.executescript(_VOCABULARY_TABLES.format(suffix="_staging"))
+        conn.execute(_FACET_TABLE.format(suffix="_staging"))
+        conn.execute(_FACET_BITSETS_TABLE.format(suffix="_staging"))
+        conn.execute(
+            "CREATE TABLE companies_staging (rowid INTEGER PRIMARY KEY, regcode TEXT UNIQUE NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute(_FTS_TABLE.format(name="company_fts_staging"))
+        self._set_rank(conn, "company_fts_staging")
+
+    def stage(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add a batch of company records to the staging tables.
+
+        Returns:
+            The number of companies staged
+        """
+        count = 0
+        terms = Counter()
+        with self.connection as conn:
+            for regcode, data, values, facets in self._rows(records):
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO companies_staging (regcode, data) VALUES (?, ?)", (regcode, data)
+                )
+                if not cursor.rowcount:
+                    continue
+                conn.execute(
+                    "INSERT INTO company_fts_staging (rowid, name, without_quotes, regcode, address, city, facets) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, *values)
+                )
+                conn.execute(
+                    "INSERT INTO company_facets_staging VALUES (?, ?, ?, ?, ?, ?, ?)", (cursor.lastrowid, *facets)
+                )
+                terms.update(self._vocabulary(values))
+                count += 1
+            self._add_terms(conn, terms, "_staging", index_new=False)
+        return count
+
+    def finish_rebuild(self):
+        """Swap the staged index in place of the current one."""
+        with self.connection as conn:
+            terms = [row[0] for row in conn.execute("SELECT term FROM name_terms_staging")]
+            self._add_trigrams(conn, terms, "_staging")
+            self._write_facets(conn, "_staging")
+            conn.execute("INSERT INTO company_fts_staging (company_fts_staging) VALUES ('optimize')")
+            conn.execute("DROP TABLE companies")
+            conn.execute("DROP TABLE company_fts")
+            conn.execute("ALTER TABLE companies_staging RENAME TO companies")
+            conn.execute("ALTER TABLE company_fts_staging RENAME TO company_fts")
+            for table in ("name_terms", "term_trigrams", "company_facets", "facet_bitsets"):
+                conn.execute(f"DROP TABLE {table}")
+                conn.execute(f"ALTER TABLE {table}_staging RENAME TO {table}")
+            conn.execute("INSERT OR REPLACE INTO index_state VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            conn.execute("INSERT OR REPLACE INTO index_state VALUES ('facets_stored', '1')")
+        self._forget_results()
+
+    def rebuild(self, batches: Iterable[List[Dict[str, Any]]]) -> int:
+        """
+        Replace the whole index with the given company records.
+
+        The new index is built in staging tables and swapped in at the end,
+        so searches keep working on the old one meanwhile.
+
+        Args:
+            batches: Lists of company registry records
+
+        Returns:
+            The number of companies indexed
+        """
+        self.start_rebuild()
+        count = sum(self.stage(records) for records in batches)
+        self.finish_rebuild()
+        return count
+
+    @staticmethod
+    def _build_facets(conn: sqlite3.Connection, suffix: str = "") -> FacetIndex:
+        """Build the facet bitsets from the facet values of every company."""
+        rows = conn.execute(
+            f"SELECT rowid, {', '.join(FACET_FIELDS)}, {', '.join(FACET_LABELS.values())} FROM \"company_facets{suffix}\""
+        )
+        return FacetIndex.build(
+            (row[0], dict(zip(FACET_FIELDS, row[1:])), dict(zip(FACET_LABELS, row[1 + len(FACET_FIELDS):])))
+            for row in rows
+        )
+
+    @classmethod
+    def _write_facets(cls, conn: sqlite3.Connection, suffix: str = ""):
+        """Replace the stored facet bitsets with ones built from the current facet values."""
+        facets = cls._build_facets(conn, suffix)
+        conn.execute(f'DELETE FROM "facet_bitsets{suffix}"')
+        conn.executemany(f'INSERT INTO "facet_bitsets{suffix}" VALUES (?, ?, ?, ?)', facets.rows())
+
+    def store_facets(self):
+        """
+        Store the facet bitsets after upsert() or delete() changed companies.
+
+        Until they are stored again, searches build the bitsets from the
+        facet values themselves.
+        """
+        with self.connection as conn:
+            self._write_facets(conn)
+            conn.execute("INSERT OR REPLACE INTO index_state VALUES ('facets_stored', '1')")
+        self._forget_results()
+
+    def upsert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add or update companies in the index by registration number.
+
+        Returns:
+            The number of companies written
+        """
+        rows = self._rows(records)
+        # Words of removed or renamed companies stay in the vocabulary until
+        # the next rebuild; a correction to them just finds nothing
+        terms = Counter()
+        with self.connection as conn:
+            for regcode, data, values, facets in rows:
+                terms.update(self._vocabulary(values))
+                existing = conn.execute("SELECT rowid FROM companies WHERE regcode = ?", (regcode,)).fetchone()
+                if existing:
+                    rowid = existing[0]
+                    conn.execute("UPDATE companies SET data = ? WHERE rowid = ?", (data, rowid))
+                    conn.execute("DELETE FROM company_fts WHERE rowid = ?", (rowid,))
+                else:
+                    rowid = conn.execute(
+                        "INSERT INTO companies (regcode, data) VALUES (?, ?)", (regcode, data)
+                    ).lastrowid
+                conn.execute(
+                    "INSERT INTO company_fts (rowid, name, without_quotes, regcode, address, city, facets) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (rowid, *values)
+                )
+                conn.execute("INSERT OR REPLACE INTO company_facets VALUES (?, ?, ?, ?, ?, ?, ?)", (rowid, *facets))
+            self._add_terms(conn, terms)
+            conn.execute("DELETE FROM index_state WHERE key = 'facets_stored'")
+        self._forget_results()
+        return len(rows)
+
+    def delete(self, regcodes: Iterable[str]):
+        """Remove companies from the index."""
+        with self.connection as conn:
+            for regcode in regcodes:
+                existing = conn.execute("SELECT rowid FROM companies WHERE regcode = ?", (str(regcode),)).fetchone()
+                if existing:
+                    conn.execute("DELETE FROM company_fts WHERE rowid = ?", (existing[0],))
+                    conn.execute("DELETE FROM company_facets WHERE rowid = ?", (existing[0],))
+                    conn.execute("DELETE FROM companies WHERE rowid = ?", (existing[0],))
+            conn.execute("DELETE FROM index_state WHERE key = 'facets_stored'")
+        self._forget_results()
+
+    def get_refreshed_at(self) -> Optional[float]:
+        """Get when the index was last rebuilt or refreshed."""
+        row = self.connection.execute("SELECT value FROM index_state WHERE key = 'refreshed_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def set_refreshed_at(self, value: float):
+        """Record when the index was last rebuilt or refreshed."""
+        with self.connection as conn:
+            conn.execute("INSERT OR REPLACE INTO index_state VALUES ('refreshed_at', ?)", (str(value),))
+
+    def iter_companies(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Iterate over every indexed company record.
+
+        Yields:
+            Lists of at most batch_size company records
+        """
+        cursor = self.connection.execute("SELECT data FROM companies ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [json.loads(row[0]) for row in rows]
+
+    def get_company(self, regcode: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a company by registration number.
+
+        Args:
+            regcode: The registration number
+            fields: Optional columns to return (default: all)
+
+        Returns:
+            The company record, or None if it is not indexed
+        """
+        row = self.connection.execute("SELECT data FROM companies WHERE regcode = ?", (str(regcode),)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if fields:
+            record = {field: record.get(field) for field in fields}
+        return record
+
+    def get_views(self) -> Dict[str, int]:
+        """Get how often each company's details were opened."""
+        return dict(self.connection.execute("SELECT regcode, views FROM company_views"))
+
+    def add_view(self, regcode: str):
+        """Count one opening of a company's details."""
+        with self.connection as conn:
+            conn.execute(
+                "INSERT INTO company_views (regcode, views) VALUES (?, 1) "
+                "ON CONFLICT (regcode) DO UPDATE SET views = views + 1",
+                (str(regcode),)
+            )
+
+    def _has_prefix(self, word: str) -> bool:
+        """Check whether any vocabulary word starts with the given one."""
+        return self.connection.execute(
+            "SELECT 1 FROM name_terms WHERE term >= ? AND term < ? LIMIT 1", (word, word + "\uffff")
+        ).fetchone() is not None
+
+    def corrections(self, word: str) -> List[str]:
+        """
+        Get the vocabulary words closest to a misspelled word.
+
+        Candidates share enough trigrams with the word to be within its
+        typo budget; the MAX_CANDIDATES sharing the most are ranked by
+        bounded edit distance and only the closest ones are kept, the most
+        widely used first.
+
+        Args:
+            word: Lowercase query word without diacritics
+
+        Returns:
+            Up to MAX_CORRECTIONS words, or an empty list if none is close enough
+        """
+        budget = max_typos(word)
+        if not budget:
+            return []
+        grams = trigrams(word)
+        placeholders = ", ".join("?" for _ in grams)
+        candidates = [term for term, in self.connection.execute(
+            f"SELECT term FROM term_trigrams WHERE trigram IN ({placeholders}) AND length BETWEEN ? AND ? "
+            f"GROUP BY term HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC LIMIT ?",
+            (*grams, len(word) - budget, len(word) + budget,
+             max(1, len(grams) - TRIGRAMS_PER_EDIT * budget), MAX_CANDIDATES)
+        )]
+
+        best = budget + 1
+        closest = []
+        for term in candidates:
+            distance = bounded_edit_distance(word, term, min(budget, best))
+            if distance < best:
+                best, closest = distance, []
+            if distance == best:
+                closest.append(term)
+        if not closest:
+            return []
+        placeholders = ", ".join("?" for _ in closest)
+        ranked = self.connection.execute(
+            f"SELECT term FROM name_terms WHERE term IN ({placeholders}) ORDER BY docs DESC LIMIT ?",
+            (*closest, MAX_CORRECTIONS)
+        )
+        return [term for term, in ranked]
+
+    def _alternatives(self, words: List[str], fuzzy: bool) -> List[List[str]]:
+        """Get the terms each query word may match, correcting words nothing starts with."""
+        alternatives = []
+        for word in words:
+            if fuzzy and not word.isdigit() and not self._has_prefix(word):
+                alternatives.append(self.corrections(word) or [word])
+            else:
+                alternatives.append([word])
+        return alternatives
+
+    def _forget_results(self):
+        """Drop the in-memory facets and cached results after the index changed."""
+        with self._facet_lock:
+            self._facets = None
+        with self._cache_lock:
+            self._result_sets.clear()
+
+    def _check_refreshed(self):
+        """Forget in-memory state now and then if another process refreshed the index since."""
+        now = time.monotonic()
+        if now - self._checked_at < settings.SEARCH_INDEX_RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        refreshed_at = self.get_refreshed_at()
+        if refreshed_at != self._seen_refreshed_at:
+            self._seen_refreshed_at = refreshed_at
+            self._forget_results()
+
+    def facet_index(self) -> FacetIndex:
+        """
+        Get the facet bitsets, loading them on first use and again after the index changed.
+
+        Bitsets stored by the last rebuild or refresh are loaded as they are;
+        only an index changed since without store_facets() builds them here.
+
+        Returns:
+            The facet index
+        """
+        with self._facet_lock:
+            if self._facets is None:
+                started = time.monotonic()
+                conn = self.connection
+                stored = conn.execute("SELECT value FROM index_state WHERE key = 'facets_stored'").fetchone()
+                if stored is not None:
+                    self._facets = FacetIndex.from_rows(
+                        conn.execute("SELECT field, value, label, bits FROM facet_bitsets")
+                    )
+                else:
+                    self._facets = self._build_facets(conn)
+                mode = "loaded" if stored is not None else "built"
+                print(f"Search facets {mode} in {time.monotonic() - started:.2f}s")
+            return self._facets
+
+    def _ranked(self, match: str, end: int, by_rank: bool = True) -> RankedResults:
+        """
+        Get the ranked results of a query, holding at least the first end matches.
+
+        The first call ranks the best SEARCH_RANK_TOP_N matches by BM25, ties
+        broken by rowid, and counts the rest. A page beyond the ranked ones
+        ranks the next matches after the last (rank, rowid) key. The results
+        are cached for SEARCH_RESULT_SET_TTL seconds.
+
+        Args:
+            match: The MATCH expression
+            end: Number of leading matches the page needs ranked
+            by_rank: Order by BM25; a facet-only match scores every company
+                alike, so it is ordered by rowid without computing BM25
+
+        Returns:
+            The ranked results
+        """
+        with self._cache_lock:
+            results = self._result_sets.get(match)
+            if results is None:
+                results = RankedResults()
+                self._result_sets.set(match, results, settings.SEARCH_RESULT_SET_TTL, results.nbytes)
+        with results.lock:
+            conn = self.connection
+            if results.total is None:
+                results.total = conn.execute(
+                    "SELECT COUNT(*) FROM company_fts WHERE company_fts MATCH ?", (match,)
+                ).fetchone()[0]
+            if len(results.rowids) < end and not results.exhausted:
+                count = max(settings.SEARCH_RANK_TOP_N, end - len(results.rowids))
+                key = "rank, rowid" if by_rank else "rowid"
+                after = f"AND ({key}) > ({', '.join('?' for _ in results.last)}) " if results.last else ""
+                rows = conn.execute(
+                    f"SELECT {key} FROM company_fts WHERE company_fts MATCH ? {after}ORDER BY {key} LIMIT ?",
+                    (match, *(results.last or ()), count)
+                ).fetchall()
+                results.rowids.extend(row[-1] for row in rows)
+                if rows:
+                    results.last = rows[-1]
+                results.exhausted = len(rows) < count
+                with self._cache_lock:
+                    self._result_sets.resize(match, results.nbytes)
+        return results
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        offset: int = 0,
+        fields: List[str] = None,
+        fuzzy: bool = False,
+        filters: Dict[str, List[str]] = None,
+        facets: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Search companies by name, registration number or address.
+
+        Diacritics and legal-form words (SIA, AS, IK...) in the query are
+        ignored, so 'SIA Latvijas gaze' finds 'AS "Latvijas Gāze"'.
+
+        Args:
+            query: Free-text query; every word is matched as a prefix
+            limit: Maximum number of results to return
+            offset: Offset for pagination
+            fields: Optional columns to return (default: all)
+            fuzzy: Replace words no indexed word starts with by their closest spelling
+            filters: Accepted values per facet field (region, type, regtype, status)
+            facets: Also count the matches having each facet value
+
+        Returns:
+            datastore_search style result with 'records' ranked by BM25 over
+            every match and 'total'. With facets, 'facets' holds the counts
+            of FacetIndex.counts() over the best SEARCH_FACET_CANDIDATES text
+            matches, and 'facets_partial' whether there were more. Without a
+            query or filters no records are returned, but facet counts cover
+            the whole registry.
+        """
+        self._check_refreshed()
+        filters = filters or {}
+        text = _match_query(self._alternatives(name_words(query), fuzzy))
+        if text is not None:
+            text = _text_match(text)
+        result = {"records": [], "total": 0}
+        if facets:
+            facet_index = self.facet_index()
+            matches = facet_index.all
+            if text is not None:
+                # Counting over the best matches only bounds the cost of a very
+                # common word; the ranking is shared with the page of the query
+                cap = settings.SEARCH_FACET_CANDIDATES
+                candidates = self._ranked(text, cap)
+                matches = bitmap(candidates.rowids[:cap])
+                result["facets_partial"] = candidates.total > cap
+            result["facets"] = facet_index.counts(matches, filters)
+
+        match = " AND ".join(part for part in (text, facet_match(filters)) if part)
+        if not match:
+            return result
+
+        # Ranking the matches of a very common word costs more than the search
+        # itself, so only the best are ranked and later pages reuse them
+        results = self._ranked(match, offset + limit, by_rank=text is not None)
+        rowids = list(results.rowids[offset:offset + limit])
+        total = results.total
+        conn = self.connection
+        placeholders = ", ".join("?" for _ in rowids)
+        data = dict(conn.execute(f"SELECT rowid, data FROM companies WHERE rowid IN ({placeholders})", rowids))
+        rows = [(data[rowid],) for rowid in rowids if rowid in data]
+
+        records = [json.loads(row[0]) for row in rows]
+        if fields:
+            records = [{field: record.get(field) for field in fields} for record in records]
+        result.update(records=records, total=total)
+        return result
+
+
+# Create a singleton instance
+company_search_index = CompanySearchIndex()
@@ -0,0 +1,553 @@
+"""
+Columnar store of every annual financial statement, memory-mapped from .npy files.
+
+Each column of the annual report list and of the balance sheet, income
+statement and cash flow resources is one NumPy file, all in the same row
+order: one row per annual report, sorted by registration number and then
+newest year first. A company's history is a contiguous slice found by
+binary search over the registration numbers, and the files are opened with
+mmap so every process shares the page cache instead of deserializing rows.
+
+Amounts are stored normalized: scaled to units by rounded_to_nearest and
+converted from lats to euros, so every company's figures compare directly.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.models.financial import BalanceSheet, CashFlowStatement, FinancialStatementInfo, IncomeStatement
+
+# Bumped when the file layout changes; a store built for another version is not used
+SCHEMA_VERSION = "1"
+
+# Statement sections by mirror resource name
+SECTION_MODELS = {
+    "balance_sheets": BalanceSheet,
+    "income_statements": IncomeStatement,
+    "cash_flow_statements": CashFlowStatement,
+}
+# Section columns taken from the annual report rather than the statement row
+ROW_FIELDS = ("statement_id", "year", "currency")
+
+# Multipliers of the amounts reported as rounded to thousands or millions
+ROUNDING_SCALES = {"ONES": 1.0, "THOUSANDS": 1e3, "MILLIONS": 1e6}
+# Fixed lats per euro conversion rate of the 2014 changeover
+LVL_PER_EUR = 0.702804
+BASE_CURRENCY = "EUR"
+
+# Stored in int columns where a value is missing
+MISSING_INT = -1
+
+
+def _column_kind(annotation: Any) -> str:
+    """Get how a model field is stored: 'float', 'int' or 'str'."""
+    types = [arg for arg in typing.get_args(annotation) if arg is not type(None)] or [annotation]
+    if types[0] is float:
+        return "float"
+    if types[0] is int:
+        return "int"
+    return "str"
+
+
+def _columns(model) -> Dict[str, str]:
+    """Get the stored columns of a statement model and their kinds."""
+    return {name: _column_kind(field.annotation) for name, field in model.model_fields.items()}
+
+
+STATEMENT_COLUMNS = _columns(FinancialStatementInfo)
+SECTION_COLUMNS = {
+    section: {name: kind for name, kind in _columns(model).items() if name not in ROW_FIELDS}
+    for section, model in SECTION_MODELS.items()
+}
+# Amount columns of every section; only these are scaled when normalizing
+AMOUNT_COLUMNS = frozenset(
+    name for columns in SECTION_COLUMNS.values() for name, kind in columns.items() if kind == "float"
+)
+# Integers that fit 32 bits; other int columns are ids and use 64
+INT32_COLUMNS = {"year", "employees"}
+
+
+def statement_scale(statement: Dict[str, Any]) -> float:
+    """
+    Get the factor turning an annual report's amounts into euro units.
+
+    Args:
+        statement: Annual report basic information with rounded_to_nearest and currency
+
+    Returns:
+        The multiplier of every amount in the report's statements
+    """
+    scale = ROUNDING_SCALES.get(str(statement.get("rounded_to_nearest") or "ONES").upper(), 1.0)
+    if str(statement.get("currency") or "").upper() == "LVL":
+        scale /= LVL_PER_EUR
+    return scale
+
+
+def normalized_currency(statement: Dict[str, Any]) -> Optional[str]:
+    """Get the currency an annual report's amounts are in once normalized."""
+    currency = statement.get("currency")
+    return BASE_CURRENCY if str(currency or "").upper() in ("EUR", "LVL") else currency
+
+
+def normalize_statement_record(record: Dict[str, Any], statement: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tag a statement row with its report's year and convert its amounts to euro units.
+
+    Only the float columns of the statement models are amounts; every
+    other field is copied unchanged.
+
+    Args:
+        record: A balance sheet, income statement or cash flow row
+        statement: The annual report the row belongs to
+
+    Returns:
+        A normalized copy of the row
+    """
+    scale = statement_scale(statement)
+    normalized = dict(record)
+    if scale != 1.0:
+        for name, value in record.items():
+            # Text fields such as future_housing_repairs_payments may hold digits but are not amounts
+            if name not in AMOUNT_COLUMNS or isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                normalized[name] = value * scale
+            elif isinstance(value, str):
+                try:
+                    normalized[name] = float(value) * scale
+                except ValueError:
+                    pass
+    normalized["year"] = statement.get("year")
+    normalized["currency"] = normalized_currency(statement)
+    return normalized
+
+
+def float_array(values: list) -> np.ndarray:
+    """Convert values to float64, missing or unparseable ones to NaN."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        converted = []
+        for value in values:
+            try:
+                converted.append(float(value))
+            except (TypeError, ValueError):
+                converted.append(np.nan)
+        return np.array(converted, dtype=np.float64)
+
+
+def _int_value(value: Any) -> int:
+    """Convert a value for an int column."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_INT
+
+
+def _str_value(value: Any) -> str:
+    """Convert a value for a string column."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _python_value(value: Any, kind: str) -> Any:
+    """Convert a stored value back to what CKAN returns."""
+    if kind == "float":
+        return None if np.isnan(value) else float(value)
+    if kind == "int":
+        return None if value == MISSING_INT else int(value)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return str(value) or None
+
+
+class StatementStoreVersion:
+    """One built copy of the store, its columns opened lazily with mmap."""
+
+    def __init__(self, directory: str):
+        """Open a built store directory."""
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self._arrays: Dict[tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.regcodes = self.column("statements", "legal_entity_registration_number")
+        self.years = self.column("statements", "year")
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        """Get a column of the annual report list ('statements') or of a section, memory-mapped."""
+        key = (table, name)
+        array = self._arrays.get(key)
+        if array is None:
+            with self._lock:
+                array = self._arrays.get(key)
+                if array is None:
+                    path = os.path.join(self.directory, table, f"{name}.npy")
+                    array = np.load(path, mmap_mode="r", allow_pickle=False)
+                    self._arrays[key] = array
+        return array
+
+    def company_rows(self, reg_number: str) -> slice:
+        """Get the rows of a company's annual reports, newest first."""
+        key = str(reg_number).encode("utf-8")
+        start = int(np.searchsorted(self.regcodes, key, side="left"))
+        end = int(np.searchsorted(self.regcodes, key, side="right"))
+        return slice(start, end)
+
+
+class StatementStoreBuilder:
+    """
+    Writes a new copy of the store.
+
+    Annual reports are added first; once the first statement row arrives
+    they are sorted and every section column is allocated as a writable
+    memory-mapped file filled by row, so sections never sit in memory whole.
+    """
+
+    def __init__(self, store: "FinancialStatementStore"):
+        """Start a build in a fresh directory next to the current copy."""
+        self.store = store
+        self.version = str(time.time_ns())
+        self.directory = os.path.join(store.path, f"build-{self.version}")
+        os.makedirs(self.directory)
+        self._statements = {name: [] for name in STATEMENT_COLUMNS}
+        self._row_by_id: Optional[Dict[str, int]] = None
+        self._scales: Optional[np.ndarray] = None
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self.rows = 0
+
+    def add_statements(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add a batch of annual report basic information records.
+
+        Returns:
+            The number of records added
+        """
+        if self._row_by_id is not None:
+            raise RuntimeError("Annual reports must be added before statement rows")
+        count = 0
+        for record in records:
+            if record.get("id") is None or not record.get("legal_entity_registration_number"):
+                continue
+            for name, kind in STATEMENT_COLUMNS.items():
+                value = record.get(name)
+                self._statements[name].append(_int_value(value) if kind == "int" else _str_value(value))
+            count += 1
+        return count
+
+    def _write(self, table: str, name: str, values: np.ndarray):
+        """Save a finished column."""
+        directory = os.path.join(self.directory, table)
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=False)
+
+    def _index_statements(self):
+        """Sort the annual reports by (registration number, newest year) and save them."""
+        columns = self._statements
+        regcodes = np.array([reg.encode("utf-8") for reg in columns["legal_entity_registration_number"]], dtype=bytes)
+        years = np.array(columns["year"], dtype=np.int32)
+        ids = np.array(columns["id"], dtype=np.int64)
+        order = np.lexsort((-ids, -years, regcodes))
+        self.rows = len(order)
+
+        for name, kind in STATEMENT_COLUMNS.items():
+            if name == "legal_entity_registration_number":
+                values = regcodes
+            elif kind == "int":
+                values = np.array(columns[name], dtype=np.int32 if name in INT32_COLUMNS else np.int64)
+            else:
+                values = np.array(columns[name], dtype=str)
+            self._write("statements", name, values[order])
+
+        sorted_ids = ids[order]
+        self._row_by_id = {str(statement_id): row for row, statement_id in enumerate(sorted_ids.tolist())}
+        rounding = np.array(columns["rounded_to_nearest"])[order]
+        currency = np.array(columns["currency"])[order]
+        self._scales = np.array(
+            [statement_scale({"rounded_to_nearest": r, "currency": c}) for r, c in zip(rounding.tolist(), currency.tolist())],
+            dtype=np.float64
+        )
+        self._statements = None
+
+    def _section(self, section: str) -> Dict[str, Any]:
+        """Get the columns being filled for a section, allocating them on first use."""
+        if section not in self._sections:
+            directory = os.path.join(self.directory, section)
+            os.makedirs(directory, exist_ok=True)
+            columns = {}
+            for name, kind in SECTION_COLUMNS[section].items():
+                if kind == "str":
+                    columns[name] = [""] * self.rows
+                    continue
+                dtype = np.float64 if kind == "float" else np.int64
+                column = np.lib.format.open_memmap(
+                    os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype, shape=(self.rows,)
+                )
+                column[:] = np.nan if kind == "float" else MISSING_INT
+                columns[name] = column
+            columns["_present"] = np.zeros(self.rows, dtype=bool)
+            self._sections[section] = columns
+        return self._sections[section]
+
+    def add_section(self, section: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add a batch of balance sheet, income statement or cash flow rows.
+
+        Rows are placed on their annual report's row and normalized; rows
+        of unknown reports are skipped and a later row of the same report
+        replaces an earlier one.
+
+        Args:
+            section: 'balance_sheets', 'income_statements' or 'cash_flow_statements'
+            records: The statement rows
+
+        Returns:
+            The number of rows stored
+        """
+        if self._row_by_id is None:
+            self._index_statements()
+        columns = self._section(section)
+        rows, kept = [], []
+        for record in records:
+            row = self._row_by_id.get(str(record.get("statement_id")))
+            if row is not None:
+                rows.append(row)
+                kept.append(record)
+        if not rows:
+            return 0
+
+        rows = np.array(rows, dtype=np.int64)
+        for name, kind in SECTION_COLUMNS[section].items():
+            values = [record.get(name) for record in kept]
+            if kind == "float":
+                columns[name][rows] = float_array(values) * self._scales[rows]
+            elif kind == "int":
+                columns[name][rows] = [_int_value(value) for value in values]
+            else:
+                for row, value in zip(rows.tolist(), values):
+                    columns[name][row] = _str_value(value)
+        columns["_present"][rows] = True
+        return len(rows)
+
+    def finish(self) -> str:
+        """
+        Save the remaining columns and make the new copy current.
+
+        Returns:
+            The directory of the new copy
+        """
+        if self._row_by_id is None:
+            self._index_statements()
+        for section in SECTION_MODELS:
+            columns = self._section(section)
+            for name, column in columns.items():
+                if isinstance(column, np.memmap):
+                    column.flush()
+                elif isinstance(column, list):
+                    self._write(section, name, np.array(column, dtype=str))
+                else:
+                    self._write(section, name, column)
+        self._sections = {}
+
+        meta = {"schema_version": SCHEMA_VERSION, "rows": self.rows, "built_at": time.time()}
+        with open(os.path.join(self.directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        directory = os.path.join(self.store.path, self.version)
+        os.rename(self.directory, directory)
+        self.store.set_current(self.version)
+        return directory
+
+    def abort(self):
+        """Throw away a failed build."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class FinancialStatementStore:
+    """
+    Memory-mapped columnar copy of every annual report and its statements.
+
+    Copies are built by the build_statement_store job into versioned
+    directories and a CURRENT file names the one in use, so readers keep
+    their mapped copy while a new one is written and switch on their next
+    lookup after it is swapped in.
+    """
+
+    def __init__(self, path: str = None):
+        """Initialize the store; the current copy is opened lazily."""
+        self.path = path or settings.STATEMENT_STORE_PATH
+        self._current: Optional[StatementStoreVersion] = None
+        self._current_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def _pointer(self) -> str:
+        """Path of the file naming the current copy."""
+        return os.path.join(self.path, "CURRENT")
+
+    def start_build(self) -> StatementStoreBuilder:
+        """Start writing a new copy of the store."""
+        os.makedirs(self.path, exist_ok=True)
+        return StatementStoreBuilder(self)
+
+    def set_current(self, version: str, keep: int = 2):
+        """
+        Make a built copy current and delete all but the newest older ones.
+
+        Args:
+            version: Directory name of the built copy
+            keep: Number of copies kept, the current one included
+        """
+        temporary = self._pointer + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(temporary, self._pointer)
+        # Readers still mapping a deleted copy keep it until they switch
+        versions = sorted(
+            name for name in os.listdir(self.path)
+            if not name.startswith(("build-", "CURRENT")) and os.path.isdir(os.path.join(self.path, name))
+        )
+        for name in versions[:-keep] if keep else versions:
+            if name != version:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def current(self) -> Optional[StatementStoreVersion]:
+        """Get the copy in use, switching to a newer one when it was swapped in."""
+        try:
+            mtime = os.stat(self._pointer).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._current_mtime:
+            with self._lock:
+                if mtime != self._current_mtime:
+                    try:
+                        with open(self._pointer, encoding="utf-8") as f:
+                            version = StatementStoreVersion(os.path.join(self.path, f.read().strip()))
+                        if version.meta.get("schema_version") != SCHEMA_VERSION:
+                            version = None
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Error opening financial statement store: {e}")
+                        version = None
+                    self._current = version
+                    self._current_mtime = mtime
+        return self._current
+
+    def is_ready(self) -> bool:
+        """Check whether a copy of the store has been built."""
+        return settings.STATEMENT_STORE_ENABLED and self.current() is not None
+
+    def _records(self, version: StatementStoreVersion, table: str, rows: Iterable[int], fields: List[str] = None) -> List[Dict[str, Any]]:
+        """Turn stored rows back into CKAN style records."""
+        if table == "statements":
+            columns = STATEMENT_COLUMNS
+        else:
+            columns = {"statement_id": "int", **SECTION_COLUMNS[table], "year": "int", "currency": "str"}
+        if fields:
+            # Statement rows are always tagged with their report's year and currency
+            columns = {
+                name: kind for name, kind in columns.items()
+                if name in fields or (table != "statements" and name in ("year", "currency"))
+            }
+
+        rows = list(rows)
+        records = [{} for _ in rows]
+        for name, kind in columns.items():
+            if table != "statements" and name in ROW_FIELDS:
+                continue
+            column = version.column(table, name)
+            for record, row in zip(records, rows):
+                record[name] = _python_value(column[row], kind)
+
+        if table != "statements":
+            ids = version.column("statements", "id")
+            currencies = version.column("statements", "currency")
+            for record, row in zip(records, rows):
+                if "statement_id" in columns:
+                    record["statement_id"] = int(ids[row])
+                if "year" in columns:
+                    record["year"] = _python_value(version.years[row], "int")
+                if "currency" in columns:
+                    record["currency"] = normalized_currency({"currency": str(currencies[row])}) or None
+        return records
+
+    def get_financial_statements(self, reg_number: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get a company's annual report basic information, newest first.
+
+        Returns:
+            The records, or None if the company has no reports in the store
+        """
+        version = self.current()
+        if version is None:
+            return None
+        rows = version.company_rows(reg_number)
+        if rows.start == rows.stop:
+            return None
+        return self._records(version, "statements", range(rows.start, rows.stop))
+
+    def get_statement_records(self, section: str, reg_number: str, year: int = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get a company's rows of one statement section, newest first.
+
+        Args:
+            section: 'balance_sheets', 'income_statements' or 'cash_flow_statements'
+            reg_number: The company registration number
+            year: Optional specific year to filter by
+
+        Returns:
+            The normalized rows, or None if the company has no reports in the store
+        """
+        version = self.current()
+        if version is None:
+            return None
+        rows = version.company_rows(reg_number)
+        if rows.start == rows.stop:
+            return None
+        present = version.column(section, "_present")
+        selected = [
+            row for row in range(rows.start, rows.stop)
+            if present[row] and (not year or version.years[row] == year)
+        ]
+        return self._records(version, section, selected)
+
+    def get_multi_year_financial_data(self, reg_number: str, years: int = 5, fields: dict = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a company's statements of its most recent years.
+
+        Args:
+            reg_number: The company registration number
+            years: Number of years to retrieve
+            fields: Optional columns to return by section ('balance_sheets',
+                'income_statements', 'cash_flows')
+
+        Returns:
+            Dictionary shaped like CKANService.get_multi_year_financial_data,
+            or None if the company has no reports in the store
+        """
+        version = self.current()
+        if version is None:
+            return None
+        rows = version.company_rows(reg_number)
+        if rows.start == rows.stop:
+            return None
+        fields = fields or {}
+        latest = range(rows.start, min(rows.stop, rows.start + years))
+        basic_info = self._records(version, "statements", latest)
+        result = {"years": [stmt.get("year") for stmt in basic_info], "basic_info": basic_info}
+        for key, section in (("balance_sheets", "balance_sheets"), ("income_statements", "income_statements"), ("cash_flows", "cash_flow_statements")):
+            present = version.column(section, "_present")
+            result[key] = self._records(version, section, [row for row in latest if present[row]], fields.get(key))
+        return result
+
+
+# Create a singleton instance
+statement_store = FinancialStatementStore()
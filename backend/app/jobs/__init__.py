@@ -0,0 +1,3 @@
+"""
+Batch jobs for TURBO_AML.
+"""
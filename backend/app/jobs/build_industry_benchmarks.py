@@ -0,0 +1,88 @@
+"""
+Build the industry benchmark tables from the financial statement store.
+
+Companies are grouped by the NACE code of their business activity, read
+from the local mirror when it holds the business resource, otherwise from
+CKAN. Run it after build_statement_store.
+
+Usage:
+    python -m app.jobs.build_industry_benchmarks
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict
+from app.core.config import settings
+from app.db.mirror import MIRROR_RESOURCES, mirror_store
+from app.db.statement_store import statement_store
+from app.services.ckan_client import ckan_client
+from app.services.ckan_paging import iter_pages
+from app.services.ckan_scheduler import BACKGROUND, OutboundScheduler, ckan_priority
+from app.services.industry_benchmarks import build_tables, nace_code, save_tables
+
+
+def _add_codes(codes: Dict[str, str], records: list):
+    """Record the NACE code of every company's first business activity that has one."""
+    _, key_field = MIRROR_RESOURCES["business"]
+    for record in records:
+        reg_number = record.get(key_field)
+        if reg_number and str(reg_number) not in codes:
+            code = nace_code([record])
+            if code:
+                codes[str(reg_number)] = code
+
+
+async def load_nace_codes(page_size: int) -> Dict[str, str]:
+    """
+    Get the NACE code of every company with one.
+
+    Returns:
+        NACE code by registration number
+    """
+    resource_id, _ = MIRROR_RESOURCES["business"]
+    codes = {}
+    if mirror_store.has_resource(resource_id):
+        for records in mirror_store.iter_records(resource_id):
+            _add_codes(codes, records)
+        return codes
+
+    ckan_client.scheduler = OutboundScheduler(rate=settings.CKAN_JOB_RATE_LIMIT)
+    try:
+        with ckan_priority(BACKGROUND):
+            async for records in iter_pages(ckan_client.datastore_search, resource_id, page_size, include_total=False, timeout=120):
+                _add_codes(codes, records)
+    finally:
+        await ckan_client.close()
+    return codes
+
+
+async def build(page_size: int, min_companies: int):
+    """Compute the benchmark tables and swap them in."""
+    started = time.monotonic()
+    version = statement_store.current()
+    if version is None:
+        raise SystemExit("The financial statement store has not been built; run app.jobs.build_statement_store first")
+
+    codes = await load_nace_codes(page_size)
+    tables = build_tables(version, codes, min_companies)
+    save_tables(tables)
+    print(
+        f"Industry benchmarks built: {len(tables['count'])} distributions of {len(tables['values'])} values, "
+        f"{len(codes)} companies with a NACE code, in {time.monotonic() - started:.1f}s"
+    )
+
+
+def main():
+    """Parse command line arguments and build the benchmarks."""
+    parser = argparse.ArgumentParser(description="Build the industry benchmark tables")
+    parser.add_argument("--page-size", type=int, default=10000, help="Records per CKAN request")
+    parser.add_argument(
+        "--min-companies", type=int, default=settings.INDUSTRY_BENCHMARK_MIN_COMPANIES,
+        help="Fewest companies a benchmark group may have in a year"
+    )
+    args = parser.parse_args()
+    asyncio.run(build(args.page_size, args.min_companies))
+
+
+if __name__ == "__main__":
+    main()
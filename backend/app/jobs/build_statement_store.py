@@ -0,0 +1,104 @@
+"""
+Build the memory-mapped financial statement store.
+
+The store is filled from the local mirror when it holds the annual report
+and statement resources, otherwise straight from CKAN. Every build writes a
+complete new copy and swaps it in, so run it after each mirror sync.
+
+Usage:
+    python -m app.jobs.build_statement_store
+"""
+import argparse
+import asyncio
+import time
+from app.core.config import settings
+from app.db.mirror import MIRROR_RESOURCES, STATEMENT_RESOURCES, MirrorStore, mirror_store
+from app.db.statement_store import FinancialStatementStore, statement_store
+from app.services.ckan_client import AsyncCKANClient, ckan_client
+from app.services.ckan_paging import iter_pages
+from app.services.ckan_scheduler import BACKGROUND, OutboundScheduler, ckan_priority
+
+# Resources the store is built from, annual reports first
+STORE_RESOURCES = ("financial_statements",) + STATEMENT_RESOURCES
+
+
+def build_from_mirror(store: MirrorStore, statements: FinancialStatementStore) -> dict:
+    """
+    Build the statement store from the mirrored resources.
+
+    Returns:
+        Dictionary with the number of rows stored per resource
+    """
+    builder = statements.start_build()
+    counts = {}
+    try:
+        for name in STORE_RESOURCES:
+            resource_id, _ = MIRROR_RESOURCES[name]
+            count = 0
+            for records in store.iter_records(resource_id):
+                if name == "financial_statements":
+                    count += builder.add_statements(records)
+                else:
+                    count += builder.add_section(name, records)
+            counts[name] = count
+        builder.finish()
+    except BaseException:
+        builder.abort()
+        raise
+    return counts
+
+
+async def build_from_ckan(client: AsyncCKANClient, statements: FinancialStatementStore, page_size: int = 10000) -> dict:
+    """
+    Build the statement store by paging through the resources on CKAN.
+
+    Returns:
+        Dictionary with the number of rows stored per resource
+    """
+    builder = statements.start_build()
+    counts = {}
+    try:
+        for name in STORE_RESOURCES:
+            resource_id, _ = MIRROR_RESOURCES[name]
+            count = 0
+            pages = iter_pages(client.datastore_search, resource_id, page_size, sort="_id", include_total=False, timeout=120)
+            async for records in pages:
+                if name == "financial_statements":
+                    count += builder.add_statements(records)
+                else:
+                    count += builder.add_section(name, records)
+            counts[name] = count
+        builder.finish()
+    except BaseException:
+        builder.abort()
+        raise
+    return counts
+
+
+async def build(page_size: int):
+    """Build the store from the mirror, or from CKAN without one."""
+    started = time.monotonic()
+    if all(mirror_store.has_resource(MIRROR_RESOURCES[name][0]) for name in STORE_RESOURCES):
+        counts = build_from_mirror(mirror_store, statement_store)
+        print(f"Statement store built from mirror: {counts} in {time.monotonic() - started:.1f}s")
+        return
+
+    ckan_client.scheduler = OutboundScheduler(rate=settings.CKAN_JOB_RATE_LIMIT)
+    try:
+        with ckan_priority(BACKGROUND):
+            counts = await build_from_ckan(ckan_client, statement_store, page_size)
+        print(f"Statement store built from CKAN: {counts} in {time.monotonic() - started:.1f}s")
+    finally:
+        await ckan_client.close()
+
+
+def main():
+    """Parse command line arguments and build the store."""
+    parser = argparse.ArgumentParser(description="Build the memory-mapped financial statement store")
+    parser.add_argument("--page-size", type=int, default=10000, help="Records per CKAN request")
+    args = parser.parse_args()
+    asyncio.run(build(args.page_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Download CKAN resources into the local mirror.
+
+Usage:
+    python -m app.jobs.ingest_mirror [--resources company balance_sheets ...]
+"""
+import argparse
+import asyncio
+import time
+from app.db.mirror import MIRROR_RESOURCES, MirrorStore, mirror_store
+from app.core.config import settings
+from app.services.ckan_client import AsyncCKANClient, ckan_client
+from app.services.ckan_scheduler import BACKGROUND, OutboundScheduler, ckan_priority
+from app.services.ckan_paging import iter_pages
+
+# Watermark used by incremental sync; resources not listed use CKAN's '_id'
+SYNC_WATERMARK_FIELDS = {
+    MIRROR_RESOURCES["taxpayer_ratings"][0]: "informacijas_atjaunosanas_datums",
+}
+
+
+async def ingest_resource(
+    client: AsyncCKANClient,
+    store: MirrorStore,
+    resource_id: str,
+    page_size: int = 10000,
+    parallel: int = 1
+) -> int:
+    """
+    Download every record of a resource and load it into the mirror.
+
+    Args:
+        client: The CKAN client to download with
+        store: The mirror store to load into
+        resource_id: The CKAN resource id
+        page_size: Number of records requested per datastore_search page
+        parallel: Number of pages requested at a time
+
+    Returns:
+        The number of records loaded
+    """
+    store.start_load(resource_id)
+    loaded = 0
+    pages = iter_pages(
+        client.datastore_search,
+        resource_id,
+        page_size,
+        parallel,
+        sort="_id",
+        include_total=False,
+        timeout=120
+    )
+    async for records in pages:
+        loaded += store.stage_records(resource_id, records)
+    store.finish_load(resource_id)
+    
+    # Later incremental syncs continue from the loaded rows
+    watermark_field = SYNC_WATERMARK_FIELDS.get(resource_id, "_id")
+    store.set_watermark(resource_id, watermark_field, store.current_watermark(resource_id, watermark_field))
+    return loaded
+
+
+async def ingest(names: list, page_size: int, parallel: int = 1):
+    """Ingest the named resources one after another."""
+    # Leave most of the shared CKAN quota to the API's interactive traffic
+    ckan_client.scheduler = OutboundScheduler(rate=settings.CKAN_JOB_RATE_LIMIT)
+    try:
+        with ckan_priority(BACKGROUND):
+            for name in names:
+                resource_id, _ = MIRROR_RESOURCES[name]
+                started = time.monotonic()
+                count = await ingest_resource(ckan_client, mirror_store, resource_id, page_size, parallel)
+                print(f"Loaded {count} {name} records in {time.monotonic() - started:.1f}s")
+    finally:
+        await ckan_client.close()
+
+
+def main():
+    """Parse command line arguments and run the ingestion."""
+    parser = argparse.ArgumentParser(description="Download CKAN resources into the local mirror")
+    parser.add_argument(
+        "--resources",
+        nargs="+",
+        choices=sorted(MIRROR_RESOURCES),
+        default=list(MIRROR_RESOURCES),
+        help="Resources to download (default: all)"
+    )
+    parser.add_argument("--page-size", type=int, default=10000, help="Records per request")
+    parser.add_argument("--parallel", type=int, default=1, help="Pages requested at a time")
+    args = parser.parse_args()
+    asyncio.run(ingest(args.resources, args.page_size, args.parallel))
+
+
+if __name__ == "__main__":
+    main()
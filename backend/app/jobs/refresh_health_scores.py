@@ -0,0 +1,143 @@
+"""
+Refresh the materialized health scores of every company.
+
+Companies are scored from the financial statement store in chunks spread
+over a process pool. Each worker maps the store files itself, scores its
+chunk with the vectorized batch scorer and builds assessments only for the
+companies whose inputs hash changed since the last refresh. Run it after
+build_statement_store.
+
+Usage:
+    python -m app.jobs.refresh_health_scores [--workers 4] [--full]
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+import numpy as np
+from app.db.health_scores import HealthScoreStore, assessment_row, health_score_store
+from app.db.statement_store import StatementStoreVersion, statement_store
+from app.services.financial_batch import (
+    BALANCE_SHEET_COLUMNS, GROWTH_METRICS, INCOME_STATEMENT_COLUMNS, batch_health_scorer, scoring_version
+)
+
+# Trend directions, sorted, for hashing them as numbers
+TREND_DIRECTIONS = np.array(["DECLINING", "IMPROVING", "STABLE"])
+
+
+def score_chunk(directory: str, row_start: int, row_end: int, known_hashes: Dict[str, str]) -> Tuple[List[str], List[tuple]]:
+    """
+    Score the companies in a range of statement store rows.
+
+    Args:
+        directory: Directory of the statement store copy
+        row_start: First row; starts a company
+        row_end: Row after the last one; ends a company
+        known_hashes: Stored inputs hash of the chunk's companies
+
+    Returns:
+        Registration numbers of every scored company, and health_scores
+        rows of those whose inputs changed
+    """
+    version = StatementStoreVersion(directory)
+    regcodes, balance, income, years, trends = batch_health_scorer.columns_from_store(version, row_start, row_end)
+    if not len(regcodes):
+        return [], []
+    batch = batch_health_scorer.score(balance, income, years, trends)
+
+    # One row of input values per company, hashed with the scoring code
+    growth_rates = trends.growth_rates()
+    inputs = np.column_stack(
+        [balance[name] for name in BALANCE_SHEET_COLUMNS] +
+        [income[name] for name in INCOME_STATEMENT_COLUMNS] +
+        [years] +
+        [growth_rates[name] for name in GROWTH_METRICS] +
+        [np.searchsorted(TREND_DIRECTIONS, trends.trend_direction.astype(str))]
+    ).astype(np.float64)
+    version_bytes = scoring_version().encode("ascii")
+    scored, rows = [], []
+    for index, regcode in enumerate(regcodes.tolist()):
+        reg_number = regcode.decode("utf-8")
+        inputs_hash = hashlib.sha256(version_bytes + inputs[index].tobytes()).hexdigest()[:16]
+        scored.append(reg_number)
+        if known_hashes.get(reg_number) != inputs_hash:
+            rows.append(assessment_row(batch.assessment(index, reg_number), inputs_hash))
+    return scored, rows
+
+
+def chunk_bounds(version: StatementStoreVersion, chunk_rows: int) -> List[Tuple[int, int]]:
+    """Split the store rows into ranges of about chunk_rows rows that never split a company."""
+    regcodes = version.regcodes
+    starts = np.flatnonzero(np.append(True, regcodes[1:] != regcodes[:-1])) if version.rows else np.array([], dtype=int)
+    bounds = []
+    position = 0
+    while position < version.rows:
+        # Extend the chunk to the start of the next company
+        index = np.searchsorted(starts, position + chunk_rows, side="left")
+        end = int(starts[index]) if index < len(starts) else version.rows
+        bounds.append((position, end))
+        position = end
+    return bounds
+
+
+def refresh(store: HealthScoreStore, workers: int, chunk_rows: int, full: bool = False) -> dict:
+    """
+    Score every company in the statement store and update the table.
+
+    Args:
+        store: The materialized score table
+        workers: Number of worker processes
+        chunk_rows: Statement store rows scored per task
+        full: Rewrite every row even if its inputs did not change
+
+    Returns:
+        Dictionary with the numbers of scored, written and removed companies
+    """
+    version = statement_store.current()
+    if version is None:
+        raise SystemExit("The financial statement store has not been built; run app.jobs.build_statement_store first")
+
+    if store.prepare(scoring_version()):
+        print("Scoring code or assessment model changed; recreated the health score table")
+    known = {} if full else store.get_hashes()
+    bounds = chunk_bounds(version, chunk_rows)
+    scored_all, written = set(), 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for row_start, row_end in bounds:
+            chunk_regcodes = {reg.decode("utf-8") for reg in np.unique(version.regcodes[row_start:row_end]).tolist()}
+            chunk_hashes = {reg: known[reg] for reg in chunk_regcodes if reg in known}
+            futures.append(pool.submit(score_chunk, version.directory, row_start, row_end, chunk_hashes))
+        for future in futures:
+            scored, rows = future.result()
+            scored_all.update(scored)
+            written += store.upsert(rows)
+
+    removed = store.delete(set(store.get_hashes()) - scored_all)
+    store.set_state({
+        "scoring_version": scoring_version(),
+        "statement_store": os.path.basename(version.directory),
+        "refreshed_at": time.time(),
+    })
+    return {"scored": len(scored_all), "written": written, "removed": removed}
+
+
+def main():
+    """Parse command line arguments and refresh the scores."""
+    parser = argparse.ArgumentParser(description="Refresh the materialized company health scores")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-rows", type=int, default=50000, help="Statement store rows per task")
+    parser.add_argument("--full", action="store_true", help="Rewrite every score")
+    args = parser.parse_args()
+    started = time.monotonic()
+    result = refresh(health_score_store, args.workers, args.chunk_rows, args.full)
+    print(
+        f"Health scores refreshed: {result['scored']} companies scored, {result['written']} written, "
+        f"{result['removed']} removed in {time.monotonic() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
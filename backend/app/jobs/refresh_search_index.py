@@ -0,0 +1,102 @@
+"""
+Build or incrementally refresh the local company search index.
+
+The index is filled from the local mirror when it holds the company
+registry, otherwise straight from CKAN. Incremental refreshes re-index only
+the companies the mirror sync recorded as changed since the last refresh.
+
+Usage:
+    python -m app.jobs.refresh_search_index [--full]
+"""
+import argparse
+import asyncio
+import time
+from app.core.config import settings
+from app.db.mirror import MIRROR_RESOURCES, MirrorStore, mirror_store
+from app.db.search_index import CompanySearchIndex, company_search_index
+from app.services.ckan_client import AsyncCKANClient, ckan_client
+from app.services.ckan_paging import iter_pages
+from app.services.ckan_scheduler import BACKGROUND, OutboundScheduler, ckan_priority
+
+
+def refresh_from_mirror(store: MirrorStore, index: CompanySearchIndex, full: bool = False) -> dict:
+    """
+    Rebuild or refresh the index from the mirrored company registry.
+
+    Args:
+        store: The mirror holding the company resource
+        index: The search index to update
+        full: Rebuild even if an incremental refresh is possible
+
+    Returns:
+        Dictionary with the number of indexed companies and whether the index was rebuilt
+    """
+    resource_id, _ = MIRROR_RESOURCES["company"]
+    started = time.time()
+    refreshed_at = index.get_refreshed_at() if index.is_ready() else None
+
+    if full or refreshed_at is None:
+        count = index.rebuild(store.iter_records(resource_id))
+        index.set_refreshed_at(started)
+        return {"companies": count, "rebuilt": True}
+
+    changed = [reg for reg, resources in store.changed_since(refreshed_at).items() if "company" in resources]
+    count = 0
+    # Stay below SQLite's bound parameter limit
+    for start in range(0, len(changed), 500):
+        chunk = changed[start:start + 500]
+        result = store.search(resource_id, filters={"regcode": chunk}, limit=len(chunk))
+        count += index.upsert(result.get("records", []))
+    if changed:
+        index.store_facets()
+    index.set_refreshed_at(started)
+    return {"companies": count, "rebuilt": False}
+
+
+async def rebuild_from_ckan(client: AsyncCKANClient, index: CompanySearchIndex, page_size: int = 10000) -> int:
+    """
+    Rebuild the index by paging through the company registry on CKAN.
+
+    Returns:
+        The number of companies indexed
+    """
+    resource_id, _ = MIRROR_RESOURCES["company"]
+    started = time.time()
+    index.start_rebuild()
+    count = 0
+    async for records in iter_pages(client.datastore_search, resource_id, page_size, include_total=False, timeout=120):
+        count += index.stage(records)
+    index.finish_rebuild()
+    index.set_refreshed_at(started)
+    return count
+
+
+async def refresh(full: bool, page_size: int):
+    """Refresh the index from the mirror, or rebuild it from CKAN without one."""
+    started = time.monotonic()
+    if mirror_store.has_resource(MIRROR_RESOURCES["company"][0]):
+        result = refresh_from_mirror(mirror_store, company_search_index, full)
+        mode = "rebuilt" if result["rebuilt"] else "refreshed"
+        print(f"Search index {mode} from mirror: {result['companies']} companies in {time.monotonic() - started:.1f}s")
+        return
+
+    ckan_client.scheduler = OutboundScheduler(rate=settings.CKAN_JOB_RATE_LIMIT)
+    try:
+        with ckan_priority(BACKGROUND):
+            count = await rebuild_from_ckan(ckan_client, company_search_index, page_size)
+        print(f"Search index rebuilt from CKAN: {count} companies in {time.monotonic() - started:.1f}s")
+    finally:
+        await ckan_client.close()
+
+
+def main():
+    """Parse command line arguments and refresh the index."""
+    parser = argparse.ArgumentParser(description="Build or refresh the local company search index")
+    parser.add_argument("--full", action="store_true", help="Rebuild the whole index")
+    parser.add_argument("--page-size", type=int, default=10000, help="Records per CKAN request")
+    args = parser.parse_args()
+    asyncio.run(refresh(args.full, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
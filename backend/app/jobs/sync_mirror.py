@@ -0,0 +1,274 @@
+"""
+Incrementally sync the local CKAN mirror.
+
+For every resource only rows past the last recorded watermark are fetched
+and upserted, and the registration numbers they belong to are recorded so
+caches and scores can be invalidated selectively. Rows are read with
+datastore_search_sql, or with datastore_search on instances without it, and
+change records older than MIRROR_CHANGE_RETENTION_DAYS are pruned.
+
+Usage:
+    python -m app.jobs.sync_mirror [--resources company taxpayer_ratings ...]
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List
+from app.db.mirror import MIRROR_RESOURCES, RESOURCE_KEY_FIELDS, STATEMENT_RESOURCES, MirrorStore, mirror_store
+from app.db.search_index import company_search_index
+from app.jobs.ingest_mirror import SYNC_WATERMARK_FIELDS, ingest_resource
+from app.jobs.refresh_search_index import refresh_from_mirror
+from app.core.config import settings
+from app.services.ckan_client import AsyncCKANClient, CKANError, ckan_client
+from app.services.ckan_scheduler import BACKGROUND, OutboundScheduler, ckan_priority
+
+
+def _sql_literal(value) -> str:
+    """Quote a watermark value for use in datastore_search_sql."""
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+async def _is_republished(client: AsyncCKANClient, store: MirrorStore, resource_id: str, use_sql: bool) -> bool:
+    """
+    Check whether a resource was republished since it was mirrored.
+
+    A republished resource restarts its '_id' sequence, so rows up to the
+    local '_id' watermark are compared: their count must match the mirror,
+    and the row at the watermark must still carry the same key.
+
+    Args:
+        client: The CKAN client to query
+        store: The mirror store holding the resource
+        resource_id: The CKAN resource id
+        use_sql: Query with datastore_search_sql rather than datastore_search
+
+    Returns:
+        Whether the mirrored copy must be reloaded from scratch
+    """
+    local_count = store.count_records(resource_id)
+    local_max_id = int(store.current_watermark(resource_id) or 0)
+    if not local_count:
+        return False
+
+    if use_sql:
+        result = await client.datastore_search_sql(
+            f'SELECT MAX(_id) AS max_id, SUM(CASE WHEN _id <= {local_max_id} THEN 1 ELSE 0 END) AS known '
+            f'FROM "{resource_id}"'
+        )
+        remote = (result.get("records") or [{}])[0]
+        if int(remote.get("max_id") or 0) < local_max_id or int(remote.get("known") or 0) != local_count:
+            return True
+        result = await client.datastore_search_sql(f'SELECT * FROM "{resource_id}" WHERE _id = {local_max_id}')
+    else:
+        # Appended rows sort after the mirrored ones, so the last mirrored row keeps its offset
+        result = await client.datastore_search(
+            resource_id, limit=1, offset=local_count - 1, sort="_id", include_total=True, timeout=120
+        )
+        if (result.get("total") or 0) < local_count:
+            return True
+    boundary = (result.get("records") or [None])[0]
+    if boundary is None or int(boundary.get("_id") or 0) != local_max_id:
+        return True
+    key_field = RESOURCE_KEY_FIELDS.get(resource_id)
+    local = store.get_record(resource_id, local_max_id) or {}
+    return str(boundary.get(key_field)) != str(local.get(key_field))
+
+
+async def _new_rows_sql(
+    client: AsyncCKANClient,
+    resource_id: str,
+    watermark_field: str,
+    watermark,
+    page_size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Page through the rows past the watermark with datastore_search_sql."""
+    conditions = []
+    if watermark is not None:
+        value = int(watermark) if watermark_field == "_id" else watermark
+        conditions.append(f'"{watermark_field}" > {_sql_literal(value)}')
+    last_id = 0
+    while True:
+        # Keyset paging on '_id' so deep pages stay cheap
+        where = " AND ".join(conditions + [f"_id > {last_id}"])
+        result = await client.datastore_search_sql(
+            f'SELECT * FROM "{resource_id}" WHERE {where} ORDER BY _id LIMIT {int(page_size)}',
+            timeout=120
+        )
+        records = result.get("records", [])
+        if not records:
+            return
+        # SQL results include the full-text column; it is not part of the record
+        for record in records:
+            record.pop("_full_text", None)
+        yield records
+        last_id = records[-1]["_id"]
+        if len(records) < page_size:
+            return
+
+
+async def _new_rows_search(
+    client: AsyncCKANClient,
+    store: MirrorStore,
+    resource_id: str,
+    watermark_field: str,
+    watermark,
+    page_size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Page through the rows past the watermark with datastore_search.
+
+    datastore_search cannot filter on a range. New '_id' rows are read from
+    the offset of the mirrored row count on; other watermark fields are read
+    newest first until rows at or below the watermark are reached.
+    """
+    if watermark_field == "_id":
+        offset = store.count_records(resource_id) if watermark is not None else 0
+        sort = "_id"
+    else:
+        offset = 0
+        sort = f'"{watermark_field}" desc, _id'
+    while True:
+        result = await client.datastore_search(
+            resource_id, limit=page_size, offset=offset, sort=sort, include_total=False, timeout=120
+        )
+        records = result.get("records", [])
+        if not records:
+            return
+        offset += len(records)
+        if watermark_field == "_id":
+            new = [record for record in records if watermark is None or int(record["_id"]) > int(watermark)]
+            reached = False
+        else:
+            # Rows without a value sort first and are never past the watermark
+            dated = [record for record in records if record.get(watermark_field) is not None]
+            new = [record for record in dated if watermark is None or str(record[watermark_field]) > str(watermark)]
+            reached = len(new) < len(dated)
+        if new:
+            yield new
+        if reached or len(records) < page_size:
+            return
+
+
+async def sync_resource(
+    client: AsyncCKANClient,
+    store: MirrorStore,
+    name: str,
+    page_size: int = 10000,
+    use_sql: bool = None
+) -> dict:
+    """
+    Fetch new or changed rows of one resource and upsert them into the mirror.
+
+    Rows are read with datastore_search_sql when it is enabled, and with
+    datastore_search when it is disabled or the instance rejects SQL.
+
+    Args:
+        client: The CKAN client to download with
+        store: The mirror store to update
+        name: The mirrored resource name
+        page_size: Number of rows requested per page
+        use_sql: Try datastore_search_sql (default: CKAN_SQL_ENABLED)
+
+    Returns:
+        Dictionary with the number of synced rows, changed registration
+        numbers, and whether SQL was used
+    """
+    use_sql = settings.CKAN_SQL_ENABLED if use_sql is None else use_sql
+    resource_id, _ = MIRROR_RESOURCES[name]
+    watermark_field = SYNC_WATERMARK_FIELDS.get(resource_id, "_id")
+
+    # Nothing to be incremental about yet: do a full load
+    if not store.has_resource(resource_id):
+        rows = await ingest_resource(client, store, resource_id, page_size)
+        return {"rows": rows, "changed": [], "full_reload": True, "sql": use_sql}
+
+    try:
+        if await _is_republished(client, store, resource_id, use_sql):
+            rows = await ingest_resource(client, store, resource_id, page_size)
+            return {"rows": rows, "changed": [], "full_reload": True, "sql": use_sql}
+
+        recorded = store.get_watermark(resource_id)
+        if recorded and recorded[0] == watermark_field:
+            watermark = recorded[1]
+        else:
+            watermark = store.current_watermark(resource_id, watermark_field)
+
+        if use_sql:
+            pages = _new_rows_sql(client, resource_id, watermark_field, watermark, page_size)
+        else:
+            pages = _new_rows_search(client, store, resource_id, watermark_field, watermark, page_size)
+        rows = 0
+        keys = []
+        new_watermark = watermark
+        async for records in pages:
+            keys.extend(store.upsert_records(resource_id, records))
+            rows += len(records)
+            for record in records:
+                value = record.get(watermark_field)
+                if watermark_field == "_id":
+                    if value is not None and (new_watermark is None or int(value) > int(new_watermark)):
+                        new_watermark = value
+                elif value is not None and (new_watermark is None or str(value) > str(new_watermark)):
+                    new_watermark = value
+    except CKANError as e:
+        if not use_sql or e.is_upstream_failure:
+            raise
+        # The instance rejects SQL queries; upserts so far are repeated harmlessly
+        print(f"CKAN SQL search unavailable, syncing {name} with datastore_search: {e}")
+        return await sync_resource(client, store, name, page_size, use_sql=False)
+
+    store.set_watermark(resource_id, watermark_field, new_watermark)
+
+    changed = store.registration_numbers_for_statements(keys) if name in STATEMENT_RESOURCES else sorted(set(keys))
+    store.record_changes(name, changed)
+    return {"rows": rows, "changed": changed, "full_reload": False, "sql": use_sql}
+
+
+async def sync(names: list, page_size: int):
+    """Sync the named resources one after another."""
+    # Leave most of the shared CKAN quota to the API's interactive traffic
+    ckan_client.scheduler = OutboundScheduler(rate=settings.CKAN_JOB_RATE_LIMIT)
+    try:
+        with ckan_priority(BACKGROUND):
+            use_sql = settings.CKAN_SQL_ENABLED
+            # Annual reports go first so statement rows can be resolved to companies
+            for name in sorted(names, key=lambda n: n != "financial_statements"):
+                started = time.monotonic()
+                result = await sync_resource(ckan_client, mirror_store, name, page_size, use_sql)
+                use_sql = result["sql"]
+                mode = "full reload" if result["full_reload"] else "incremental"
+                print(
+                    f"Synced {result['rows']} {name} rows ({mode}), "
+                    f"{len(result['changed'])} companies changed, in {time.monotonic() - started:.1f}s"
+                )
+
+            # Change records only need to outlive the consumers catching up on them
+            mirror_store.prune_changes(time.time() - settings.MIRROR_CHANGE_RETENTION_DAYS * 86400)
+
+            # Keep the search index in step with the registry
+            if "company" in names:
+                result = refresh_from_mirror(mirror_store, company_search_index)
+                print(f"Search index updated: {result['companies']} companies")
+    finally:
+        await ckan_client.close()
+
+
+def main():
+    """Parse command line arguments and run the sync."""
+    parser = argparse.ArgumentParser(description="Incrementally sync the local CKAN mirror")
+    parser.add_argument(
+        "--resources",
+        nargs="+",
+        choices=sorted(MIRROR_RESOURCES),
+        default=list(MIRROR_RESOURCES),
+        help="Resources to sync (default: all)"
+    )
+    parser.add_argument("--page-size", type=int, default=10000, help="Rows per request")
+    args = parser.parse_args()
+    asyncio.run(sync(args.resources, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
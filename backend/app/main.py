@@ -1,11 +1,17 @@
 """
 Main FastAPI application entry point.
 """
+import asyncio
 import os
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.api.endpoints import search, company, financial
+from app.core.config import settings
+from app.db.search_index import company_search_index
+from app.services.ckan_cache import ckan_cache
+from app.services.ckan_client import ckan_client
+from app.services.ckan_service import ckan_service, track_stale_resources
 
 # Custom middleware to handle cookies
 class CookieMiddleware(BaseHTTPMiddleware):
@@ -25,6 +31,17 @@ class CookieMiddleware(BaseHTTPMiddleware):
         
         return response
 
+# Custom middleware to flag responses built from stale CKAN data
+class StaleDataMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stale = track_stale_resources()
+        response = await call_next(request)
+        
+        if stale:
+            response.headers["X-Data-Stale"] = ",".join(sorted(stale))
+        
+        return response
+
 # Create FastAPI app
 app = FastAPI(
     title="TURBO_AML API",
@@ -66,16 +83,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Data-Stale"],
 )
 
 # Add custom cookie middleware
 app.add_middleware(CookieMiddleware)
 
+# Add stale data middleware
+app.add_middleware(StaleDataMiddleware)
+
 # Import and include API routers
 app.include_router(search.router, prefix="/api", tags=["search"])
 app.include_router(company.router, prefix="/api", tags=["company"])
 app.include_router(financial.router, prefix="/api", tags=["financial"])
 
+@app.on_event("startup")
+async def load_search_facets():
+    """Load the search facet bitsets before the first request needs them."""
+    if settings.SEARCH_INDEX_ENABLED and await asyncio.to_thread(company_search_index.is_ready):
+        await asyncio.to_thread(company_search_index.facet_index)
+
+@app.on_event("shutdown")
+async def close_ckan_client():
+    """Release pooled CKAN and Redis connections on shutdown."""
+    await ckan_client.close()
+    await ckan_cache.close()
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -93,4 +126,14 @@ async def cors_info():
         "allowed_origins": get_cors_origins(),
         "external_ip": os.getenv("EXTERNAL_IP", "not_set"),
         "debug_mode": os.getenv("DEBUG", "False")
-    } 
\ No newline at end of file
+    }
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """Debug endpoint to see CKAN cache, request coalescing, circuit breaker and scheduler state for this worker."""
+    return {
+        **ckan_cache.get_stats(),
+        **ckan_service.single_flight.get_stats(),
+        "circuit_breakers": ckan_service.breakers.get_stats(),
+        "scheduler": ckan_client.scheduler.get_stats(),
+    }
@@ -172,15 +172,35 @@ class CompanyResponse(CompanyBase):
         """Pydantic config."""
         from_attributes = True
         
+class FacetCount(BaseModel):
+    """Model for the number of search results having a facet value."""
+    value: str = Field(..., description="Facet value, e.g. a type code")
+    label: Optional[str] = Field(None, description="Display text of the value")
+    count: int = Field(..., description="Number of matching companies with the value")
+
 class CompanyListResponse(BaseModel):
     """Model for company list response."""
     count: int = Field(..., description="Total number of results")
     companies: List[CompanyResponse] = Field(..., description="List of companies")
+    facets: Optional[Dict[str, List[FacetCount]]] = Field(None, description="Result counts per facet value")
+    facets_partial: Optional[bool] = Field(
+        None, description="Whether facet counts cover only the best-ranked matches of a very broad query"
+    )
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, None on the last one")
     
     class Config:
         """Pydantic config."""
         from_attributes = True
 
+class CompanySuggestion(BaseModel):
+    """Model for a typeahead suggestion."""
+    registration_number: str = Field(..., description="Company registration number")
+    name: str = Field(..., description="Company name")
+
+class CompanySuggestResponse(BaseModel):
+    """Model for typeahead suggestions."""
+    suggestions: List[CompanySuggestion] = Field(..., description="Suggested companies, most popular first")
+
 class SearchHistoryItem(BaseModel):
     """Model for search history item."""
     reg_number: str = Field(..., description="Company registration number")
@@ -300,6 +300,14 @@ class FinancialTrendsResponse(BaseModel):
     predictions: Dict[str, Any] = {}
 
 
+class IndustryBenchmarksResponse(BaseModel):
+    """Response model for industry benchmark comparisons."""
+    registration_number: str
+    nace_code: Optional[str] = None
+    year: int
+    benchmarks: List[IndustryBenchmark] = []
+
+
 class RiskAssessmentResponse(BaseModel):
     """Response model for risk assessment analysis."""
     registration_number: str
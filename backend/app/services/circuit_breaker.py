@@ -0,0 +1,121 @@
+"""
+Per-resource circuit breakers for outbound CKAN calls.
+"""
+import time
+from collections import deque
+from typing import Dict
+from app.core.config import settings
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker.
+
+    CLOSED: calls flow and outcomes are recorded over a sliding window.
+    OPEN: the error rate reached the threshold; calls are rejected until
+        the reset timeout has passed.
+    HALF_OPEN: one probe call is let through; its outcome closes or
+        re-opens the breaker.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(
+        self,
+        error_threshold: float = None,
+        window: int = None,
+        min_calls: int = None,
+        reset_timeout: float = None
+    ):
+        """Initialize a closed breaker."""
+        self.error_threshold = error_threshold if error_threshold is not None else settings.CKAN_BREAKER_ERROR_THRESHOLD
+        self.min_calls = min_calls if min_calls is not None else settings.CKAN_BREAKER_MIN_CALLS
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.CKAN_BREAKER_RESET_TIMEOUT
+        self.outcomes = deque(maxlen=window or settings.CKAN_BREAKER_WINDOW)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Check whether a call may go out now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record_success(self):
+        """Record a successful call."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self.outcomes.clear()
+            self.probe_in_flight = False
+        self.outcomes.append(True)
+
+    def release(self):
+        """
+        Release a call whose outcome is unknown, e.g. one cancelled by a deadline.
+
+        A cancelled HALF_OPEN probe frees the probe slot, so the next call
+        probes again instead of the breaker rejecting every call for good.
+        """
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call and open the breaker if the error rate is too high."""
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self.outcomes.append(False)
+        if len(self.outcomes) >= self.min_calls and self.error_rate() >= self.error_threshold:
+            self._open()
+
+    def error_rate(self) -> float:
+        """Get the error rate over the sliding window."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get the breaker state and counters."""
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 4),
+            "calls_in_window": len(self.outcomes),
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Lazily created circuit breakers, one per CKAN resource."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_resource(self, resource_id: str) -> CircuitBreaker:
+        """Get the breaker guarding a resource."""
+        breaker = self._breakers.get(resource_id)
+        if breaker is None:
+            breaker = self._breakers[resource_id] = CircuitBreaker()
+        return breaker
+
+    def get_stats(self) -> Dict[str, Dict[str, object]]:
+        """Get the stats of every breaker by resource id."""
+        return {resource_id: breaker.get_stats() for resource_id, breaker in self._breakers.items()}
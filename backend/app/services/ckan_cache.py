@@ -0,0 +1,246 @@
+"""
+Two-tier response cache for CKAN lookups.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Redis is optional; the cache then runs in-process only
+    redis_asyncio = None
+
+
+class LRUCache:
+    """
+    Size-bounded in-process LRU cache with per-entry expiry.
+
+    Entries are bounded by count, by the total of the sizes given to set()
+    and resize() (e.g. bytes held by each value), or both; None leaves a
+    bound off.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = None):
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value if present and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int = 0):
+        """Store a value for ttl seconds, evicting the least recently used entries if full."""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.bytes += size
+        self._evict()
+
+    def resize(self, key: str, size: int):
+        """Update the size of a value that grew in place, keeping its expiry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self.bytes += size - entry[2]
+        self._entries[key] = (entry[0], entry[1], size)
+        self._evict()
+
+    def _remove(self, key: str):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def _evict(self):
+        while (self.max_entries is not None and len(self._entries) > self.max_entries) or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and self._entries
+        ):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+
+    def clear(self):
+        """Remove every entry."""
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheEntry:
+    """A cached value and whether it is still within its fresh TTL."""
+
+    __slots__ = ("value", "fresh", "age")
+
+    def __init__(self, value: Any, fresh: bool, age: float):
+        self.value = value
+        self.fresh = fresh
+        self.age = age
+
+
+class CKANCache:
+    """
+    In-process LRU (L1) in front of a shared Redis (L2), keyed on
+    (resource_id, query parameters).
+
+    Entries outlive their fresh TTL by CKAN_CACHE_STALE_TTL seconds so the
+    last good value can still be served while the source is unavailable.
+    Values are stored as JSON so callers always get a private copy they can
+    modify. Redis failures are counted and otherwise ignored, leaving the
+    cache running on L1 alone.
+    
+    Keys known not to exist upstream (e.g. unknown registration numbers)
+    are remembered in L1 for CKAN_NEGATIVE_CACHE_TTL seconds. Checking them
+    costs no Redis round trip; other workers learn of an unknown key from
+    the cached empty response that revealed it, which they read in the
+    same L1/L2 lookup as any other response.
+    """
+
+    def __init__(self, redis_client=None, max_entries: int = None, ttls: Dict[str, float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_client: Optional async Redis client (or a stand-in such as fakeredis);
+                by default one is created from REDIS_URL when configured
+            max_entries: Maximum number of L1 entries
+            ttls: TTL in seconds by resource id
+        """
+        self.l1 = LRUCache(max_entries or settings.CKAN_CACHE_MAX_ENTRIES)
+        self._redis = redis_client
+        self.ttls = ttls if ttls is not None else self._default_ttls()
+        self.stale_ttl = settings.CKAN_CACHE_STALE_TTL
+        self.negative_ttl = settings.CKAN_NEGATIVE_CACHE_TTL
+        self.stats = {
+            "l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "misses": 0, "negative_hits": 0, "redis_errors": 0
+        }
+
+    @staticmethod
+    def _default_ttls() -> Dict[str, float]:
+        """Get per-resource TTLs: long for annual statements, short for fast-changing data."""
+        financial = settings.CKAN_CACHE_TTL_FINANCIAL
+        volatile = settings.CKAN_CACHE_TTL_VOLATILE
+        return {
+            settings.CKAN_FINANCIAL_STATEMENTS_RESOURCE_ID: financial,
+            settings.CKAN_BALANCE_SHEETS_RESOURCE_ID: financial,
+            settings.CKAN_INCOME_STATEMENTS_RESOURCE_ID: financial,
+            settings.CKAN_CASH_FLOW_STATEMENTS_RESOURCE_ID: financial,
+            settings.CKAN_LIQUIDATION_RESOURCE_ID: volatile,
+            settings.CKAN_TAXPAYER_RATINGS_RESOURCE_ID: volatile,
+        }
+
+    @property
+    def redis(self):
+        """Get the L2 Redis client, creating it from REDIS_URL on first use."""
+        if self._redis is None and redis_asyncio is not None and settings.REDIS_URL:
+            self._redis = redis_asyncio.from_url(settings.REDIS_URL)
+        return self._redis
+
+    def ttl_for(self, resource_id: str) -> float:
+        """Get the TTL in seconds for a resource."""
+        return self.ttls.get(resource_id, settings.CKAN_CACHE_TTL_DEFAULT)
+
+    @staticmethod
+    def make_key(resource_id: str, params: Dict[str, Any]) -> str:
+        """Build the cache key for a query on a resource."""
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"ckan:{resource_id}:{digest}"
+
+    def _entry(self, resource_id: str, payload) -> CacheEntry:
+        """Decode a stored payload into a cache entry."""
+        data = json.loads(payload)
+        age = time.time() - data["stored_at"]
+        fresh = age < self.ttl_for(resource_id)
+        if not fresh:
+            self.stats["stale_hits"] += 1
+        return CacheEntry(data["value"], fresh, age)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Look a key up in L1, then L2.
+
+        Returns:
+            The cache entry, possibly stale, or None on a miss
+        """
+        resource_id = key.split(":")[1]
+        payload = self.l1.get(key)
+        if payload is not None:
+            self.stats["l1_hits"] += 1
+            return self._entry(resource_id, payload)
+
+        if self.redis is not None:
+            try:
+                payload = await self.redis.get(key)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                print(f"Redis cache error: {e}")
+                payload = None
+            if payload is not None:
+                self.stats["l2_hits"] += 1
+                entry = self._entry(resource_id, payload)
+                # Fill L1 for the rest of this entry's lifetime
+                remaining = self.ttl_for(resource_id) + self.stale_ttl - entry.age
+                if remaining > 0:
+                    self.l1.set(key, payload, remaining)
+                return entry
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, resource_id: str, value: Any):
+        """Store a value in both tiers, kept for its fresh TTL plus the stale window."""
+        payload = json.dumps({"stored_at": time.time(), "value": value}, ensure_ascii=False, default=str)
+        ttl = self.ttl_for(resource_id) + self.stale_ttl
+        self.l1.set(key, payload, ttl)
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, payload, ex=int(ttl))
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                print(f"Redis cache error: {e}")
+
+    async def is_missing(self, namespace: str, key: str) -> bool:
+        """Check whether a key was recently found not to exist upstream."""
+        missing = self.l1.get(f"ckan-missing:{namespace}:{key}") is not None
+        if missing:
+            self.stats["negative_hits"] += 1
+        return missing
+
+    async def mark_missing(self, namespace: str, key: str):
+        """Remember for CKAN_NEGATIVE_CACHE_TTL seconds that a key does not exist upstream."""
+        self.l1.set(f"ckan-missing:{namespace}:{key}", True, self.negative_ttl)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the hit ratio."""
+        lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
+        hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "l1_entries": len(self.l1),
+            "l2_enabled": self.redis is not None,
+        }
+
+    async def close(self):
+        """Close the Redis connection pool."""
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception as e:
+                print(f"Redis cache error: {e}")
+            self._redis = None
+
+
+# Create a singleton instance
+ckan_cache = CKANCache()
@@ -0,0 +1,152 @@
+"""
+Asynchronous client for the CKAN action API.
+"""
+from typing import Any, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.services.ckan_scheduler import OutboundScheduler
+
+
+class CKANError(Exception):
+    """Raised when a CKAN action call fails or returns an unsuccessful response."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_upstream_failure(self) -> bool:
+        """Whether the error indicates CKAN itself is failing rather than a bad request."""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class CKANUnavailableError(CKANError):
+    """Raised without calling CKAN when the circuit breaker for a resource is open."""
+
+
+class AsyncCKANClient:
+    """
+    Thin async wrapper around the CKAN action API.
+
+    A single httpx.AsyncClient is shared by every call made from a worker
+    process, so connections to the CKAN host are kept alive and reused.
+    Every call is admitted by the client's OutboundScheduler.
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: float = None,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+    ):
+        """Initialize the client configuration; the connection pool is created lazily."""
+        self.base_url = (base_url or settings.CKAN_BASE_URL).rstrip("/") + "/"
+        self.timeout = timeout if timeout is not None else settings.CKAN_TIMEOUT
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.CKAN_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or settings.CKAN_MAX_KEEPALIVE_CONNECTIONS,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.scheduler = OutboundScheduler()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={"User-Agent": "TURBO_AML/0.1"},
+            )
+        return self._client
+
+    async def close(self):
+        """Close the shared HTTP client and release pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call_action(self, action: str, data: Dict[str, Any], timeout: float = None) -> Dict[str, Any]:
+        """
+        Call a CKAN action and return its result payload.
+
+        Args:
+            action: The CKAN action name, e.g. 'datastore_search'
+            data: The action parameters
+            timeout: Optional per-call timeout in seconds
+
+        Returns:
+            The 'result' part of the CKAN response
+        """
+        await self.scheduler.acquire()
+        overloaded = False
+        try:
+            return await self._call_action(action, data, timeout)
+        except CKANError as e:
+            overloaded = e.is_upstream_failure
+            raise
+        finally:
+            self.scheduler.release(overloaded)
+
+    async def _call_action(self, action: str, data: Dict[str, Any], timeout: float = None) -> Dict[str, Any]:
+        """Send one action request and unwrap its response."""
+        try:
+            response = await self.client.post(
+                f"api/3/action/{action}",
+                json=data,
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+        except httpx.TimeoutException as e:
+            raise CKANError(f"CKAN {action} timed out: {e}") from e
+        except httpx.HTTPError as e:
+            raise CKANError(f"CKAN {action} request failed: {e}") from e
+
+        try:
+            payload = response.json()
+        except ValueError:
+            raise CKANError(
+                f"CKAN {action} returned HTTP {response.status_code} with a non-JSON body",
+                status_code=response.status_code,
+            )
+
+        if response.status_code >= 400 or not payload.get("success", False):
+            raise CKANError(
+                f"CKAN {action} failed with HTTP {response.status_code}: {payload.get('error')}",
+                status_code=response.status_code,
+            )
+        return payload.get("result", {})
+
+    async def datastore_search(self, resource_id: str, timeout: float = None, **params) -> Dict[str, Any]:
+        """
+        Run a datastore_search query against a resource.
+
+        Args:
+            resource_id: The CKAN resource id
+            timeout: Optional per-call timeout in seconds
+            **params: Any other datastore_search parameters (filters, q, limit, offset, ...)
+
+        Returns:
+            The datastore_search result with 'records' and 'total'
+        """
+        data = {"resource_id": resource_id}
+        data.update({key: value for key, value in params.items() if value is not None})
+        return await self.call_action("datastore_search", data, timeout=timeout)
+
+    async def datastore_search_sql(self, sql: str, timeout: float = None) -> Dict[str, Any]:
+        """
+        Run a read-only SQL query against the datastore.
+
+        Args:
+            sql: The SQL statement; resource ids are used as quoted table names
+            timeout: Optional per-call timeout in seconds
+
+        Returns:
+            The datastore_search_sql result with 'records'
+        """
+        return await self.call_action("datastore_search_sql", {"sql": sql}, timeout=timeout)
+
+
+# Create a singleton instance
+ckan_client = AsyncCKANClient()
@@ -0,0 +1,61 @@
+"""
+Column sets requested from CKAN by the API endpoints.
+
+Each set lists only the columns an endpoint maps into its response models,
+and is sent as datastore_search's 'fields' parameter.
+"""
+
+# Company registry columns mapped into CompanyResponse
+REGISTRY_FIELDS = [
+    "regcode", "sepa", "name", "name_before_quotes", "name_in_quotes", "name_after_quotes",
+    "without_quotes", "regtype", "regtype_text", "type", "type_text", "registered",
+    "terminated", "closed", "address", "index", "addressid", "region", "city", "atvk",
+]
+
+# Company details sections, as shown on the company page
+CAPITAL_FIELDS = ["equity_capital_type", "equity_capital_type_text", "amount", "currency", "date_from"]
+BENEFICIARY_FIELDS = [
+    "forename", "surname", "birth_date", "nationality", "residence", "registered_on",
+    "latvian_identity_number_masked",
+]
+MEMBER_FIELDS = [
+    "name", "entity_type", "latvian_identity_number_masked", "birth_date",
+    "legal_entity_registration_number", "number_of_shares", "share_nominal_value",
+    "share_currency", "date_from", "registered_on",
+]
+BUSINESS_FIELDS = [
+    "legal_entity_registration_number", "name", "legal_form_code", "legal_form_code_text",
+    "area_of_activity",
+]
+LIQUIDATION_FIELDS = [
+    "legal_entity_registration_number", "liquidation_type", "liquidation_type_text", "date_from",
+    "grounds_for_liquidation", "registered_on", "last_modified_at",
+]
+OFFICER_FIELDS = [
+    "entity_type", "position", "governing_body", "name", "latvian_identity_number_masked",
+    "birth_date", "legal_entity_registration_number", "rights_of_representation_type",
+    "representation_with_at_least", "registered_on", "last_modified_at",
+]
+STOCKHOLDER_FIELDS = [
+    "entity_type", "name", "latvian_identity_number_masked", "birth_date",
+    "legal_entity_registration_number", "number_of_shares", "share_nominal_value",
+    "share_currency", "votes", "stock_type", "depository_registration_number",
+    "depository_name", "date_from", "registered_on", "last_modified_at",
+]
+TAXPAYER_RATING_FIELDS = [
+    "registracijas_kods", "nosaukums", "reitings", "skaidrojums", "informacijas_atjaunosanas_datums",
+]
+
+# Statement columns used by the health score; statement_id links rows to their annual report
+HEALTH_SCORE_FIELDS = {
+    "balance_sheets": [
+        "statement_id", "cash", "marketable_securities", "accounts_receivable", "inventories",
+        "total_current_assets", "total_assets", "current_liabilities", "non_current_liabilities",
+        "equity",
+    ],
+    "income_statements": [
+        "statement_id", "net_turnover", "by_function_gross_profit", "by_function_cost_of_goods_sold",
+        "interest_expenses", "income_before_income_taxes", "net_income",
+    ],
+    "cash_flows": ["statement_id"],
+}
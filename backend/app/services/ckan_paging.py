@@ -0,0 +1,49 @@
+"""
+Offset paging over CKAN datastore_search results.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+from app.core.config import settings
+
+
+async def iter_pages(
+    search: Callable[..., Awaitable[Dict[str, Any]]],
+    resource_id: str,
+    page_size: int = None,
+    parallel: int = 1,
+    **params
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Stream every record matching a query, one page at a time.
+
+    Pages are ordered by '_id' unless another sort is given, so offsets
+    stay stable while paging. With parallel > 1 the next pages are requested
+    together and yielded in offset order; at most parallel pages are held in
+    memory at once.
+
+    Args:
+        search: datastore_search-like coroutine function taking resource_id and params
+        resource_id: The CKAN resource id
+        page_size: Number of records per page
+        parallel: Number of pages requested at a time
+        **params: Other datastore_search parameters (filters, q, fields, ...)
+
+    Yields:
+        Non-empty lists of records, in order
+    """
+    page_size = page_size or settings.CKAN_PAGE_SIZE
+    parallel = max(1, parallel)
+    params.setdefault("sort", "_id")
+    offset = 0
+    while True:
+        offsets = [offset + i * page_size for i in range(parallel)]
+        results = await asyncio.gather(
+            *(search(resource_id=resource_id, limit=page_size, offset=page_offset, **params) for page_offset in offsets)
+        )
+        for result in results:
+            records = result.get("records", [])
+            if records:
+                yield records
+            if len(records) < page_size:
+                return
+        offset += parallel * page_size
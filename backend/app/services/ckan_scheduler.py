@@ -0,0 +1,297 @@
+"""
+Outbound scheduling for CKAN calls: rate limit, adaptive concurrency and priorities.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Redis is optional; without it every process is limited on its own
+    redis_asyncio = None
+
+# Priority classes; lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("ckan_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def ckan_priority(level: int):
+    """
+    Run the enclosed CKAN calls, and tasks started from them, in a priority class.
+
+    Args:
+        level: INTERACTIVE or BACKGROUND
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class SystemClock:
+    """The time source of the schedulers: wall and monotonic time, sleeps and timers."""
+
+    @staticmethod
+    def time() -> float:
+        return time.time()
+
+    @staticmethod
+    def monotonic() -> float:
+        return time.monotonic()
+
+    @staticmethod
+    async def sleep(seconds: float):
+        await asyncio.sleep(seconds)
+
+    @staticmethod
+    def call_later(delay: float, callback):
+        return asyncio.get_running_loop().call_later(delay, callback)
+
+
+system_clock = SystemClock()
+
+
+class SharedRateBudget:
+    """
+    Per-second CKAN request budget shared by every process through Redis.
+
+    Each call takes one unit of the current second's counter. Interactive
+    calls may use the whole CKAN_SHARED_RATE_LIMIT; background calls only
+    the part outside CKAN_INTERACTIVE_RESERVE, so API workers keep that
+    share even while bulk jobs in other processes run flat out. Within a
+    second calls are not ordered, so this reserves capacity for interactive
+    calls rather than always serving them first. Without Redis, or while
+    it fails, calls are limited by their own process's scheduler only.
+    """
+
+    def __init__(self, redis_client=None, rate: float = None, interactive_reserve: float = None, clock=None):
+        """
+        Initialize the budget.
+
+        Args:
+            redis_client: Optional async Redis client (or a stand-in such as fakeredis);
+                by default one is created from REDIS_URL when configured
+            rate: Requests per second across all processes; 0 disables the budget
+            interactive_reserve: Share of the rate background calls must leave free
+            clock: Time source with time() and sleep() (default: the system clock)
+        """
+        self._redis = redis_client
+        self.clock = clock or system_clock
+        self.rate = rate if rate is not None else settings.CKAN_SHARED_RATE_LIMIT
+        self.interactive_reserve = (
+            interactive_reserve if interactive_reserve is not None else settings.CKAN_INTERACTIVE_RESERVE
+        )
+        self.stats = {"shared_waits": 0, "redis_errors": 0}
+
+    @property
+    def redis(self):
+        """Get the Redis client, creating it from REDIS_URL on first use."""
+        if self._redis is None and redis_asyncio is not None and settings.REDIS_URL:
+            self._redis = redis_asyncio.from_url(settings.REDIS_URL)
+        return self._redis
+
+    def _allowed(self, priority: int) -> int:
+        """Get the calls per second a priority class may make."""
+        if priority == INTERACTIVE:
+            return max(1, int(self.rate))
+        return max(1, int(self.rate * (1 - self.interactive_reserve)))
+
+    async def acquire(self, priority: int):
+        """Wait until the shared budget of the current second has room for a call."""
+        if self.rate <= 0 or self.redis is None:
+            return
+        allowed = self._allowed(priority)
+        while True:
+            now = self.clock.time()
+            key = f"ckan-rate:{int(now)}"
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.incr(key)
+                    pipe.expire(key, 10)
+                    count, _ = await pipe.execute()
+                if count <= allowed:
+                    return
+                # Over budget: give the unit back and try again next second
+                await self.redis.decr(key)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                print(f"Redis rate budget error: {e}")
+                return
+            self.stats["shared_waits"] += 1
+            await self.clock.sleep(int(now) + 1 - now)
+
+
+class OutboundScheduler:
+    """
+    Admission control for outbound CKAN calls.
+
+    A token bucket caps the request rate. An AIMD limit caps concurrent
+    calls: it grows by one per limit's worth of successful calls and halves
+    when CKAN answers with 429 or 5xx, or the call fails outright. Waiting
+    calls are admitted in priority order, and background calls may not use
+    the share of the limit reserved for interactive ones.
+
+    These limits apply within one process. Across processes (API workers
+    and bulk jobs) calls are coordinated only through the Redis-backed
+    SharedRateBudget, which is used when REDIS_URL is set.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: int = None,
+        initial_limit: int = None,
+        max_limit: int = None,
+        interactive_reserve: float = None,
+        shared_budget: SharedRateBudget = None,
+        clock=None
+    ):
+        """
+        Initialize the scheduler with a full token bucket.
+
+        Args:
+            rate: Requests per second; 0 disables the token bucket's refill
+            burst: Token bucket size
+            initial_limit: Starting concurrency limit
+            max_limit: Highest concurrency limit
+            interactive_reserve: Share of the limit background calls must leave free
+            shared_budget: Cross-process budget (default: the Redis-backed singleton)
+            clock: Time source with monotonic() and call_later() (default: the system clock)
+        """
+        self.clock = clock or system_clock
+        self.rate = rate if rate is not None else settings.CKAN_RATE_LIMIT
+        self.burst = burst or settings.CKAN_RATE_BURST
+        self.limit = float(initial_limit or settings.CKAN_CONCURRENCY_INITIAL)
+        self.min_limit = 1.0
+        self.max_limit = float(max_limit or settings.CKAN_CONCURRENCY_MAX)
+        self.interactive_reserve = (
+            interactive_reserve if interactive_reserve is not None else settings.CKAN_INTERACTIVE_RESERVE
+        )
+        self.tokens = float(self.burst)
+        self.refilled_at = self.clock.monotonic()
+        self.in_flight = 0
+        self.backed_off_at = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self.stats = {"admitted": 0, "queued": 0, "backoffs": 0}
+        self.shared_budget = shared_budget if shared_budget is not None else shared_rate_budget
+
+    def _refill(self):
+        now = self.clock.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def _capacity(self, priority: int) -> int:
+        """Get the concurrency available to a priority class."""
+        limit = int(self.limit)
+        if priority == INTERACTIVE:
+            return limit
+        return max(1, int(limit * (1 - self.interactive_reserve)))
+
+    def _can_admit(self, priority: int) -> bool:
+        return self.in_flight < self._capacity(priority) and self.tokens >= 1
+
+    def _admit(self):
+        self.tokens -= 1
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+
+    def _dispatch(self):
+        """Admit waiting calls in priority order while capacity and tokens allow."""
+        self._wakeup = None
+        self._refill()
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_admit(priority):
+                break
+            heapq.heappop(self._waiters)
+            self._admit()
+            future.set_result(None)
+
+        # Wake up again once the bucket has a token for the next waiter
+        if self._waiters and self.tokens < 1 and self._wakeup is None and self.rate > 0:
+            delay = (1 - self.tokens) / self.rate
+            self._wakeup = self.clock.call_later(delay, self._dispatch)
+
+    async def acquire(self):
+        """Wait until a call in the current priority class may go out."""
+        priority = _priority.get()
+        await self._acquire_local(priority)
+        try:
+            await self.shared_budget.acquire(priority)
+        except BaseException:
+            # Cancelled while waiting for the shared budget; hand the slot on
+            self.in_flight -= 1
+            self._dispatch()
+            raise
+
+    async def _acquire_local(self, priority: int):
+        """Wait for this process's rate and concurrency limits."""
+        self._refill()
+        if not self._waiters and self._can_admit(priority):
+            self._admit()
+            return
+
+        self.stats["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller was cancelled; hand the slot on
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+
+    def release(self, overloaded: bool = False):
+        """
+        Finish a call and adjust the concurrency limit.
+
+        Args:
+            overloaded: Whether CKAN signalled overload (429, 5xx or no response)
+        """
+        self.in_flight -= 1
+        now = self.clock.monotonic()
+        if overloaded:
+            # Back off at most once per second so one burst of errors halves the limit once
+            if now - self.backed_off_at >= 1:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.backed_off_at = now
+                self.stats["backoffs"] += 1
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the current limit, load and counters."""
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return {
+            **self.stats,
+            **self.shared_budget.stats,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": waiting,
+        }
+
+
+# Create a singleton instance
+shared_rate_budget = SharedRateBudget()
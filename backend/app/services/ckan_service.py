@@ -1,15 +1,93 @@
 """
 Service for interacting with the CKAN API.
 """
-import ckanapi
+import asyncio
+import json
+from contextvars import ContextVar
+from typing import Optional
 from app.core.config import settings
+from app.db.mirror import MIRROR_RESOURCES, mirror_store
+from app.db.search_facets import matches_filters
+from app.db.search_index import company_search_index
+from app.db.statement_store import normalize_statement_record, statement_store
+from app.services.ckan_cache import ckan_cache
+from app.services.ckan_client import CKANError, CKANUnavailableError, ckan_client
+from app.services.ckan_paging import iter_pages
+from app.services.ckan_scheduler import BACKGROUND, ckan_priority
+from app.services.circuit_breaker import CircuitBreakerRegistry
+from app.services.company_names import parse_reg_number
+from app.services.search_cursor import decode_cursor, encode_cursor
+from app.services.singleflight import SingleFlight
+
+# Resource names by resource id, used when reporting stale data
+RESOURCE_NAMES = {resource_id: name for name, (resource_id, _) in MIRROR_RESOURCES.items()}
+
+# Names of the resources served from stale cache entries during the current request
+_stale_resources: ContextVar[Optional[set]] = ContextVar("stale_resources", default=None)
+
+
+def _sql_literal(value) -> str:
+    """Quote a value as an SQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def track_stale_resources() -> set:
+    """
+    Start collecting the resources served stale in the current context.
+    
+    Returns:
+        The set that CKANService adds stale resource names to
+    """
+    stale = set()
+    _stale_resources.set(stale)
+    return stale
+
+
+class FinancialStatementIndex:
+    """
+    Annual report basic information for one company, indexed by year.
+    
+    Built once per request and shared by the balance sheet, income statement
+    and cash flow fetchers so the annual report list is only fetched once.
+    """
+    
+    def __init__(self, reg_number: str, statements: list):
+        """Index the annual report records of a company."""
+        self.reg_number = reg_number
+        self.statements = statements
+        self.by_year = {}
+        for stmt in statements:
+            self.by_year.setdefault(stmt.get("year"), []).append(stmt)
+    
+    def __bool__(self):
+        return bool(self.statements)
+    
+    def for_year(self, year: int = None) -> list:
+        """Get the annual reports for a specific year, or all of them."""
+        if not year:
+            return self.statements
+        return self.by_year.get(year, [])
+    
+    def latest(self, years: int) -> list:
+        """Get the annual reports of the most recent years, newest first."""
+        return sorted(self.statements, key=lambda x: x.get("year") or 0, reverse=True)[:years]
 
 class CKANService:
     """Service for interacting with the CKAN API."""
     
-    def __init__(self):
+    def __init__(self, client=None, mirror=None, mode: str = None, cache=None, search_index=None, statements=None):
         """Initialize the CKAN API client."""
-        self.client = ckanapi.RemoteCKAN(settings.CKAN_BASE_URL)
+        self.client = client or ckan_client
+        self.mirror = mirror or mirror_store
+        self.search_index = search_index or company_search_index
+        self.statement_store = statements or statement_store
+        self.cache = cache or ckan_cache
+        self.single_flight = SingleFlight()
+        self.breakers = CircuitBreakerRegistry()
+        self._background_tasks = set()
+        self._unprojected_resources = set()
+        self.mode = mode or settings.CKAN_MODE
+        self.sql_enabled = settings.CKAN_SQL_ENABLED
         
         # Company data resources
         self.company_resource_id = settings.CKAN_COMPANY_RESOURCE_ID
@@ -28,252 +106,552 @@ class CKANService:
         self.income_statements_resource_id = settings.CKAN_INCOME_STATEMENTS_RESOURCE_ID
         self.cash_flow_statements_resource_id = settings.CKAN_CASH_FLOW_STATEMENTS_RESOURCE_ID
     
-    def search_companies(self, query: str, limit: int = 10, offset: int = 0):
+    async def _datastore_search(self, resource_id: str, **params):
+        """
+        Run a datastore_search query against a CKAN resource.
+        
+        In mirror mode the query is answered from the local mirror instead
+        of the live API. Live queries go through the two-tier cache, and
+        identical concurrent cache misses share one upstream call. An
+        expired cache entry is served immediately, marked stale, and
+        refreshed in the background.
+        
+        Args:
+            resource_id: The CKAN resource id
+            **params: datastore_search parameters (filters, q, limit, offset, ...)
+            
+        Returns:
+            The datastore_search result
+        
+        Raises:
+            CKANUnavailableError: The resource's circuit breaker is open and nothing is cached
+        """
+        if self.mode == "mirror":
+            try:
+                return await asyncio.to_thread(self.mirror.search, resource_id, **params)
+            except LookupError as e:
+                raise CKANError(str(e))
+        
+        if params.get("fields") and resource_id in self._unprojected_resources:
+            params = {**params, "fields": None}
+        try:
+            return await self._cached_call(
+                resource_id, params, lambda: self.client.datastore_search(resource_id, **params)
+            )
+        except CKANError as e:
+            if not params.get("fields") or e.is_upstream_failure:
+                raise
+            # The resource lacks a requested column; ask for whole rows from now on
+            print(f"CKAN rejected field projection on {resource_id}, requesting all columns: {e}")
+            self._unprojected_resources.add(resource_id)
+            return await self._datastore_search(resource_id, **params)
+    
+    async def _datastore_search_sql(self, resource_id: str, sql: str):
+        """
+        Run a datastore_search_sql query through the cache.
+        
+        Args:
+            resource_id: The resource whose cache TTL and circuit breaker the query uses
+            sql: The SQL statement
+            
+        Returns:
+            The datastore_search_sql result
+        """
+        return await self._cached_call(
+            resource_id, {"sql": sql}, lambda: self.client.datastore_search_sql(sql)
+        )
+    
+    async def _cached_call(self, resource_id: str, params: dict, call):
         """
-        Search for companies using the CKAN API.
+        Answer a CKAN call from the cache, or make it once for all concurrent callers.
+        
+        Args:
+            resource_id: The CKAN resource id
+            params: The call parameters, used for the cache key
+            call: Zero-argument coroutine function making the CKAN call
+            
+        Returns:
+            The call result
+        """
+        cache_key = self.cache.make_key(resource_id, params)
+        entry = await self.cache.get(cache_key)
+        if entry is not None:
+            if not entry.fresh:
+                self._mark_stale(resource_id)
+                self._refresh_in_background(cache_key, resource_id, call)
+            return entry.value
+        
+        return await self.single_flight.do(cache_key, lambda: self._fetch(cache_key, resource_id, call))
+    
+    async def _fetch(self, cache_key: str, resource_id: str, call):
+        """Call CKAN through the resource's circuit breaker and cache the result."""
+        breaker = self.breakers.for_resource(resource_id)
+        if not breaker.allow():
+            raise CKANUnavailableError(f"CKAN resource {resource_id} is unavailable (circuit open)")
+        try:
+            result = await call()
+        except CKANError as e:
+            if e.is_upstream_failure:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled (e.g. by the company page deadline) or failed locally; the
+            # outcome says nothing about CKAN, but a probe must not stay in flight
+            breaker.release()
+            raise
+        breaker.record_success()
+        await self.cache.set(cache_key, resource_id, result)
+        return result
+    
+    def _refresh_in_background(self, cache_key: str, resource_id: str, call):
+        """Refresh a stale cache entry without making the caller wait."""
+        with ckan_priority(BACKGROUND):
+            task = asyncio.ensure_future(
+                self.single_flight.do(cache_key, lambda: self._fetch(cache_key, resource_id, call))
+            )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_done)
+    
+    def _background_done(self, task):
+        self._background_tasks.discard(task)
+        if task.cancelled() or isinstance(task.exception(), CKANUnavailableError):
+            return
+        if task.exception() is not None:
+            print(f"CKAN background refresh failed: {task.exception()}")
+    
+    @staticmethod
+    def _mark_stale(resource_id: str):
+        stale = _stale_resources.get()
+        if stale is not None:
+            stale.add(RESOURCE_NAMES.get(resource_id, resource_id))
+    
+    async def iter_records(self, resource_id: str, page_size: int = None, parallel: int = 1, **params):
+        """
+        Stream every record matching a query, page by page.
+        
+        Args:
+            resource_id: The CKAN resource id
+            page_size: Number of records per page (default: CKAN_PAGE_SIZE)
+            parallel: Number of pages requested at a time
+            **params: Other datastore_search parameters (filters, q, fields, ...)
+            
+        Yields:
+            Matching records in '_id' order unless another sort is given
+        """
+        async for records in iter_pages(self._datastore_search, resource_id, page_size, parallel, **params):
+            for record in records:
+                yield record
+    
+    async def _get_all_records(self, resource_id: str, **params):
+        """Get every record matching a query rather than only the first page."""
+        records = []
+        async for page in iter_pages(self._datastore_search, resource_id, **params):
+            records.extend(page)
+        return records
+    
+    async def search_companies(
+        self,
+        query: str,
+        limit: int = 10,
+        offset: int = 0,
+        fields: list = None,
+        fuzzy: bool = False,
+        filters: dict = None,
+        facets: bool = False,
+        cursor: str = None
+    ):
+        """
+        Search for companies.
+        
+        Answered from the local full-text index when it has been built,
+        otherwise with CKAN's full-text search, which matches diacritics
+        exactly and does not correct typos. The index keeps the ranked
+        results of recent queries, so following 'next_cursor' through deep
+        pages costs only the page.
         
         Args:
             query: The search query
             limit: Maximum number of results to return
             offset: Offset for pagination
+            fields: Optional columns to return (default: all)
+            fuzzy: Correct misspelled words (local index only)
+            filters: Accepted values per facet field (region, type, regtype, status)
+            facets: Also count the matches per facet value (local index only)
+            cursor: 'next_cursor' of the previous page of the same search; replaces offset
             
         Returns:
-            The search results
+            The search results, with 'facets' when they were counted and
+            'next_cursor' (None on the last page)
+            
+        Raises:
+            ValueError: Filtering by status or searching without a query or filter
+                without the local index, or an invalid cursor
         """
+        filters = {field: values for field, values in (filters or {}).items() if values}
+        search = {"q": query, "fuzzy": fuzzy, "filters": filters}
+        if cursor:
+            offset = decode_cursor(cursor, search)
+        result = await self._search_companies(query, limit, offset, fields, fuzzy, filters, facets)
+        position = offset + len(result.get("records", []))
+        more = position < result.get("total", 0) and position > offset
+        result["next_cursor"] = encode_cursor(position, search) if more else None
+        return result
+    
+    async def _search_companies(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        fields: list,
+        fuzzy: bool,
+        filters: dict,
+        facets: bool
+    ):
+        """Search for companies; see search_companies()."""
+        use_index = settings.SEARCH_INDEX_ENABLED and self.search_index.is_ready()
+        
+        # A registration number is looked up directly instead of searched for
+        reg_number = parse_reg_number(query)
+        if reg_number:
+            # Checking the filters needs the columns they are on
+            lookup_fields = None if filters else fields
+            record = None
+            if use_index:
+                record = await asyncio.to_thread(self.search_index.get_company, reg_number, lookup_fields)
+            if record is None:
+                record = await self.get_company_by_reg_number(reg_number, fields=lookup_fields)
+            if record and filters:
+                if not matches_filters(record, filters):
+                    record = None
+                elif fields:
+                    record = {field: record.get(field) for field in fields}
+            records = [record] if record and offset == 0 and limit > 0 else []
+            return {"records": records, "total": 1 if record else 0}
+        
+        if use_index:
+            return await asyncio.to_thread(
+                self.search_index.search, query, limit, offset, fields, fuzzy, filters, facets
+            )
+        
+        # The registry has no status column to filter CKAN on
+        if "status" in filters:
+            raise ValueError("Filtering by status needs the local search index")
+        # CKAN would answer an empty query with arbitrary registry rows
+        if not (query or "").strip() and not filters:
+            raise ValueError("A search query or a filter is required without the local search index")
         try:
-            result = self.client.action.datastore_search(
+            result = await self._datastore_search(
                 resource_id=self.company_resource_id,
-                q=query,
+                q=query or None,
+                filters=filters or None,
                 limit=limit,
-                offset=offset
+                offset=offset,
+                fields=fields
             )
             return result
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error: {e}")
             raise
     
-    def get_company_by_reg_number(self, reg_number: str):
+    async def is_known_missing(self, reg_number: str) -> bool:
+        """
+        Check whether a registration number cannot belong to any company.
+        
+        True for strings that are not 11-digit registration numbers and for
+        numbers the company registry recently reported as unknown, so bad
+        links and scrapers do not cost upstream calls.
+        
+        Args:
+            reg_number: The company registration number
+            
+        Returns:
+            True if lookups for the number can be skipped
+        """
+        if parse_reg_number(reg_number) != reg_number:
+            return True
+        return await self.cache.is_missing("company", reg_number)
+    
+    async def get_company_by_reg_number(self, reg_number: str, fields: list = None):
         """
         Get company details by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
-            The company details
+            The company details, or None for unknown or malformed registration numbers
         """
+        if await self.is_known_missing(reg_number):
+            return None
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.company_resource_id,
-                filters={"regcode": reg_number}
-            )
-            
             # Return the first record if any
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.company_resource_id,
+                filters={"regcode": reg_number},
+                fields=fields
+            )
+            if not records:
+                await self.cache.mark_missing("company", reg_number)
             return records[0] if records else None
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error: {e}")
             raise
             
-    def get_company_capital_data(self, reg_number: str):
+    async def get_company_capital_data(self, reg_number: str, fields: list = None):
         """
         Get company capital data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company capital data records
         """
         try:
             # Changed from 'regcode' to 'legal_entity_registration_number' based on actual data schema
-            result = self.client.action.datastore_search(
-                resource_id=self.capital_resource_id,
-                filters={"legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as capital data may have multiple entries
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.capital_resource_id,
+                filters={"legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching capital data: {e}")
             return []
     
-    def get_company_beneficiaries(self, reg_number: str):
+    async def get_company_beneficiaries(self, reg_number: str, fields: list = None):
         """
         Get company beneficial owners by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company beneficial owners records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.beneficiary_resource_id,
-                filters={"legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple beneficial owners
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.beneficiary_resource_id,
+                filters={"legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching beneficiary data: {e}")
             return []
             
-    def get_company_members(self, reg_number: str):
+    async def get_company_members(self, reg_number: str, fields: list = None):
         """
         Get company members data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company members records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.members_resource_id,
-                filters={"at_legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple members
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.members_resource_id,
+                filters={"at_legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching members data: {e}")
             return []
             
-    def get_company_business_data(self, reg_number: str):
+    async def get_company_business_data(self, reg_number: str, fields: list = None):
         """
         Get company business activity data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company business activity records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.business_resource_id,
-                filters={"legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple business activities
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.business_resource_id,
+                filters={"legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching business activity data: {e}")
             return []
             
-    def get_company_liquidation_data(self, reg_number: str):
+    async def get_company_liquidation_data(self, reg_number: str, fields: list = None):
         """
         Get company liquidation process data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company liquidation process records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.liquidation_resource_id,
-                filters={"legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple liquidation processes
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.liquidation_resource_id,
+                filters={"legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching liquidation data: {e}")
             return []
             
-    def get_company_officers(self, reg_number: str):
+    async def get_company_officers(self, reg_number: str, fields: list = None):
         """
         Get company officers data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company officers records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.officers_resource_id,
-                filters={"at_legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple officers
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.officers_resource_id,
+                filters={"at_legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching officers data: {e}")
             return []
             
-    def get_company_stockholders(self, reg_number: str):
+    async def get_company_stockholders(self, reg_number: str, fields: list = None):
         """
         Get company stockholders data by registration number.
         This will only return data for companies of type 'Akciju Sabiedrība' (AS).
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The company stockholders records
         """
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.stockholders_resource_id,
-                filters={"at_legal_entity_registration_number": reg_number}
-            )
-            
             # Return all records as a company may have multiple stockholders
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.stockholders_resource_id,
+                filters={"at_legal_entity_registration_number": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching stockholders data: {e}")
             return []
             
-    def get_taxpayer_ratings(self, reg_number: str):
+    async def get_taxpayer_ratings(self, reg_number: str, fields: list = None):
         """
         Get taxpayer rating data by registration number.
         
         Args:
             reg_number: The company registration number
+            fields: Optional columns to return (default: all)
             
         Returns:
             The taxpayer rating records
         """
+        if await self.is_known_missing(reg_number):
+            return []
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.taxpayer_ratings_resource_id,
-                filters={"registracijas_kods": reg_number}
-            )
-            
             # Return all records as a company may have multiple rating entries
-            records = result.get("records", [])
+            records = await self._get_all_records(
+                self.taxpayer_ratings_resource_id,
+                filters={"registracijas_kods": reg_number},
+                fields=fields
+            )
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching taxpayer ratings: {e}")
             return []
             
     # ===== FINANCIAL DATA METHODS =====
     
-    def get_financial_statements(self, reg_number: str):
+    async def _get_statement_records(self, resource_id: str, financial_statements: list, fields: list = None):
+        """
+        Get statement rows for a set of annual reports in a single request.
+        
+        Args:
+            resource_id: The balance sheet, income statement or cash flow resource id
+            financial_statements: Annual report basic information records
+            fields: Optional columns to return; must include statement_id
+            
+        Returns:
+            The statement records tagged with year and currency, amounts in euro units
+        """
+        # Index annual reports by id so years are attached without rescanning the list
+        statements_by_id = {str(stmt["id"]): stmt for stmt in financial_statements}
+        if not statements_by_id:
+            return []
+        
+        # A list value in filters matches any of the given statement IDs
+        records = await self._get_all_records(
+            resource_id,
+            filters={"statement_id": list(statements_by_id)},
+            fields=fields
+        )
+        
+        # Add year information to each record and undo the report's rounding and currency
+        normalized = []
+        for record in records:
+            matching_stmt = statements_by_id.get(str(record.get("statement_id")))
+            normalized.append(normalize_statement_record(record, matching_stmt) if matching_stmt else record)
+        
+        return normalized
+    
+    async def _from_statement_store(self, method: str, *args):
+        """
+        Answer a financial statement lookup from the local statement store.
+        
+        Args:
+            method: Name of the FinancialStatementStore lookup
+            *args: The lookup's arguments
+            
+        Returns:
+            The lookup's result, or None if the store is not built or lacks the company
+        """
+        if not self.statement_store.is_ready():
+            return None
+        try:
+            return await asyncio.to_thread(getattr(self.statement_store, method), *args)
+        except Exception as e:
+            print(f"Error reading financial statement store: {e}")
+            return None
+    
+    async def get_financial_statements(self, reg_number: str):
         """
         Get annual report basic information by registration number.
         
@@ -283,194 +661,302 @@ class CKANService:
         Returns:
             The annual report basic information records
         """
+        stored = await self._from_statement_store("get_financial_statements", reg_number)
+        if stored is not None:
+            return stored
+        if await self.is_known_missing(reg_number):
+            return []
         try:
-            result = self.client.action.datastore_search(
-                resource_id=self.financial_statements_resource_id,
+            # Return all records as a company may have multiple years
+            records = await self._get_all_records(
+                self.financial_statements_resource_id,
                 filters={"legal_entity_registration_number": reg_number}
             )
-            
-            # Return all records as a company may have multiple years
-            records = result.get("records", [])
             return records
-        except ckanapi.errors.CKANAPIError as e:
+        except CKANError as e:
             # Log error and reraise
             print(f"CKAN API error when fetching financial statements: {e}")
             return []
     
-    def get_balance_sheets(self, reg_number: str, year: int = None):
+    async def get_financial_statement_index(self, reg_number: str) -> FinancialStatementIndex:
+        """
+        Get the request-scoped annual report index for a company.
+        
+        Args:
+            reg_number: The company registration number
+            
+        Returns:
+            FinancialStatementIndex over the company's annual report records
+        """
+        financial_statements = await self.get_financial_statements(reg_number)
+        return FinancialStatementIndex(reg_number, financial_statements)
+    
+    async def get_balance_sheets(self, reg_number: str, year: int = None, statement_index: FinancialStatementIndex = None):
         """
         Get balance sheet data by registration number and optionally by year.
         
         Args:
             reg_number: The company registration number
             year: Optional specific year to filter by
+            statement_index: Optional annual report index already fetched for this request
             
         Returns:
             The balance sheet records
         """
+        stored = await self._from_statement_store("get_statement_records", "balance_sheets", reg_number, year)
+        if stored is not None:
+            return stored
         try:
             # First get the statement IDs from financial statements
-            financial_statements = self.get_financial_statements(reg_number)
-            if not financial_statements:
+            if statement_index is None:
+                statement_index = await self.get_financial_statement_index(reg_number)
+            if not statement_index:
                 return []
             
-            statement_ids = [str(stmt["id"]) for stmt in financial_statements]
-            if year:
-                # Filter by year if specified
-                statement_ids = [str(stmt["id"]) for stmt in financial_statements if stmt.get("year") == year]
-            
-            # Get balance sheet data using statement IDs
-            all_balance_sheets = []
-            for statement_id in statement_ids:
-                result = self.client.action.datastore_search(
-                    resource_id=self.balance_sheets_resource_id,
-                    filters={"statement_id": statement_id}
-                )
-                records = result.get("records", [])
-                # Add year information to each record
-                for record in records:
-                    matching_stmt = next((stmt for stmt in financial_statements if str(stmt["id"]) == statement_id), None)
-                    if matching_stmt:
-                        record["year"] = matching_stmt.get("year")
-                        record["currency"] = matching_stmt.get("currency")
-                all_balance_sheets.extend(records)
-            
-            return all_balance_sheets
-        except ckanapi.errors.CKANAPIError as e:
+            # Get balance sheet data for all statement IDs in one request
+            return await self._get_statement_records(
+                self.balance_sheets_resource_id,
+                statement_index.for_year(year)
+            )
+        except CKANError as e:
             print(f"CKAN API error when fetching balance sheets: {e}")
             return []
     
-    def get_income_statements(self, reg_number: str, year: int = None):
+    async def get_income_statements(self, reg_number: str, year: int = None, statement_index: FinancialStatementIndex = None):
         """
         Get income statement data by registration number and optionally by year.
         
         Args:
             reg_number: The company registration number
             year: Optional specific year to filter by
+            statement_index: Optional annual report index already fetched for this request
             
         Returns:
             The income statement records
         """
+        stored = await self._from_statement_store("get_statement_records", "income_statements", reg_number, year)
+        if stored is not None:
+            return stored
         try:
             # First get the statement IDs from financial statements
-            financial_statements = self.get_financial_statements(reg_number)
-            if not financial_statements:
+            if statement_index is None:
+                statement_index = await self.get_financial_statement_index(reg_number)
+            if not statement_index:
                 return []
             
-            statement_ids = [str(stmt["id"]) for stmt in financial_statements]
-            if year:
-                # Filter by year if specified
-                statement_ids = [str(stmt["id"]) for stmt in financial_statements if stmt.get("year") == year]
-            
-            # Get income statement data using statement IDs
-            all_income_statements = []
-            for statement_id in statement_ids:
-                result = self.client.action.datastore_search(
-                    resource_id=self.income_statements_resource_id,
-                    filters={"statement_id": statement_id}
-                )
-                records = result.get("records", [])
-                # Add year information to each record
-                for record in records:
-                    matching_stmt = next((stmt for stmt in financial_statements if str(stmt["id"]) == statement_id), None)
-                    if matching_stmt:
-                        record["year"] = matching_stmt.get("year")
-                        record["currency"] = matching_stmt.get("currency")
-                all_income_statements.extend(records)
-            
-            return all_income_statements
-        except ckanapi.errors.CKANAPIError as e:
+            # Get income statement data for all statement IDs in one request
+            return await self._get_statement_records(
+                self.income_statements_resource_id,
+                statement_index.for_year(year)
+            )
+        except CKANError as e:
             print(f"CKAN API error when fetching income statements: {e}")
             return []
     
-    def get_cash_flow_statements(self, reg_number: str, year: int = None):
+    async def get_cash_flow_statements(self, reg_number: str, year: int = None, statement_index: FinancialStatementIndex = None):
         """
         Get cash flow statement data by registration number and optionally by year.
         
         Args:
             reg_number: The company registration number
             year: Optional specific year to filter by
+            statement_index: Optional annual report index already fetched for this request
             
         Returns:
             The cash flow statement records
         """
+        stored = await self._from_statement_store("get_statement_records", "cash_flow_statements", reg_number, year)
+        if stored is not None:
+            return stored
         try:
             # First get the statement IDs from financial statements
-            financial_statements = self.get_financial_statements(reg_number)
-            if not financial_statements:
+            if statement_index is None:
+                statement_index = await self.get_financial_statement_index(reg_number)
+            if not statement_index:
                 return []
             
-            statement_ids = [str(stmt["id"]) for stmt in financial_statements]
-            if year:
-                # Filter by year if specified
-                statement_ids = [str(stmt["id"]) for stmt in financial_statements if stmt.get("year") == year]
-            
-            # Get cash flow statement data using statement IDs
-            all_cash_flows = []
-            for statement_id in statement_ids:
-                result = self.client.action.datastore_search(
-                    resource_id=self.cash_flow_statements_resource_id,
-                    filters={"statement_id": statement_id}
-                )
-                records = result.get("records", [])
-                # Add year information to each record
-                for record in records:
-                    matching_stmt = next((stmt for stmt in financial_statements if str(stmt["id"]) == statement_id), None)
-                    if matching_stmt:
-                        record["year"] = matching_stmt.get("year")
-                        record["currency"] = matching_stmt.get("currency")
-                all_cash_flows.extend(records)
-            
-            return all_cash_flows
-        except ckanapi.errors.CKANAPIError as e:
+            # Get cash flow statement data for all statement IDs in one request
+            return await self._get_statement_records(
+                self.cash_flow_statements_resource_id,
+                statement_index.for_year(year)
+            )
+        except CKANError as e:
             print(f"CKAN API error when fetching cash flow statements: {e}")
             return []
     
-    def get_multi_year_financial_data(self, reg_number: str, years: int = 5):
+    async def get_multi_year_financial_data(
+        self,
+        reg_number: str,
+        years: int = 5,
+        statement_index: FinancialStatementIndex = None,
+        fields: dict = None
+    ):
         """
         Get comprehensive multi-year financial data for trend analysis.
         
+        Fetches the annual report list once and each statement resource once
+        for all requested years.
+        
         Args:
             reg_number: The company registration number
             years: Number of years to retrieve (default: 5)
+            statement_index: Optional annual report index already fetched for this request
+            fields: Optional columns to return by section ('balance_sheets',
+                'income_statements', 'cash_flows'); each must include statement_id
             
         Returns:
             Dictionary with organized financial data by year
         """
+        stored = await self._from_statement_store("get_multi_year_financial_data", reg_number, years, fields)
+        if stored is not None:
+            return stored
+        if await self.is_known_missing(reg_number):
+            return {}
+        fields = fields or {}
+        if self.sql_enabled and self.mode != "mirror":
+            try:
+                return await self._get_multi_year_financial_data_sql(reg_number, years, statement_index, fields)
+            except CKANUnavailableError:
+                return {}
+            except CKANError as e:
+                if not e.is_upstream_failure:
+                    # The instance rejects SQL queries; stop trying them
+                    print(f"CKAN SQL search unavailable, using datastore_search: {e}")
+                    self.sql_enabled = False
+                else:
+                    print(f"CKAN SQL search failed, using datastore_search: {e}")
+            except Exception as e:
+                print(f"Error getting multi-year financial data with SQL: {e}")
+        
         try:
             # Get basic financial statements info
-            financial_statements = self.get_financial_statements(reg_number)
-            if not financial_statements:
+            if statement_index is None:
+                statement_index = await self.get_financial_statement_index(reg_number)
+            if not statement_index:
                 return {}
             
             # Sort by year descending and limit to requested years
-            financial_statements = sorted(financial_statements, key=lambda x: x.get("year", 0), reverse=True)[:years]
+            financial_statements = statement_index.latest(years)
+            
+            # Get data for all years, one request per statement resource
+            resource_ids = {
+                "balance_sheets": self.balance_sheets_resource_id,
+                "income_statements": self.income_statements_resource_id,
+                "cash_flows": self.cash_flow_statements_resource_id,
+            }
+            fetched = await asyncio.gather(
+                *(
+                    self._get_statement_records(resource_id, financial_statements, fields.get(key))
+                    for key, resource_id in resource_ids.items()
+                ),
+                return_exceptions=True
+            )
             
             result = {
-                "years": [],
-                "balance_sheets": [],
-                "income_statements": [],
-                "cash_flows": [],
+                "years": [stmt.get("year") for stmt in financial_statements],
                 "basic_info": financial_statements
             }
-            
-            for stmt in financial_statements:
-                year = stmt.get("year")
-                result["years"].append(year)
-                
-                # Get data for each year
-                balance_data = self.get_balance_sheets(reg_number, year)
-                income_data = self.get_income_statements(reg_number, year)
-                cash_flow_data = self.get_cash_flow_statements(reg_number, year)
-                
-                result["balance_sheets"].extend(balance_data)
-                result["income_statements"].extend(income_data)
-                result["cash_flows"].extend(cash_flow_data)
+            for key, records in zip(resource_ids, fetched):
+                if isinstance(records, Exception):
+                    print(f"CKAN API error when fetching {key}: {records}")
+                    records = []
+                result[key] = sorted(records, key=lambda x: x.get("year") or 0, reverse=True)
             
             return result
         except Exception as e:
             print(f"Error getting multi-year financial data: {e}")
             return {}
+    
+    async def _get_multi_year_financial_data_sql(
+        self,
+        reg_number: str,
+        years: int,
+        statement_index: FinancialStatementIndex = None,
+        fields: dict = None
+    ):
+        """
+        Get multi-year financial data in one datastore_search_sql round trip.
+        
+        The annual report list is joined with the balance sheet, income
+        statement and cash flow resources on statement_id, and every row comes
+        back year-tagged as JSON, so the result has the same shape as
+        get_multi_year_financial_data.
+        
+        Args:
+            reg_number: The company registration number
+            years: Number of years to retrieve
+            statement_index: Optional annual report index already fetched for this request
+            fields: Optional columns to return by section
+            
+        Returns:
+            Dictionary with organized financial data by year
+        """
+        fields = fields or {}
+        if statement_index is not None:
+            financial_statements = statement_index.latest(years)
+            if not financial_statements:
+                return {}
+            ids = ", ".join(_sql_literal(stmt["id"]) for stmt in financial_statements)
+            reports = f'SELECT * FROM "{self.financial_statements_resource_id}" WHERE id::text IN ({ids})'
+        else:
+            reports = (
+                f'SELECT * FROM "{self.financial_statements_resource_id}" '
+                f'WHERE legal_entity_registration_number = {_sql_literal(reg_number)} '
+                f'ORDER BY year DESC LIMIT {int(years)}'
+            )
+        
+        sections = {
+            "balance_sheets": self.balance_sheets_resource_id,
+            "income_statements": self.income_statements_resource_id,
+            "cash_flows": self.cash_flow_statements_resource_id,
+        }
+        # _full_text is the datastore's internal search vector, not a data column
+        selects = [
+            "SELECT 'basic_info' AS section, fs.year, fs.currency, fs.rounded_to_nearest, "
+            "to_jsonb(fs) - '_full_text' AS data FROM fs"
+        ]
+        for section, resource_id in sections.items():
+            if fields.get(section):
+                columns = ", ".join(f's."{column}"' for column in fields[section])
+                data = f"(SELECT to_jsonb(p) FROM (SELECT {columns}) p)"
+            else:
+                data = "to_jsonb(s) - '_full_text'"
+            selects.append(
+                f"SELECT '{section}', fs.year, fs.currency, fs.rounded_to_nearest, {data} "
+                f'FROM "{resource_id}" s JOIN fs ON s.statement_id::text = fs.id::text'
+            )
+        sql = f"WITH fs AS ({reports}) " + " UNION ALL ".join(selects)
+        
+        try:
+            result = await self._datastore_search_sql(self.financial_statements_resource_id, sql)
+        except CKANError as e:
+            if not fields or e.is_upstream_failure:
+                raise
+            # A requested column may not exist; retry with whole rows before giving up on SQL
+            print(f"CKAN rejected projected SQL query, requesting all columns: {e}")
+            return await self._get_multi_year_financial_data_sql(reg_number, years, statement_index)
+        
+        rows = {"basic_info": [], **{section: [] for section in sections}}
+        for row in result.get("records", []):
+            record = row["data"]
+            if isinstance(record, str):
+                record = json.loads(record)
+            if row["section"] != "basic_info":
+                record = normalize_statement_record(record, row)
+            rows[row["section"]].append(record)
+        
+        if not rows["basic_info"]:
+            return {}
+        
+        financial_statements = sorted(rows.pop("basic_info"), key=lambda x: x.get("year") or 0, reverse=True)
+        result = {
+            "years": [stmt.get("year") for stmt in financial_statements],
+            "basic_info": financial_statements
+        }
+        for section, records in rows.items():
+            result[section] = sorted(records, key=lambda x: x.get("year") or 0, reverse=True)
+        
+        return result
 
 # Create a singleton instance
 ckan_service = CKANService() 
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Normalization of Latvian company names and registration numbers for matching.
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+# Legal-form abbreviations that appear around company names
+LEGAL_FORMS = {"sia", "as", "ik", "ks", "ps", "zs", "koop"}
+
+_WORD = re.compile(r"\w+")
+# Registration numbers are 11 digits, sometimes written with an LV prefix or separators
+_REG_NUMBER = re.compile(r"(?:LV)?(\d{11})", re.IGNORECASE)
+
+
+def parse_reg_number(text: str) -> Optional[str]:
+    """
+    Get the registration number a string is shaped like.
+
+    Returns:
+        The 11-digit registration number, or None if the text is not one
+    """
+    match = _REG_NUMBER.fullmatch(re.sub(r"[\s-]", "", text or ""))
+    return match.group(1) if match else None
+
+
+def fold_diacritics(text: str) -> str:
+    """Remove diacritics, so 'Gāze' and 'Gaze' compare equal."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def name_words(text: str) -> List[str]:
+    """
+    Split a name into lowercase words without diacritics or legal-form tokens.
+
+    Legal forms are only dropped when something else is left, so a query
+    for just 'SIA' still matches.
+    """
+    words = _WORD.findall(fold_diacritics(text or "").lower())
+    stripped = [word for word in words if word not in LEGAL_FORMS]
+    return stripped or words
+
+
+def normalize_name(text: str) -> str:
+    """Get the comparison form of a company name, e.g. 'SIA "Latvijas Gāze"' -> 'latvijas gaze'."""
+    return " ".join(name_words(text))
+
+
+def max_typos(word: str) -> int:
+    """Get how many edits a query word may be away from the word it means."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 7 else 2
+
+
+# Trigrams a single edit can change; swapping two letters touches four
+TRIGRAMS_PER_EDIT = 4
+
+
+def trigrams(word: str) -> List[str]:
+    """Get the trigrams of a word padded at both ends, e.g. 'gaze' -> ['#ga', 'gaz', 'aze', 'ze#']."""
+    padded = f"#{word}#"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Get the edit distance between two words, giving up past max_distance.
+
+    Insertions, deletions, substitutions and swaps of adjacent letters each
+    count as one edit (optimal string alignment). Only a band of width
+    2 * max_distance + 1 around the diagonal is computed, and the
+    computation stops once the whole band exceeds the bound.
+
+    Returns:
+        The edit distance, or max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    over = max_distance + 1
+    before = None
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                distance = min(distance, before[j - 2] + 1)
+            current[j] = min(distance, over)
+        if min(current) >= over:
+            return over
+        before, previous = previous, current
+    return previous[len(b)]
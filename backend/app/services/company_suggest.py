@@ -0,0 +1,260 @@
+"""
+In-memory typeahead index over company names and registration numbers.
+"""
+import asyncio
+import heapq
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional
+from app.core.config import settings
+from app.db.search_index import CompanySearchIndex, company_search_index
+from app.services.ckan_service import ckan_service
+from app.services.company_names import normalize_name
+
+# Children per node of the block-max levels above the entries; each node
+# keeps the highest popularity below it
+FANOUT = 64
+LEVELS = 2
+
+
+class SuggestIndex:
+    """
+    Sorted prefix index ranked by a popularity prior.
+
+    Every company has up to two entries: its normalized name and its
+    registration number, kept in one sorted array so a prefix is a bisect
+    range. Popularity is log(1 + views) plus a bonus for companies that are
+    still active. Blocks of FANOUT entries, and blocks of FANOUT blocks
+    above them, store their maximum popularity, so the top-k of a large
+    range is found best-first instead of scanning every entry under a
+    short prefix.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.keys: List[str] = []
+        self.entry_company = array("i")
+        self.regcodes: List[str] = []
+        self.names: List[str] = []
+        self.active: List[bool] = []
+        self.views: List[int] = []
+        self.scores: List[float] = []
+        self.company_entries: List[tuple] = []
+        self.block_max: List[List[float]] = []
+        self.company_ids: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]], views: Dict[str, int] = None) -> "SuggestIndex":
+        """
+        Build the index from company registry records.
+
+        Args:
+            records: Company registry records
+            views: Views per registration number
+
+        Returns:
+            The built index
+        """
+        index = cls()
+        views = views or {}
+        entries = []
+        for record in records:
+            regcode = str(record.get("regcode") or "")
+            if not regcode or regcode in index.company_ids:
+                continue
+            company = len(index.regcodes)
+            index.company_ids[regcode] = company
+            index.regcodes.append(regcode)
+            index.names.append(record.get("name") or "")
+            index.active.append(not record.get("terminated") and not record.get("closed"))
+            index.views.append(int(views.get(regcode, 0)))
+            index.scores.append(index._score(company))
+
+            entries.append((regcode, company))
+            key = normalize_name(record.get("name_in_quotes") or record.get("name") or "")
+            if key:
+                entries.append((key, company))
+
+        entries.sort()
+        index.keys = [key for key, _ in entries]
+        index.entry_company = array("i", (company for _, company in entries))
+        index.company_entries = [() for _ in index.regcodes]
+        for position, company in enumerate(index.entry_company):
+            index.company_entries[company] += (position,)
+        below = [index.scores[company] for company in index.entry_company]
+        for _ in range(LEVELS):
+            below = [max(below[start:start + FANOUT]) for start in range(0, len(below), FANOUT)]
+            index.block_max.append(below)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.regcodes)
+
+    def _score(self, company: int) -> float:
+        return math.log1p(self.views[company]) + (1.0 if self.active[company] else 0.0)
+
+    def record_view(self, regcode: str):
+        """Raise a company's popularity after its details were opened."""
+        company = self.company_ids.get(str(regcode))
+        if company is None:
+            return
+        self.views[company] += 1
+        score = self._score(company)
+        self.scores[company] = score
+        for position in self.company_entries[company]:
+            for level in self.block_max:
+                position //= FANOUT
+                if score > level[position]:
+                    level[position] = score
+
+    def _range(self, prefix: str) -> tuple:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        return lo, hi
+
+    def _cover(self, lo: int, hi: int, below: int) -> List[tuple]:
+        """Get heap items for the largest whole blocks below the given level that cover [lo, hi)."""
+        items = []
+        for level in range(below - 1, -1, -1):
+            if lo >= hi:
+                break
+            size = FANOUT ** level
+            first, last = -(-lo // size), hi // size
+            if first >= last:
+                continue
+            for node in range(first, last):
+                score = self.block_max[level - 1][node] if level else self.scores[self.entry_company[node]]
+                items.append((-score, node * size, level))
+            # Whatever is left at the edges is covered by smaller blocks
+            items.extend(self._cover(lo, first * size, level))
+            items.extend(self._cover(last * size, hi, level))
+            break
+        return items
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Get the most popular companies whose name or registration number starts with the query.
+
+        Args:
+            query: What the user typed so far
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of {'regcode', 'name'} dictionaries, most popular first
+        """
+        prefix = query.strip() if query.strip().isdigit() else normalize_name(query)
+        if not prefix or not self.keys:
+            return []
+        lo, hi = self._range(prefix)
+        if lo >= hi:
+            return []
+
+        # Heap items are (-score, start, level) with level 0 for single
+        # entries; ties go to the alphabetically first entry, so shorter
+        # names come before longer ones.
+        scores, entry_company = self.scores, self.entry_company
+        heap = self._cover(lo, hi, LEVELS + 1)
+        heapq.heapify(heap)
+
+        results = []
+        seen = set()
+        while heap and len(results) < limit:
+            _, position, level = heapq.heappop(heap)
+            if level:
+                child_size = FANOUT ** (level - 1)
+                for start in range(position, min(position + FANOUT * child_size, len(self.keys)), child_size):
+                    node = start // child_size
+                    score = self.block_max[level - 2][node] if level > 1 else scores[entry_company[node]]
+                    heapq.heappush(heap, (-score, start, level - 1))
+                continue
+            company = entry_company[position]
+            if company in seen:
+                continue
+            seen.add(company)
+            results.append({"regcode": self.regcodes[company], "name": self.names[company]})
+        return results
+
+
+class CompanySuggestService:
+    """
+    Serves /api/suggest from a SuggestIndex loaded from the search index.
+
+    The index is loaded in a background thread on first use and reloaded
+    when the search index has been refreshed since. Until it is loaded,
+    suggestions come from the regular company search.
+    """
+
+    def __init__(self, search_index: CompanySearchIndex = None, ckan=None):
+        """Initialize the service; nothing is loaded until the first suggestion."""
+        self.search_index = search_index or company_search_index
+        self.ckan = ckan or ckan_service
+        self.index: Optional[SuggestIndex] = None
+        self._loaded_at: Optional[float] = None
+        self._checked_at = 0.0
+        self._loading: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Build the in-memory index from the search index (blocking)."""
+        refreshed_at = self.search_index.get_refreshed_at()
+        started = time.monotonic()
+        records = (record for batch in self.search_index.iter_companies() for record in batch)
+        index = SuggestIndex.build(records, self.search_index.get_views())
+        with self._lock:
+            self.index = index
+            self._loaded_at = refreshed_at
+        print(f"Suggestion index loaded: {len(index)} companies in {time.monotonic() - started:.1f}s")
+
+    def _needs_load(self) -> bool:
+        if self._loading is not None or not self.search_index.is_ready():
+            return False
+        if self.index is None:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < settings.SEARCH_INDEX_RELOAD_INTERVAL:
+            return False
+        self._checked_at = now
+        return self.search_index.get_refreshed_at() != self._loaded_at
+
+    async def _load_in_background(self):
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as e:
+            print(f"Error loading suggestion index: {e}")
+        finally:
+            self._loading = None
+
+    async def suggest(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Get typeahead suggestions for a partial company name or registration number.
+
+        Args:
+            query: What the user typed so far
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of {'regcode', 'name'} dictionaries
+        """
+        if self._needs_load():
+            self._loading = asyncio.create_task(self._load_in_background())
+        if self.index is not None:
+            return self.index.suggest(query, limit)
+        if not query.strip():
+            return []
+        result = await self.ckan.search_companies(query, limit, 0, fields=["regcode", "name"])
+        return result.get("records", [])
+
+    def record_view(self, regcode: str):
+        """Count an opening of a company's details towards its popularity (blocking)."""
+        with self._lock:
+            if self.index is not None:
+                self.index.record_view(regcode)
+        if self.search_index.is_ready():
+            self.search_index.add_view(regcode)
+
+
+# Create a singleton instance
+company_suggest_service = CompanySuggestService()
@@ -13,6 +13,7 @@ from app.models.financial import (
     FinancialRatios,
     FinancialHealthAssessment
 )
+from app.services.financial_trends import TrendBatch, trend_engine
 
 
 class FinancialAnalysisService:
@@ -168,28 +169,19 @@ class FinancialAnalysisService:
             
         return ratios_by_year
 
-    def calculate_growth_rates(self, ratios_by_year: Dict[int, FinancialRatios]) -> Dict[str, float]:
+    def calculate_growth_rates(self, trends: TrendBatch, index: int = 0) -> Dict[str, float]:
         """
         Calculate year-over-year growth rates.
+
+        Args:
+            trends: Trend analysis of the company's statements, e.g. from trend_engine.from_statements()
+            index: The company's position in the batch
+
+        Returns:
+            Latest revenue, profit and assets growth; rates with a zero base
+            are left out, and there are none with fewer than 2 years
         """
-        if len(ratios_by_year) < 2:
-            return {}
-            
-        years = sorted(ratios_by_year.keys())
-        growth_rates = {}
-        
-        # Calculate growth for key metrics
-        metrics = ['revenue_growth', 'profit_growth', 'assets_growth']
-        
-        # For now, return placeholder growth rates
-        # In a real implementation, this would calculate actual growth from historical data
-        growth_rates = {
-            'revenue_growth': 0.0,
-            'profit_growth': 0.0,
-            'assets_growth': 0.0
-        }
-        
-        return growth_rates
+        return trends.company_growth_rates(index)
 
     def calculate_liquidity_score(self, ratios: FinancialRatios) -> float:
         """
@@ -575,7 +567,8 @@ class FinancialAnalysisService:
         
         # Calculate multi-year ratios for growth analysis
         ratios_by_year = self.calculate_multi_year_ratios(balance_sheets, income_statements, cash_flows)
-        growth_rates = self.calculate_growth_rates(ratios_by_year)
+        trends = trend_engine.from_statements(balance_sheets, income_statements)
+        growth_rates = self.calculate_growth_rates(trends)
         
         # Calculate component scores
         liquidity_score = self.calculate_liquidity_score(latest_ratios)
@@ -602,7 +595,7 @@ class FinancialAnalysisService:
         health_grade = self._get_health_grade(health_score)
         
         # Determine trend direction
-        trend_direction = self._determine_trend_direction(ratios_by_year)
+        trend_direction = self._determine_trend_direction(trends)
         
         # Generate strengths, weaknesses, and recommendations
         strengths, weaknesses, recommendations = self._analyze_financial_position(
@@ -646,14 +639,9 @@ class FinancialAnalysisService:
                 return grade
         return "F"  # Default for very low scores
 
-    def _determine_trend_direction(self, ratios_by_year: Dict[int, FinancialRatios]) -> str:
+    def _determine_trend_direction(self, trends: TrendBatch, index: int = 0) -> str:
         """Determine overall trend direction from multi-year data."""
-        if len(ratios_by_year) < 2:
-            return "STABLE"
-        
-        # For now, return STABLE as placeholder
-        # In real implementation, would analyze trends in key metrics
-        return "STABLE"
+        return trends.trend_direction[index]
 
     def _analyze_financial_position(
         self, 
@@ -0,0 +1,465 @@
+"""
+Vectorized health scoring for many companies at once.
+
+Computes the same ratios, component scores and health scores as
+FinancialAnalysisService.calculate_health_score(), but over columnar NumPy
+arrays with one element per company, so the whole registry can be scored
+in seconds.
+"""
+import hashlib
+import inspect
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from app.db.statement_store import StatementStoreVersion
+from app.models.financial import BalanceSheet, FinancialHealthAssessment, FinancialRatios, IncomeStatement
+from app.services import financial_analysis, financial_trends
+from app.services.financial_analysis import FinancialAnalysisService, financial_analysis_service
+from app.services.financial_trends import TrendBatch, trend_engine
+
+# Statement columns the scores are computed from
+BALANCE_SHEET_COLUMNS = (
+    "cash", "marketable_securities", "accounts_receivable", "inventories", "total_current_assets",
+    "total_assets", "current_liabilities", "non_current_liabilities", "equity",
+)
+INCOME_STATEMENT_COLUMNS = (
+    "net_turnover", "by_function_gross_profit", "by_function_cost_of_goods_sold",
+    "net_income", "interest_expenses", "income_before_income_taxes",
+)
+GROWTH_METRICS = ("revenue_growth", "profit_growth", "assets_growth")
+
+# Score ladders of the scalar component scorers as (thresholds, points):
+# a value scores the points of the highest threshold it reaches, the first
+# entry below the lowest one. Solvency debt ladders score values at most
+# a threshold instead.
+CURRENT_RATIO = ((0.5, 1.0, 1.5, 2.0), (0, 10, 25, 40, 50))
+QUICK_RATIO = ((0.3, 0.7, 1.0, 1.5), (0, 8, 15, 25, 30))
+CASH_RATIO = ((0.05, 0.1, 0.2, 0.3), (0, 5, 10, 15, 20))
+NET_PROFIT_MARGIN = ((0, 5, 10, 15), (0, 10, 20, 25, 30))
+RETURN_ON_ASSETS = ((0, 5, 10, 15), (0, 8, 15, 20, 25))
+RETURN_ON_EQUITY = ((0, 10, 15, 20), (0, 8, 15, 20, 25))
+GROSS_PROFIT_MARGIN = ((0, 10, 20, 30, 50), (0, 4, 8, 12, 16, 20))
+DEBT_TO_EQUITY = ((0.3, 0.6, 1.0, 2.0), (40, 30, 20, 10, 0))
+DEBT_TO_ASSETS = ((30, 50, 70, 90), (30, 25, 15, 8, 0))
+EQUITY_RATIO = ((10, 30, 50, 70), (0, 8, 15, 25, 30))
+ASSET_TURNOVER = ((0.1, 0.5, 1.0, 1.5, 2.0), (0, 8, 15, 25, 32, 40))
+INVENTORY_TURNOVER = ((1, 2, 4, 6, 12), (0, 8, 12, 20, 25, 30))
+RECEIVABLES_TURNOVER = ((2, 4, 6, 8, 12), (0, 8, 12, 20, 25, 30))
+GROWTH_RATE = ((-0.05, 0.0, 0.05, 0.10, 0.15), (0, 20, 40, 60, 80, 100))
+GROWTH_WEIGHTS = {"revenue_growth": 0.5, "profit_growth": 0.3, "assets_growth": 0.2}
+# Turnover ratios that are zero (no data) score this instead
+NEUTRAL_TURNOVER_POINTS = 15.0
+# Annual reports scored per company, like the health-score endpoint's default
+HEALTH_SCORE_YEARS = 5
+
+
+@lru_cache(maxsize=None)
+def scoring_version() -> str:
+    """Get a digest of the scoring code, which changes whenever the scores could."""
+    digest = hashlib.sha256()
+    for module in (financial_analysis, financial_trends, sys.modules[__name__]):
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _ladder(values: np.ndarray, ladder: Tuple[tuple, tuple], at_most: bool = False) -> np.ndarray:
+    """Score every value on a threshold ladder."""
+    thresholds, points = ladder
+    side = "left" if at_most else "right"
+    return np.asarray(points, dtype=float)[np.searchsorted(thresholds, values, side=side)]
+
+
+def _if_set(values: np.ndarray, ladder: Tuple[tuple, tuple], otherwise: float = 0.0) -> np.ndarray:
+    """Score values on a ladder, giving zero values (falsy in the scalar path) a fixed score."""
+    return np.where(values != 0, _ladder(values, ladder), otherwise)
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Divide element-wise, giving 0.0 where the denominator is zero."""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+def _bands(values: np.ndarray, bands: Dict[tuple, str], default: str) -> np.ndarray:
+    """Label values by the [low, high) band containing them, or the default outside every band."""
+    ordered = sorted(bands.items())
+    edges = [low for (low, _), _ in ordered] + [ordered[-1][0][1]]
+    labels = np.array([label for _, label in ordered] + [default, default], dtype=object)
+    index = np.searchsorted(edges, values, side="right") - 1
+    # Below the first edge and at or past the last one fall back to the default
+    index = np.where((index < 0) | (index >= len(ordered)), len(ordered), index)
+    return labels[index]
+
+
+def _column(columns: Dict[str, np.ndarray], name: str, size: int) -> np.ndarray:
+    """Get a statement column as floats, missing values (None/NaN) as zero like safe_float()."""
+    values = columns.get(name)
+    if values is None:
+        return np.zeros(size)
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+class HealthScoreBatch:
+    """Ratios and scores of a batch of companies, one array element per company."""
+
+    def __init__(
+        self,
+        ratios: Dict[str, np.ndarray],
+        scores: Dict[str, np.ndarray],
+        health_score: np.ndarray,
+        risk_level: np.ndarray,
+        health_grade: np.ndarray,
+        altman_z_score: np.ndarray,
+        years_analyzed: np.ndarray,
+        trend_direction: np.ndarray
+    ):
+        self.ratios = ratios
+        self.scores = scores
+        self.health_score = health_score
+        self.risk_level = risk_level
+        self.health_grade = health_grade
+        self.altman_z_score = altman_z_score
+        self.years_analyzed = years_analyzed
+        self.trend_direction = trend_direction
+
+    def __len__(self) -> int:
+        return len(self.health_score)
+
+    def assessment(
+        self,
+        index: int,
+        registration_number: str,
+        service: FinancialAnalysisService = None
+    ) -> FinancialHealthAssessment:
+        """
+        Build the assessment of one company, as calculate_health_score() would return it.
+
+        Args:
+            index: The company's position in the batch
+            registration_number: Registration number of the company
+            service: Service whose insight texts are used
+
+        Returns:
+            The company's FinancialHealthAssessment
+        """
+        service = service or financial_analysis_service
+        ratios = FinancialRatios(**{name: float(values[index]) for name, values in self.ratios.items()})
+        scores = {name: float(values[index]) for name, values in self.scores.items()}
+        strengths, weaknesses, recommendations = service._analyze_financial_position(
+            ratios, scores["liquidity"], scores["profitability"], scores["solvency"],
+            scores["efficiency"], scores["growth"], scores["taxpayer_rating"]
+        )
+        altman = float(self.altman_z_score[index])
+        return FinancialHealthAssessment(
+            registration_number=registration_number,
+            health_score=round(float(self.health_score[index]), 1),
+            health_grade=self.health_grade[index],
+            liquidity_score=round(scores["liquidity"], 1),
+            profitability_score=round(scores["profitability"], 1),
+            solvency_score=round(scores["solvency"], 1),
+            efficiency_score=round(scores["efficiency"], 1),
+            growth_score=round(scores["growth"], 1),
+            taxpayer_rating_score=round(scores["taxpayer_rating"], 1),
+            risk_level=self.risk_level[index],
+            altman_z_score=None if np.isnan(altman) else round(altman, 2),
+            strengths=strengths,
+            weaknesses=weaknesses,
+            recommendations=recommendations,
+            trend_direction=self.trend_direction[index],
+            years_analyzed=int(self.years_analyzed[index])
+        )
+
+
+class BatchHealthScorer:
+    """
+    Health scoring over columnar statement data.
+
+    Every ratio is an element-wise division and every component score a
+    threshold ladder looked up with np.searchsorted, applying the scalar
+    scorers' rules exactly: the same float operations in the same order,
+    zero ratios scoring like the scalar path's falsy checks, and Python's
+    round() for the rounded values of an assessment.
+    """
+
+    def __init__(self, service: FinancialAnalysisService = None):
+        """Initialize the scorer with the weights and bands of the scalar service."""
+        self.service = service or financial_analysis_service
+
+    def calculate_ratios(self, balance: Dict[str, np.ndarray], income: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Calculate the financial ratios of every company.
+
+        Args:
+            balance: Balance sheet columns (BALANCE_SHEET_COLUMNS), one element per company
+            income: Income statement columns (INCOME_STATEMENT_COLUMNS) of the same companies
+
+        Returns:
+            Arrays keyed by FinancialRatios field name
+        """
+        size = len(next(iter(balance.values()), next(iter(income.values()), [])))
+        b = {name: _column(balance, name, size) for name in BALANCE_SHEET_COLUMNS}
+        i = {name: _column(income, name, size) for name in INCOME_STATEMENT_COLUMNS}
+        total_liabilities = b["current_liabilities"] + b["non_current_liabilities"]
+
+        with np.errstate(over="ignore", invalid="ignore"):
+            return {
+                "current_ratio": _divide(b["total_current_assets"], b["current_liabilities"]),
+                "quick_ratio": _divide(b["total_current_assets"] - b["inventories"], b["current_liabilities"]),
+                "cash_ratio": _divide(b["cash"] + b["marketable_securities"], b["current_liabilities"]),
+                "gross_profit_margin": _divide(i["by_function_gross_profit"], i["net_turnover"]) * 100,
+                "net_profit_margin": _divide(i["net_income"], i["net_turnover"]) * 100,
+                "return_on_assets": _divide(i["net_income"], b["total_assets"]) * 100,
+                "return_on_equity": _divide(i["net_income"], b["equity"]) * 100,
+                "debt_to_equity": _divide(total_liabilities, b["equity"]),
+                "debt_to_assets": _divide(total_liabilities, b["total_assets"]) * 100,
+                "equity_ratio": _divide(b["equity"], b["total_assets"]) * 100,
+                "asset_turnover": _divide(i["net_turnover"], b["total_assets"]),
+                "inventory_turnover": _divide(i["by_function_cost_of_goods_sold"], b["inventories"]),
+                "receivables_turnover": _divide(i["net_turnover"], b["accounts_receivable"]),
+            }
+
+    @staticmethod
+    def liquidity_scores(ratios: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized calculate_liquidity_score()."""
+        score = (
+            0.0
+            + _if_set(ratios["current_ratio"], CURRENT_RATIO)
+            + _if_set(ratios["quick_ratio"], QUICK_RATIO)
+            + _if_set(ratios["cash_ratio"], CASH_RATIO)
+        )
+        return np.minimum(100, score)
+
+    @staticmethod
+    def profitability_scores(ratios: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized calculate_profitability_score()."""
+        score = (
+            0.0
+            + _if_set(ratios["net_profit_margin"], NET_PROFIT_MARGIN)
+            + _if_set(ratios["return_on_assets"], RETURN_ON_ASSETS)
+            + _if_set(ratios["return_on_equity"], RETURN_ON_EQUITY)
+            + _if_set(ratios["gross_profit_margin"], GROSS_PROFIT_MARGIN)
+        )
+        return np.minimum(100, score)
+
+    @staticmethod
+    def solvency_scores(ratios: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized calculate_solvency_score()."""
+        # Debt-to-equity is scored even when zero, the other two only when set
+        debt_to_assets = ratios["debt_to_assets"]
+        score = (
+            0.0
+            + _ladder(ratios["debt_to_equity"], DEBT_TO_EQUITY, at_most=True)
+            + np.where(debt_to_assets != 0, _ladder(debt_to_assets, DEBT_TO_ASSETS, at_most=True), 0.0)
+            + _if_set(ratios["equity_ratio"], EQUITY_RATIO)
+        )
+        return np.minimum(100, score)
+
+    @staticmethod
+    def efficiency_scores(ratios: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized calculate_efficiency_score()."""
+        score = (
+            0.0
+            + _if_set(ratios["asset_turnover"], ASSET_TURNOVER)
+            + _if_set(ratios["inventory_turnover"], INVENTORY_TURNOVER, NEUTRAL_TURNOVER_POINTS)
+            + _if_set(ratios["receivables_turnover"], RECEIVABLES_TURNOVER, NEUTRAL_TURNOVER_POINTS)
+        )
+        return np.minimum(100, score)
+
+    @staticmethod
+    def growth_scores(growth_rates: Dict[str, np.ndarray], has_growth: np.ndarray) -> np.ndarray:
+        """
+        Vectorized calculate_growth_score().
+
+        Args:
+            growth_rates: Arrays keyed by GROWTH_METRICS; missing metrics and NaN
+                (left out of calculate_growth_rates()) count as 0.0
+            has_growth: Whether each company has growth rates at all (neutral 50 otherwise)
+        """
+        score = np.zeros(len(has_growth))
+        for metric, weight in GROWTH_WEIGHTS.items():
+            rates = growth_rates.get(metric)
+            rates = np.zeros(len(has_growth)) if rates is None else np.nan_to_num(np.asarray(rates, dtype=float), nan=0.0)
+            points = _ladder(rates, GROWTH_RATE)
+            score = score + points * weight
+        return np.where(has_growth, np.minimum(100.0, np.maximum(0.0, score)), 50.0)
+
+    def altman_z_scores(self, balance: Dict[str, np.ndarray], income: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Vectorized _calculate_altman_z_score(), unrounded.
+
+        Returns:
+            Z-scores, NaN where total assets are zero (None in the scalar path)
+        """
+        size = len(next(iter(balance.values()), next(iter(income.values()), [])))
+        total_assets = _column(balance, "total_assets", size)
+        equity = _column(balance, "equity", size)
+        current_liabilities = _column(balance, "current_liabilities", size)
+        total_debt = current_liabilities + _column(balance, "non_current_liabilities", size)
+        with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+            a_ratio = (_column(balance, "total_current_assets", size) - current_liabilities) / total_assets
+            b_ratio = equity / total_assets
+            c_ratio = _column(income, "income_before_income_taxes", size) / total_assets
+            d_ratio = np.where(total_debt > 0, equity / np.where(total_debt > 0, total_debt, 1.0), 1.0)
+            e_ratio = _column(income, "net_turnover", size) / total_assets
+            z_score = 1.2 * a_ratio + 1.4 * b_ratio + 3.3 * c_ratio + 0.6 * d_ratio + 1.0 * e_ratio
+        return np.where(total_assets == 0, np.nan, z_score)
+
+    def score(
+        self,
+        balance: Dict[str, np.ndarray],
+        income: Dict[str, np.ndarray],
+        years_analyzed: np.ndarray,
+        trends: TrendBatch = None,
+        taxpayer_rating_scores: np.ndarray = None
+    ) -> HealthScoreBatch:
+        """
+        Score a batch of companies from their latest statements.
+
+        Args:
+            balance: Latest balance sheet columns, one element per company
+            income: Latest income statement columns of the same companies
+            years_analyzed: Years with both a balance sheet and an income statement
+            trends: Trend analysis of the same companies; without it every
+                company gets the neutral growth score and a STABLE trend
+            taxpayer_rating_scores: Scores from calculate_taxpayer_rating_score() (default: neutral 50)
+
+        Returns:
+            The batch's ratios and scores
+        """
+        years_analyzed = np.asarray(years_analyzed, dtype=int)
+        size = len(years_analyzed)
+        weights = self.service.HEALTH_SCORE_WEIGHTS
+
+        ratios = self.calculate_ratios(balance, income)
+        scores = {
+            "liquidity": self.liquidity_scores(ratios),
+            "profitability": self.profitability_scores(ratios),
+            "solvency": self.solvency_scores(ratios),
+            "efficiency": self.efficiency_scores(ratios),
+            "growth": (
+                np.full(size, 50.0) if trends is None
+                else self.growth_scores(trends.growth_rates(), trends.has_growth & (years_analyzed >= 2))
+            ),
+            "taxpayer_rating": (
+                np.full(size, 50.0) if taxpayer_rating_scores is None
+                else np.asarray(taxpayer_rating_scores, dtype=float)
+            ),
+        }
+        health_score = (
+            scores["liquidity"] * weights["liquidity"] +
+            scores["profitability"] * weights["profitability"] +
+            scores["solvency"] * weights["solvency"] +
+            scores["efficiency"] * weights["efficiency"] +
+            scores["growth"] * weights["growth"] +
+            scores["taxpayer_rating"] * weights["taxpayer_rating"]
+        )
+        return HealthScoreBatch(
+            ratios=ratios,
+            scores=scores,
+            health_score=health_score,
+            risk_level=_bands(health_score, {band: level for level, band in self.service.RISK_THRESHOLDS.items()}, "LOW"),
+            health_grade=_bands(health_score, self.service.HEALTH_GRADES, "F"),
+            altman_z_score=self.altman_z_scores(balance, income),
+            years_analyzed=years_analyzed,
+            trend_direction=(
+                np.full(size, "STABLE", dtype=object) if trends is None else trends.trend_direction
+            )
+        )
+
+    @staticmethod
+    def columns_from_statements(
+        companies: Iterable[Tuple[List[BalanceSheet], List[IncomeStatement]]]
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], np.ndarray, TrendBatch]:
+        """
+        Pick each company's latest statements the way calculate_health_score() does and lay them out as columns.
+
+        Args:
+            companies: (balance sheets, income statements) of each company
+
+        Returns:
+            Balance sheet columns, income statement columns, years analyzed and trends
+        """
+        companies = list(companies)
+        balance_rows, income_rows, years = [], [], []
+        for balance_sheets, income_statements in companies:
+            latest_balance = max(balance_sheets, key=lambda x: x.year or 0)
+            latest_income = max(income_statements, key=lambda x: x.year or 0)
+            balance_rows.append([getattr(latest_balance, name) for name in BALANCE_SHEET_COLUMNS])
+            income_rows.append([getattr(latest_income, name) for name in INCOME_STATEMENT_COLUMNS])
+            years.append(len(
+                {bs.year for bs in balance_sheets if bs.year} & {is_.year for is_ in income_statements if is_.year}
+            ))
+
+        def columns(rows: list, names: tuple) -> Dict[str, np.ndarray]:
+            table = np.array(rows, dtype=float).reshape(len(rows), len(names))
+            return {name: table[:, column] for column, name in enumerate(names)}
+
+        return (
+            columns(balance_rows, BALANCE_SHEET_COLUMNS), columns(income_rows, INCOME_STATEMENT_COLUMNS),
+            np.array(years), trend_engine.from_companies(companies)
+        )
+
+    @staticmethod
+    def columns_from_store(
+        version: StatementStoreVersion,
+        row_start: int,
+        row_end: int,
+        years: int = HEALTH_SCORE_YEARS
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray], Dict[str, np.ndarray], np.ndarray, TrendBatch]:
+        """
+        Pick the latest statements of every company in a range of statement store rows.
+
+        Each company's most recent annual reports are taken the way
+        get_multi_year_financial_data() returns them, and its latest balance
+        sheet and income statement the way calculate_health_score() picks them.
+
+        Args:
+            version: The statement store copy to read
+            row_start: First row; must start a company
+            row_end: Row after the last one; must end a company
+            years: Annual reports considered per company
+
+        Returns:
+            Registration numbers of the companies with both statements, their
+            balance sheet and income statement columns, years analyzed and trends
+        """
+        if row_end <= row_start:
+            return np.array([], dtype=bytes), {}, {}, np.array([], dtype=int), trend_engine.from_companies([])
+        regcodes = np.asarray(version.regcodes[row_start:row_end])
+        report_years = np.asarray(version.years[row_start:row_end])
+        has_balance = np.asarray(version.column("balance_sheets", "_present")[row_start:row_end])
+        has_income = np.asarray(version.column("income_statements", "_present")[row_start:row_end])
+        starts = np.flatnonzero(np.append(True, regcodes[1:] != regcodes[:-1]))
+        ends = np.append(starts[1:], len(regcodes))
+        companies = np.arange(len(starts))
+
+        # Walk the first `years` rows of every company, newest report first
+        latest_balance = np.full(len(starts), -1)
+        latest_income = np.full(len(starts), -1)
+        balance_keys, income_keys = [], []
+        for offset in range(years):
+            rows = starts + offset
+            inside = rows < ends
+            rows, company = rows[inside], companies[inside]
+            for present, latest, keys in ((has_balance, latest_balance, balance_keys), (has_income, latest_income, income_keys)):
+                found = present[rows]
+                first = found & (latest[company] < 0)
+                latest[company[first]] = rows[first]
+                dated = found & (report_years[rows] > 0)
+                keys.append(company[dated].astype(np.int64) * 10000 + report_years[rows][dated])
+        # Years with both statements, as in calculate_multi_year_ratios()
+        both = np.intersect1d(np.concatenate(balance_keys), np.concatenate(income_keys))
+        years_analyzed = np.bincount(both // 10000, minlength=len(starts))
+
+        scored = (latest_balance >= 0) & (latest_income >= 0)
+        balance_rows = row_start + latest_balance[scored]
+        income_rows = row_start + latest_income[scored]
+        balance = {name: np.asarray(version.column("balance_sheets", name)[balance_rows]) for name in BALANCE_SHEET_COLUMNS}
+        income = {name: np.asarray(version.column("income_statements", name)[income_rows]) for name in INCOME_STATEMENT_COLUMNS}
+        trends = trend_engine.from_store(version, row_start + starts[scored], row_start + ends[scored], years)
+        return regcodes[starts[scored]], balance, income, years_analyzed[scored], trends
+
+
+# Create a singleton instance
+batch_health_scorer = BatchHealthScorer()
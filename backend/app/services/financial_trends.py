@@ -0,0 +1,352 @@
+"""
+Multi-year growth and trend analysis of financial statements.
+
+Revenue, profit and total assets are laid out as (companies, years) matrices
+and analyzed in one vectorized pass: year-over-year growth, compound annual
+growth, volatility of the yearly growth and least-squares trend slopes. A
+single company is a batch of one, so the health score, the trends endpoint
+and the population refresh job all share the same arithmetic.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.db.statement_store import StatementStoreVersion
+
+# Series analyzed, as (statement section, field)
+TREND_SERIES = {
+    "revenue": ("income_statements", "net_turnover"),
+    "profit": ("income_statements", "net_income"),
+    "assets": ("balance_sheets", "total_assets"),
+}
+# Growth rate keys of each series, as scored by calculate_growth_score()
+GROWTH_KEYS = {"revenue": "revenue_growth", "profit": "profit_growth", "assets": "assets_growth"}
+# Weights of the series in the overall trend, the same as in the growth score
+TREND_WEIGHTS = {"revenue": 0.5, "profit": 0.3, "assets": 0.2}
+# Yearly slope, as a fraction of the series' average size, beyond which a trend is not stable
+TREND_THRESHOLD = 0.02
+
+
+def _direction(relative_slopes: np.ndarray, enough_years: np.ndarray) -> np.ndarray:
+    """Classify relative slopes as IMPROVING, DECLINING or STABLE."""
+    direction = np.full(len(relative_slopes), "STABLE", dtype=object)
+    with np.errstate(invalid="ignore"):
+        direction[enough_years & (relative_slopes > TREND_THRESHOLD)] = "IMPROVING"
+        direction[enough_years & (relative_slopes < -TREND_THRESHOLD)] = "DECLINING"
+    return direction
+
+
+def _value(record: Any, name: str) -> float:
+    """Get a statement field from a model or a dictionary as a float, NaN if missing."""
+    value = record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+    return np.nan if value is None else float(value)
+
+
+def _year(record: Any) -> Optional[int]:
+    """Get the year of a statement model or dictionary."""
+    return record.get("year") if isinstance(record, dict) else getattr(record, "year", None)
+
+
+class TrendBatch:
+    """
+    Growth and trend metrics of a batch of companies.
+
+    Every array has one element per company; matrices have one column per
+    analyzed year slot, ascending, padded with NaN after a company's last year.
+    Undefined metrics (too few years, a zero or negative base) are NaN.
+    """
+
+    def __init__(
+        self,
+        years: np.ndarray,
+        values: Dict[str, np.ndarray],
+        yoy: Dict[str, np.ndarray],
+        growth: Dict[str, np.ndarray],
+        cagr: Dict[str, np.ndarray],
+        volatility: Dict[str, np.ndarray],
+        slope: Dict[str, np.ndarray],
+        relative_slope: Dict[str, np.ndarray],
+        direction: Dict[str, np.ndarray],
+        trend_direction: np.ndarray
+    ):
+        self.years = years
+        self.values = values
+        self.yoy = yoy
+        self.growth = growth
+        self.cagr = cagr
+        self.volatility = volatility
+        self.slope = slope
+        self.relative_slope = relative_slope
+        self.direction = direction
+        self.trend_direction = trend_direction
+        self.years_analyzed = (~np.isnan(years)).sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    @property
+    def has_growth(self) -> np.ndarray:
+        """Whether each company has at least one defined growth rate."""
+        defined = np.zeros(len(self), dtype=bool)
+        for series in TREND_SERIES:
+            defined |= ~np.isnan(self.growth[series])
+        return defined
+
+    def growth_rates(self) -> Dict[str, np.ndarray]:
+        """Latest year-over-year growth keyed by GROWTH_KEYS; NaN where undefined."""
+        return {GROWTH_KEYS[series]: self.growth[series] for series in TREND_SERIES}
+
+    def company_growth_rates(self, index: int = 0) -> Dict[str, float]:
+        """
+        Get one company's latest year-over-year growth rates.
+
+        Returns:
+            Growth rates keyed by GROWTH_KEYS, leaving out undefined ones;
+            empty with fewer than 2 years
+        """
+        if self.years_analyzed[index] < 2:
+            return {}
+        return {
+            GROWTH_KEYS[series]: float(self.growth[series][index])
+            for series in TREND_SERIES if not np.isnan(self.growth[series][index])
+        }
+
+    def company_trends(self, index: int = 0) -> Dict[str, Any]:
+        """
+        Get one company's trends in the layout of FinancialTrendsResponse.
+
+        Returns:
+            Dictionary with years_analyzed, the revenue, profit and assets
+            series, growth_rates, trend_direction and volatility_metrics
+        """
+        count = int(self.years_analyzed[index])
+        years = [int(year) for year in self.years[index, :count]]
+        result = {"years_analyzed": years, "growth_rates": {}, "trend_direction": {}, "volatility_metrics": {}}
+
+        def number(value: float) -> Optional[float]:
+            return None if np.isnan(value) else float(value)
+
+        for series in TREND_SERIES:
+            values = self.values[series][index]
+            yoy = np.concatenate(([np.nan], self.yoy[series][index]))
+            result[f"{series}_trend"] = [
+                {"year": year, "value": number(values[slot]), "yoy_growth": number(yoy[slot])}
+                for slot, year in enumerate(years)
+            ]
+            metrics = {
+                GROWTH_KEYS[series]: self.growth[series][index],
+                f"{series}_cagr": self.cagr[series][index],
+                f"{series}_trend": self.relative_slope[series][index],
+            }
+            result["growth_rates"].update({key: float(value) for key, value in metrics.items() if not np.isnan(value)})
+            if not np.isnan(self.volatility[series][index]):
+                result["volatility_metrics"][f"{series}_volatility"] = float(self.volatility[series][index])
+            result["trend_direction"][series] = self.direction[series][index]
+        result["trend_direction"]["overall"] = self.trend_direction[index]
+        return result
+
+
+class TrendEngine:
+    """
+    Vectorized multi-year growth and trend analysis.
+
+    Works on (companies, years) matrices whose columns are each company's
+    analyzed years in ascending order, filled from the first column.
+    """
+
+    @staticmethod
+    def analyze(years: np.ndarray, values: Dict[str, np.ndarray]) -> TrendBatch:
+        """
+        Analyze the series of a batch of companies.
+
+        Args:
+            years: Year of each slot, NaN after a company's last year
+            values: Matrix of each series in TREND_SERIES, NaN where missing
+
+        Returns:
+            The batch's growth and trend metrics
+        """
+        years = np.asarray(years, dtype=float)
+        size, slots = years.shape
+        count = (~np.isnan(years)).sum(axis=1)
+        enough = count >= 2
+        rows = np.arange(size)
+        last = np.maximum(count - 1, 0)
+        first_year, last_year = years[:, 0], years[rows, last]
+        span = last_year - first_year
+        # Adjacent slots that are consecutive calendar years
+        consecutive = np.diff(years, axis=1) == 1
+
+        yoy, growth, cagr, volatility, slope, relative_slope, direction = {}, {}, {}, {}, {}, {}, {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for series in TREND_SERIES:
+                matrix = np.asarray(values[series], dtype=float)
+                previous, current = matrix[:, :-1], matrix[:, 1:]
+                rates = np.where(consecutive & (previous != 0), (current - previous) / np.abs(previous), np.nan)
+                yoy[series] = rates
+
+                # Growth of the latest year over the year before it
+                latest = rates[rows, np.maximum(last - 1, 0)] if slots > 1 else np.full(size, np.nan)
+                growth[series] = np.where(enough, latest, np.nan)
+
+                # Compound annual growth from the first to the last year, for positive values
+                first_value, last_value = matrix[:, 0], matrix[rows, last]
+                positive = enough & (span > 0) & (first_value > 0) & (last_value > 0)
+                cagr[series] = np.where(positive, (last_value / first_value) ** (1 / span) - 1, np.nan)
+
+                # Standard deviation of the yearly growth rates
+                defined = ~np.isnan(rates)
+                rate_count = defined.sum(axis=1)
+                mean = np.where(defined, rates, 0.0).sum(axis=1) / rate_count
+                variance = np.where(defined, (rates - mean[:, None]) ** 2, 0.0).sum(axis=1) / rate_count
+                volatility[series] = np.where(rate_count >= 2, np.sqrt(variance), np.nan)
+
+                # Least-squares slope per year, over the years with a value
+                points = ~np.isnan(matrix) & ~np.isnan(years)
+                n = points.sum(axis=1)
+                x = np.where(points, years - first_year[:, None], 0.0)
+                y = np.where(points, matrix, 0.0)
+                sum_x, sum_y = x.sum(axis=1), y.sum(axis=1)
+                denominator = n * (x * x).sum(axis=1) - sum_x * sum_x
+                fitted = (n >= 2) & (denominator != 0)
+                slope[series] = np.where(fitted, (n * (x * y).sum(axis=1) - sum_x * sum_y) / denominator, np.nan)
+                scale = np.abs(y).sum(axis=1) / n
+                relative_slope[series] = np.where(scale > 0, slope[series] / scale, np.nan)
+                direction[series] = _direction(relative_slope[series], enough)
+
+            # Overall trend: weighted relative slopes of the series that have one
+            weighted = np.zeros(size)
+            weight_sum = np.zeros(size)
+            for series, weight in TREND_WEIGHTS.items():
+                fitted = ~np.isnan(relative_slope[series])
+                weighted += np.where(fitted, relative_slope[series] * weight, 0.0)
+                weight_sum += np.where(fitted, weight, 0.0)
+            overall = np.where(weight_sum > 0, weighted / weight_sum, np.nan)
+
+        return TrendBatch(
+            years=years,
+            values={series: np.asarray(values[series], dtype=float) for series in TREND_SERIES},
+            yoy=yoy,
+            growth=growth,
+            cagr=cagr,
+            volatility=volatility,
+            slope=slope,
+            relative_slope=relative_slope,
+            direction=direction,
+            trend_direction=_direction(overall, enough)
+        )
+
+    @staticmethod
+    def company_series(balance_sheets: List[Any], income_statements: List[Any]) -> Tuple[List[int], Dict[str, List[float]]]:
+        """
+        Lay out one company's series over the years having both statements.
+
+        The first statement of each year is used, so with statements listed
+        newest report first the latest report of a year wins.
+
+        Args:
+            balance_sheets: Balance sheet models or dictionaries
+            income_statements: Income statement models or dictionaries
+
+        Returns:
+            Ascending years, and each series' values in those years
+        """
+        by_year = {"balance_sheets": {}, "income_statements": {}}
+        for section, statements in (("balance_sheets", balance_sheets), ("income_statements", income_statements)):
+            for statement in statements or []:
+                year = _year(statement)
+                if year and year not in by_year[section]:
+                    by_year[section][year] = statement
+        years = sorted(set(by_year["balance_sheets"]) & set(by_year["income_statements"]))
+        values = {
+            series: [_value(by_year[section][year], name) for year in years]
+            for series, (section, name) in TREND_SERIES.items()
+        }
+        return years, values
+
+    def from_statements(self, balance_sheets: List[Any], income_statements: List[Any]) -> TrendBatch:
+        """Analyze one company's statements as a batch of one."""
+        return self.from_companies([(balance_sheets, income_statements)])
+
+    def from_companies(self, companies: Iterable[Tuple[List[Any], List[Any]]]) -> TrendBatch:
+        """
+        Analyze the statements of many companies.
+
+        Args:
+            companies: (balance sheets, income statements) of each company
+
+        Returns:
+            The companies' growth and trend metrics, in the same order
+        """
+        laid_out = [self.company_series(balance_sheets, income_statements) for balance_sheets, income_statements in companies]
+        slots = max([len(years) for years, _ in laid_out] + [1])
+        years = np.full((len(laid_out), slots), np.nan)
+        values = {series: np.full((len(laid_out), slots), np.nan) for series in TREND_SERIES}
+        for index, (company_years, company_values) in enumerate(laid_out):
+            years[index, :len(company_years)] = company_years
+            for series in TREND_SERIES:
+                values[series][index, :len(company_years)] = company_values[series]
+        return self.analyze(years, values)
+
+    def from_store(
+        self,
+        version: StatementStoreVersion,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        years: int
+    ) -> TrendBatch:
+        """
+        Analyze companies straight from the statement store.
+
+        Each company's first `years` rows are read the way
+        get_multi_year_financial_data() returns them, and laid out like
+        company_series() lays out a company's statements.
+
+        Args:
+            version: The statement store copy to read
+            starts: First row of every company
+            ends: Row after every company's last one
+            years: Annual reports considered per company
+
+        Returns:
+            The companies' growth and trend metrics, in the order of starts
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        companies = np.arange(len(starts))
+        window = [(starts + offset, companies) for offset in range(years)]
+        window = [(rows[rows < ends], company[rows < ends]) for rows, company in window]
+        rows = np.concatenate([rows for rows, _ in window] + [np.array([], dtype=np.int64)])
+        company = np.concatenate([company for _, company in window] + [np.array([], dtype=np.int64)])
+        report_years = np.asarray(version.years[rows]).astype(np.int64)
+
+        # First row of every (company, year) with each statement; rows are newest first within a year
+        first_rows = {}
+        for section in ("balance_sheets", "income_statements"):
+            found = np.asarray(version.column(section, "_present")[rows]) & (report_years > 0)
+            keys = company[found] * 10000 + report_years[found]
+            order = np.lexsort((rows[found], keys))
+            keys, section_rows = keys[order], rows[found][order]
+            unique = np.append(True, keys[1:] != keys[:-1])
+            first_rows[section] = (keys[unique], section_rows[unique])
+
+        # Years having both statements, ascending within each company
+        keys, balance_index, income_index = np.intersect1d(
+            first_rows["balance_sheets"][0], first_rows["income_statements"][0], return_indices=True
+        )
+        key_company = keys // 10000
+        slot = np.arange(len(keys)) - np.searchsorted(key_company, key_company, side="left")
+        slots = max(int(slot.max()) + 1 if len(slot) else 1, 1)
+        matrix_years = np.full((len(starts), slots), np.nan)
+        matrix_years[key_company, slot] = keys % 10000
+        section_rows = {
+            "balance_sheets": first_rows["balance_sheets"][1][balance_index],
+            "income_statements": first_rows["income_statements"][1][income_index],
+        }
+        values = {}
+        for series, (section, name) in TREND_SERIES.items():
+            values[series] = np.full((len(starts), slots), np.nan)
+            values[series][key_company, slot] = np.asarray(version.column(section, name)[section_rows[section]], dtype=float)
+        return self.analyze(matrix_years, values)
+
+
+# Create a singleton instance
+trend_engine = TrendEngine()
@@ -0,0 +1,327 @@
+"""
+Industry benchmarks: per-year distributions of financial ratios by NACE code.
+
+The build_industry_benchmarks job computes every company's ratios from the
+statement store, groups them by NACE class, NACE division and the whole
+economy, and saves one sorted array of values per (group, year, ratio)
+together with its quartiles and mean. A company's percentile within its
+industry is then two binary searches over the matching sorted array.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.db.statement_store import StatementStoreVersion, float_array
+from app.models.financial import IndustryBenchmark
+from app.services.financial_batch import BALANCE_SHEET_COLUMNS, INCOME_STATEMENT_COLUMNS, batch_health_scorer
+
+# Benchmarked ratios and the statement column each one divides by; a ratio
+# whose denominator is zero or missing is undefined and left out
+METRIC_DENOMINATORS = {
+    "current_ratio": "current_liabilities",
+    "quick_ratio": "current_liabilities",
+    "cash_ratio": "current_liabilities",
+    "gross_profit_margin": "net_turnover",
+    "net_profit_margin": "net_turnover",
+    "return_on_assets": "total_assets",
+    "return_on_equity": "equity",
+    "debt_to_equity": "equity",
+    "debt_to_assets": "total_assets",
+    "equity_ratio": "total_assets",
+    "asset_turnover": "total_assets",
+    "inventory_turnover": "inventories",
+    "receivables_turnover": "accounts_receivable",
+}
+METRICS = tuple(METRIC_DENOMINATORS)
+
+# Benchmark group of every company, used when a company's NACE groups are too small
+ALL_INDUSTRIES = "ALL"
+# Business activity columns that may hold a NACE code, most specific first
+NACE_FIELDS = ("nace_code", "nace", "area_of_activity")
+# A NACE code such as 62, 62.0 or 62.01, alone or inside an activity description
+NACE_PATTERN = re.compile(r"\b(\d{2})(?:\.(\d{1,2}))?\b")
+
+
+def nace_code(records: Iterable[Dict[str, Any]]) -> Optional[str]:
+    """
+    Get a company's NACE code from its business activity records.
+
+    Args:
+        records: The company's business activity records
+
+    Returns:
+        The code of the first activity that has one, e.g. '62.01', or None
+    """
+    for record in records:
+        for field in NACE_FIELDS:
+            match = NACE_PATTERN.search(str(record.get(field) or ""))
+            if match:
+                division, rest = match.groups()
+                return f"{division}.{rest}" if rest else division
+    return None
+
+
+def nace_groups(code: Optional[str]) -> List[str]:
+    """Get the benchmark groups of a NACE code, most specific first: class, division, all industries."""
+    groups = []
+    if code:
+        groups.append(code)
+        division = code.split(".")[0]
+        if division != code:
+            groups.append(division)
+    groups.append(ALL_INDUSTRIES)
+    return groups
+
+
+def _columns(section: Dict[str, np.ndarray], names: Iterable[str], rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """Pick the given rows of statement columns."""
+    return {name: np.asarray(section[name][rows], dtype=float) for name in names}
+
+
+def company_ratios(balance: Dict[str, np.ndarray], income: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Calculate benchmarked ratios, NaN where a ratio is undefined.
+
+    Args:
+        balance: Balance sheet columns, one element per company-year
+        income: Income statement columns of the same company-years
+
+    Returns:
+        Arrays keyed by metric name
+    """
+    ratios = batch_health_scorer.calculate_ratios(balance, income)
+    columns = {**balance, **income}
+    defined = {}
+    for metric, denominator in METRIC_DENOMINATORS.items():
+        values = np.asarray(columns[denominator], dtype=float)
+        valid = (values != 0) & ~np.isnan(values) & np.isfinite(ratios[metric])
+        defined[metric] = np.where(valid, ratios[metric], np.nan)
+    return defined
+
+
+def statement_ratios(balance_sheet: Dict[str, Any], income_statement: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """
+    Calculate one company-year's benchmarked ratios the way the tables were built.
+
+    Args:
+        balance_sheet: The year's balance sheet record
+        income_statement: The year's income statement record
+
+    Returns:
+        The ratios keyed by metric name, None where undefined
+    """
+    balance = {name: float_array([balance_sheet.get(name)]) for name in BALANCE_SHEET_COLUMNS}
+    income = {name: float_array([income_statement.get(name)]) for name in INCOME_STATEMENT_COLUMNS}
+    ratios = company_ratios(balance, income)
+    return {metric: None if np.isnan(values[0]) else float(values[0]) for metric, values in ratios.items()}
+
+
+def _quantile(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Interpolate a quantile of every sorted segment, like np.quantile's default method."""
+    position = starts + q * (counts - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def build_tables(version: StatementStoreVersion, nace_codes: Dict[str, str], min_companies: int = None) -> Dict[str, np.ndarray]:
+    """
+    Compute the benchmark tables from the statement store.
+
+    Every company-year with a balance sheet and an income statement counts
+    once, from its newest annual report of that year. Groups with fewer
+    companies than min_companies in a year are left out.
+
+    Args:
+        version: The statement store copy to read
+        nace_codes: NACE code by registration number, as given by nace_code()
+        min_companies: Smallest group size benchmarked
+
+    Returns:
+        Arrays describing one segment per (group, year, metric) and the sorted values
+    """
+    min_companies = max(1, min_companies or settings.INDUSTRY_BENCHMARK_MIN_COMPANIES)
+    present = np.asarray(version.column("balance_sheets", "_present")) & np.asarray(version.column("income_statements", "_present"))
+    rows = np.flatnonzero(present & (np.asarray(version.years) > 0))
+    regcodes = np.asarray(version.regcodes)[rows]
+    years = np.asarray(version.years)[rows]
+    # Rows are sorted newest report first within a company, so keep the first of each year
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (regcodes[1:] != regcodes[:-1]) | (years[1:] != years[:-1])
+    rows, regcodes, years = rows[first], regcodes[first], years[first]
+
+    balance = _columns({name: version.column("balance_sheets", name) for name in BALANCE_SHEET_COLUMNS}, BALANCE_SHEET_COLUMNS, rows)
+    income = _columns({name: version.column("income_statements", name) for name in INCOME_STATEMENT_COLUMNS}, INCOME_STATEMENT_COLUMNS, rows)
+    ratios = company_ratios(balance, income)
+
+    # NACE class and division of every row, through the distinct registration numbers;
+    # a code that is only a division is benchmarked at the division level
+    unique_regcodes, inverse = np.unique(regcodes, return_inverse=True)
+    codes = [nace_codes.get(reg.decode("utf-8")) or "" for reg in unique_regcodes.tolist()]
+    levels = [
+        np.array([code if "." in code else "" for code in codes], dtype=str)[inverse],
+        np.array([code.split(".")[0] for code in codes], dtype=str)[inverse],
+        np.full(len(rows), ALL_INDUSTRIES),
+    ]
+
+    table = {name: [] for name in ("group", "year", "metric", "count", "mean", "p25", "median", "p75")}
+    values_parts = []
+    for groups in levels:
+        has_group = groups != ""
+        group_names, group_ids = np.unique(groups, return_inverse=True)
+        for metric_id, metric in enumerate(METRICS):
+            mask = has_group & ~np.isnan(ratios[metric])
+            if not mask.any():
+                continue
+            ids, metric_years, values = group_ids[mask], years[mask], ratios[metric][mask]
+            order = np.lexsort((values, metric_years, ids))
+            ids, metric_years, values = ids[order], metric_years[order], values[order]
+            boundary = np.ones(len(values), dtype=bool)
+            boundary[1:] = (ids[1:] != ids[:-1]) | (metric_years[1:] != metric_years[:-1])
+            starts = np.flatnonzero(boundary)
+            segment_counts = np.diff(np.append(starts, len(values)))
+            keep = segment_counts >= min_companies
+            if not keep.any():
+                continue
+
+            values_parts.append(values[np.repeat(keep, segment_counts)])
+            starts, counts = starts[keep], segment_counts[keep]
+            table["group"].append(group_names[ids[starts]])
+            table["year"].append(metric_years[starts])
+            table["metric"].append(np.full(len(starts), metric_id))
+            table["count"].append(counts)
+            table["mean"].append(np.add.reduceat(values, starts) / counts)
+            for name, q in (("p25", 0.25), ("median", 0.5), ("p75", 0.75)):
+                table[name].append(_quantile(values, starts, counts, q))
+
+    dtypes = {"group": str, "year": np.int32, "metric": np.int16, "count": np.int64,
+              "mean": np.float64, "p25": np.float64, "median": np.float64, "p75": np.float64}
+    tables = {
+        name: np.concatenate(parts).astype(dtypes[name]) if parts else np.array([], dtype=dtypes[name])
+        for name, parts in table.items()
+    }
+    tables["offset"] = np.concatenate(([0], np.cumsum(tables["count"])[:-1])).astype(np.int64)
+    tables["values"] = np.concatenate(values_parts) if values_parts else np.array([], dtype=np.float64)
+    tables["metrics"] = np.array(METRICS, dtype=str)
+    return tables
+
+
+def save_tables(tables: Dict[str, np.ndarray], path: str = None):
+    """Write the benchmark tables, replacing the previous ones at once."""
+    path = path or settings.INDUSTRY_BENCHMARKS_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, **tables)
+    os.replace(temporary, path)
+
+
+class BenchmarkTable:
+    """Loaded benchmark tables with a (group, year, metric) lookup of their segments."""
+
+    def __init__(self, path: str):
+        """Load the tables saved by save_tables()."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        self.values = arrays["values"]
+        self.offsets = arrays["offset"]
+        self.counts = arrays["count"]
+        self.stats = {name: arrays[name] for name in ("mean", "p25", "median", "p75")}
+        metrics = arrays["metrics"].tolist()
+        self.segments = {
+            (group, year, metrics[metric]): index
+            for index, (group, year, metric) in enumerate(zip(
+                arrays["group"].tolist(), arrays["year"].tolist(), arrays["metric"].tolist()
+            ))
+        }
+        self.years = sorted(set(arrays["year"].tolist()))
+
+    def percentile(self, segment: int, value: float) -> float:
+        """Get the percentile rank of a value within a segment, ties counting half."""
+        start = self.offsets[segment]
+        values = self.values[start:start + self.counts[segment]]
+        below = np.searchsorted(values, value, side="left")
+        at_most = np.searchsorted(values, value, side="right")
+        return float((below + at_most) / 2 / len(values) * 100)
+
+
+class IndustryBenchmarkService:
+    """Answers industry benchmark queries from the precomputed tables."""
+
+    def __init__(self, path: str = None):
+        """Initialize the service; the tables are loaded lazily."""
+        self.path = path or settings.INDUSTRY_BENCHMARKS_PATH
+        self._table: Optional[BenchmarkTable] = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def table(self) -> Optional[BenchmarkTable]:
+        """Get the loaded tables, reloading them when the job rewrote the file."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._table = BenchmarkTable(self.path)
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Error loading industry benchmarks: {e}")
+                        self._table = None
+                    self._mtime = mtime
+        return self._table
+
+    def is_ready(self) -> bool:
+        """Check whether the benchmark tables have been built."""
+        return self.table() is not None
+
+    def benchmarks(self, code: Optional[str], year: int, ratios: Dict[str, Optional[float]]) -> List[IndustryBenchmark]:
+        """
+        Compare a company's ratios with its industry in a year.
+
+        Each metric is compared with the most specific of the company's NACE
+        class, NACE division and all industries that has a benchmark.
+
+        Args:
+            code: The company's NACE code, if known
+            year: Financial year
+            ratios: The company's ratios; None where undefined
+
+        Returns:
+            One IndustryBenchmark per metric with a benchmark that year
+        """
+        table = self.table()
+        if table is None:
+            return []
+        results = []
+        for metric in METRICS:
+            for group in nace_groups(code):
+                segment = table.segments.get((group, year, metric))
+                if segment is None:
+                    continue
+                value = ratios.get(metric)
+                median = float(table.stats["median"][segment])
+                benchmark = IndustryBenchmark(
+                    industry_sector=group,
+                    metric_name=metric,
+                    median_value=median,
+                    percentile_25=float(table.stats["p25"][segment]),
+                    percentile_75=float(table.stats["p75"][segment]),
+                    average_value=float(table.stats["mean"][segment]),
+                    company_value=value,
+                )
+                if value is not None:
+                    benchmark.company_percentile = round(table.percentile(segment, value), 1)
+                    benchmark.performance_vs_median = "ABOVE" if value > median else "BELOW" if value < median else "AVERAGE"
+                results.append(benchmark)
+                break
+        return results
+
+
+# Create a singleton instance
+industry_benchmark_service = IndustryBenchmarkService()
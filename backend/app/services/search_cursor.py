@@ -0,0 +1,56 @@
+"""
+Opaque cursors for paging through company search results.
+
+A cursor holds the position of the next page and a fingerprint of the
+search it belongs to, so it cannot be replayed against another query.
+"""
+import base64
+import hashlib
+import json
+from typing import Any, Dict
+
+
+def _fingerprint(params: Dict[str, Any]) -> str:
+    """Get a short digest of the search parameters."""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(position: int, params: Dict[str, Any]) -> str:
+    """
+    Make the cursor of a page.
+
+    Args:
+        position: Offset of the page's first result
+        params: The search parameters (query, filters...) the cursor belongs to
+
+    Returns:
+        The opaque cursor
+    """
+    payload = json.dumps({"p": position, "f": _fingerprint(params)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, params: Dict[str, Any]) -> int:
+    """
+    Get the position a cursor points at.
+
+    Args:
+        cursor: A cursor made by encode_cursor()
+        params: The search parameters of the current request
+
+    Returns:
+        Offset of the page's first result
+
+    Raises:
+        ValueError: The cursor is malformed or belongs to another search
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        position, fingerprint = int(payload["p"]), payload["f"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid search cursor")
+    if fingerprint != _fingerprint(params) or position < 0:
+        raise ValueError("The search cursor belongs to a different search")
+    return position
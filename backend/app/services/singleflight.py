@@ -0,0 +1,51 @@
+"""
+Request coalescing for identical concurrent calls.
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    In-flight call table keyed by request identity.
+
+    Concurrent callers asking for the same key await one shared call
+    instead of each issuing their own. The shared call runs as its own
+    task, so a cancelled caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        """Initialize an empty in-flight table."""
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.stats = {"upstream_calls": 0, "coalesced_calls": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers of the same key.
+
+        Args:
+            key: Identity of the call, e.g. a cache key
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            A deep copy of the call's result, so every caller can modify
+            its own copy freely
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.stats["coalesced_calls"] += 1
+        else:
+            self.stats["upstream_calls"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def in_flight(self) -> int:
+        """Get the number of calls currently in flight."""
+        return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get upstream and coalesced call counters."""
+        return {**self.stats, "in_flight": self.in_flight()}
@@ -0,0 +1,3 @@
+"""
+Benchmarking tools for TURBO_AML: a local CKAN stand-in and a load driver.
+"""
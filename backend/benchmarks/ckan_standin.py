@@ -0,0 +1,345 @@
+"""
+Local stand-in for the data.gov.lv CKAN action API.
+
+Serves datastore_search and datastore_search_sql for the configured
+resources from fixture files, with optional latency and error injection,
+so endpoint benchmarks are repeatable. In record mode every request is
+forwarded to the real CKAN instance and its response is saved as a fixture.
+
+SQL is evaluated against an in-memory SQLite copy of the fixture records.
+The PostgreSQL idioms the API sends (`::text` casts, `to_jsonb(row) - '_full_text'`
+and `(SELECT to_jsonb(p) FROM (SELECT ...) p)` projections) are rewritten to
+their SQLite equivalents first, so the multi-year CTE/UNION ALL join, the
+`MAX(_id)` republish check and the `_id` keyset pages of the mirror sync run
+as they would upstream.
+
+Fixture layout:
+    <fixtures>/resources/<resource_id>.jsonl   one record per line, answered by query evaluation
+    <fixtures>/responses/<sha1>.json           exact recorded responses, replayed first
+
+Usage:
+    python -m benchmarks.ckan_standin --fixtures benchmarks/fixtures --latency-ms 80 --error-rate 0.01
+    python -m benchmarks.ckan_standin --record --upstream https://data.gov.lv/dati/lv/
+
+Then point the API at it with CKAN_BASE_URL=http://localhost:8100/
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+from typing import Any, Dict, List
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.db.mirror import MIRROR_RESOURCES
+
+
+def request_key(action: str, body: Dict[str, Any]) -> str:
+    """Get the fixture key of an action call."""
+    canonical = json.dumps({"action": action, "body": body}, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"success": False, "error": {"message": message}})
+
+
+def _matches(record: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    for field, value in filters.items():
+        values = value if isinstance(value, list) else [value]
+        if str(record.get(field)) not in {str(v) for v in values}:
+            return False
+    return True
+
+
+def _matches_text(record: Dict[str, Any], q: str) -> bool:
+    q = q.lower()
+    return any(q in str(value).lower() for value in record.values() if value is not None)
+
+
+SQL_CASTS = {"text": "TEXT", "varchar": "TEXT", "int": "INTEGER", "integer": "INTEGER",
+             "bigint": "INTEGER", "numeric": "REAL", "float": "REAL", "date": "TEXT"}
+_PROJECTION = re.compile(r'\(SELECT to_jsonb\((\w+)\) FROM \(SELECT (.+?)\) \1\)')
+_ROW_JSON = re.compile(r"to_jsonb\((\w+)\) - '_full_text'")
+_CAST = re.compile(r'((?:\w+\.)?(?:"[^"]+"|\w+))::(\w+)')
+_TABLE_ALIAS = re.compile(r'FROM "([^"]+)"(?:\s+(?!WHERE|ORDER|LIMIT|JOIN|GROUP|UNION)(\w+))?', re.IGNORECASE)
+_CTE = re.compile(r'(\w+) AS \(SELECT \* FROM "([^"]+)"', re.IGNORECASE)
+
+
+def _json_object(alias: str, columns: List[str]) -> str:
+    return "json_object(" + ", ".join(f"'{column}', {alias}.\"{column}\"" for column in columns) + ")"
+
+
+def to_sqlite(sql: str, columns: Dict[str, List[str]]) -> str:
+    """
+    Rewrite the PostgreSQL the API sends to datastore_search_sql into SQLite.
+
+    Args:
+        sql: Query as sent to CKAN
+        columns: Column names by resource id
+
+    Returns:
+        Equivalent SQLite query
+    """
+    # Table aliases are resolved per UNION ALL branch, since each branch may reuse the same alias
+    ctes = {alias: resource_id for alias, resource_id in _CTE.findall(sql)}
+    branches = re.split(r"(\sUNION ALL\s)", sql, flags=re.IGNORECASE)
+    if len(branches) > 1:
+        return "".join(branch if i % 2 else to_sqlite_branch(branch, columns, ctes) for i, branch in enumerate(branches))
+    return to_sqlite_branch(sql, columns, ctes)
+
+
+def to_sqlite_branch(sql: str, columns: Dict[str, List[str]], ctes: Dict[str, str]) -> str:
+    """Rewrite one SELECT of a datastore_search_sql query, resolving its table aliases."""
+    aliases = dict(ctes)
+    for resource_id, alias in _TABLE_ALIAS.findall(sql):
+        aliases[alias or resource_id] = resource_id
+
+    def projection(match):
+        fields = [field.strip() for field in match.group(2).split(",")]
+        return "json_object(" + ", ".join(
+            f"'{field.split('.', 1)[-1].strip(chr(34))}', {field}" for field in fields
+        ) + ")"
+
+    def row_json(match):
+        alias = match.group(1)
+        if aliases.get(alias) not in columns:
+            raise sqlite3.OperationalError(f'relation "{alias}" does not exist')
+        return _json_object(alias, columns[aliases[alias]])
+
+    def cast(match):
+        target = SQL_CASTS.get(match.group(2).lower())
+        if target is None:
+            raise sqlite3.OperationalError(f'type "{match.group(2)}" does not exist')
+        return f"CAST({match.group(1)} AS {target})"
+
+    sql = _PROJECTION.sub(projection, sql)
+    sql = _ROW_JSON.sub(row_json, sql)
+    return _CAST.sub(cast, sql)
+
+
+class FixtureStore:
+    """Fixture records by resource id and recorded responses by request key."""
+
+    def __init__(self, path: str):
+        """Load every fixture under path."""
+        self.path = path
+        self.records: Dict[str, List[Dict[str, Any]]] = {}
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.columns: Dict[str, List[str]] = {}
+        self.sql = sqlite3.connect(":memory:", check_same_thread=False)
+        self.sql.row_factory = sqlite3.Row
+        os.makedirs(os.path.join(path, "resources"), exist_ok=True)
+        os.makedirs(os.path.join(path, "responses"), exist_ok=True)
+
+        for resource_id, _ in MIRROR_RESOURCES.values():
+            file_path = os.path.join(path, "resources", f"{resource_id}.jsonl")
+            if os.path.exists(file_path):
+                with open(file_path, encoding="utf-8") as f:
+                    self.records[resource_id] = [json.loads(line) for line in f if line.strip()]
+                self._load_table(resource_id, self.records[resource_id])
+        for name in os.listdir(os.path.join(path, "responses")):
+            with open(os.path.join(path, "responses", name), encoding="utf-8") as f:
+                self.responses[name[:-len(".json")]] = json.load(f)
+        self.sql.execute("PRAGMA query_only = ON")
+
+    def _load_table(self, resource_id: str, records: List[Dict[str, Any]]):
+        """Copy a resource's records into a SQLite table named by its resource id."""
+        columns = ["_id"]
+        for record in records:
+            columns.extend(key for key in record if key not in columns)
+        self.columns[resource_id] = columns
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        self.sql.execute(f'CREATE TABLE "{resource_id}" ({column_list})')
+        rows = []
+        for row_id, record in enumerate(records, start=1):
+            values = [record.get("_id", row_id)]
+            for column in columns[1:]:
+                value = record.get(column)
+                values.append(json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value)
+            rows.append(values)
+        placeholders = ", ".join("?" for _ in columns)
+        self.sql.executemany(f'INSERT INTO "{resource_id}" VALUES ({placeholders})', rows)
+        self.sql.commit()
+
+    def save_response(self, key: str, status_code: int, payload: Dict[str, Any]):
+        """Store an upstream response for replay."""
+        entry = {"status_code": status_code, "payload": payload}
+        self.responses[key] = entry
+        with open(os.path.join(self.path, "responses", f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+
+    def datastore_search(self, body: Dict[str, Any]) -> JSONResponse:
+        """Evaluate a datastore_search call against the fixture records."""
+        resource_id = body.get("resource_id")
+        if resource_id not in self.records:
+            return _error(404, f"Not found: Resource \"{resource_id}\" was not found.")
+        records = self.records[resource_id]
+
+        filters = body.get("filters") or {}
+        if isinstance(filters, str):
+            filters = json.loads(filters)
+        known_fields = set().union(*(record.keys() for record in records)) if records else set()
+        unknown = [field for field in filters if field not in known_fields]
+        if unknown:
+            return _error(409, f"field \"{unknown[0]}\" not in resource")
+        matched = [record for record in records if _matches(record, filters)]
+        if body.get("q"):
+            matched = [record for record in matched if _matches_text(record, str(body["q"]))]
+
+        if body.get("sort"):
+            for part in reversed(str(body["sort"]).split(",")):
+                field, _, direction = part.strip().partition(" ")
+                matched = sorted(
+                    matched,
+                    key=lambda record: (record.get(field) is None, record.get(field)),
+                    reverse=direction.strip().lower() == "desc"
+                )
+
+        offset = int(body.get("offset") or 0)
+        limit = int(body.get("limit") if body.get("limit") is not None else 100)
+        page = matched[offset:offset + limit]
+
+        fields = body.get("fields")
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(",")]
+        if fields:
+            missing = [field for field in fields if field not in known_fields]
+            if missing:
+                return _error(409, f"field \"{missing[0]}\" not in resource")
+            page = [{field: record.get(field) for field in fields} for record in page]
+
+        result = {"resource_id": resource_id, "records": page, "limit": limit, "offset": offset}
+        if body.get("include_total", True):
+            result["total"] = len(matched)
+        return JSONResponse(content={"success": True, "result": result})
+
+    def datastore_search_sql(self, body: Dict[str, Any]) -> JSONResponse:
+        """Evaluate a datastore_search_sql call against the SQLite copy of the fixtures."""
+        sql = str(body.get("sql") or "").strip().rstrip(";")
+        if not re.match(r"(SELECT|WITH)\b", sql, re.IGNORECASE):
+            return _error(409, "Query is not a single statement.")
+        try:
+            cursor = self.sql.execute(to_sqlite(sql, self.columns))
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            # CKAN answers invalid SQL with a validation error, not a server error
+            return _error(409, f"Validation Error: {e}")
+
+        fields = [description[0] for description in cursor.description or []]
+        records = []
+        for row in rows:
+            record = dict(zip(fields, row))
+            if isinstance(record.get("data"), str) and record["data"].startswith("{"):
+                record["data"] = json.loads(record["data"])
+            records.append(record)
+        result = {"records": records, "fields": [{"id": field} for field in fields], "sql": body.get("sql")}
+        return JSONResponse(content={"success": True, "result": result})
+
+
+def create_app(
+    fixtures: str,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    error_rate: float = 0,
+    error_status: int = 503,
+    seed: int = 0,
+    upstream: str = None
+) -> FastAPI:
+    """
+    Build the stand-in ASGI app.
+
+    Args:
+        fixtures: Fixture directory
+        latency_ms: Added latency per request
+        jitter_ms: Uniform random jitter added to the latency
+        error_rate: Share of requests answered with error_status
+        error_status: HTTP status of injected errors (e.g. 429 or 503)
+        seed: Random seed, so latency and errors repeat between runs
+        upstream: Real CKAN base URL; when set, requests are forwarded and recorded
+    """
+    app = FastAPI(title="CKAN stand-in")
+    store = FixtureStore(fixtures)
+    rng = random.Random(seed)
+    stats = {"requests": 0, "replayed": 0, "evaluated": 0, "recorded": 0, "injected_errors": 0}
+    upstream_client = httpx.AsyncClient(base_url=upstream.rstrip("/") + "/", timeout=120) if upstream else None
+
+    @app.post("/api/3/action/{action}")
+    async def action(action: str, request: Request):
+        body = await request.json()
+        key = request_key(action, body)
+        stats["requests"] += 1
+
+        if upstream_client is not None:
+            response = await upstream_client.post(f"api/3/action/{action}", json=body)
+            payload = response.json()
+            store.save_response(key, response.status_code, payload)
+            stats["recorded"] += 1
+            return JSONResponse(status_code=response.status_code, content=payload)
+
+        delay = latency_ms + rng.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and rng.random() < error_rate:
+            stats["injected_errors"] += 1
+            return _error(error_status, "Injected error")
+
+        if key in store.responses:
+            stats["replayed"] += 1
+            entry = store.responses[key]
+            return JSONResponse(status_code=entry["status_code"], content=entry["payload"])
+        if action == "datastore_search":
+            stats["evaluated"] += 1
+            return store.datastore_search(body)
+        if action == "datastore_search_sql":
+            stats["evaluated"] += 1
+            return store.datastore_search_sql(body)
+        return _error(400, f"Bad request - Action name not known: {action}")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.on_event("shutdown")
+    async def close_upstream():
+        if upstream_client is not None:
+            await upstream_client.aclose()
+
+    return app
+
+
+def main():
+    """Parse command line arguments and serve the stand-in."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local CKAN stand-in for benchmarks")
+    parser.add_argument("--fixtures", default="benchmarks/fixtures", help="Fixture directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency up to this value")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for latency and errors")
+    parser.add_argument("--record", action="store_true", help="Forward to --upstream and record responses")
+    parser.add_argument("--upstream", default="https://data.gov.lv/dati/lv/", help="CKAN instance to record from")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        upstream=args.upstream if args.record else None,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
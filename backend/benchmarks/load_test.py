@@ -0,0 +1,124 @@
+"""
+Closed-loop load driver for the TURBO_AML API.
+
+Runs a fixed number of concurrent clients against each endpoint for a
+fixed duration and reports throughput and latency percentiles. Combined
+with the CKAN stand-in this gives repeatable before/after numbers.
+
+Usage:
+    python -m benchmarks.load_test --api http://localhost:8000 --concurrency 20 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, List
+import httpx
+from app.db.mirror import MIRROR_RESOURCES
+
+ENDPOINTS = {
+    "search": "/api/search?q={word}",
+    "company": "/api/company/{reg_number}",
+    "statements": "/api/financial/{reg_number}/statements",
+    "health_score": "/api/financial/{reg_number}/health-score",
+}
+
+
+def load_registration_numbers(fixtures: str, limit: int = 1000) -> List[str]:
+    """Get registration numbers from the company fixture."""
+    resource_id, key_field = MIRROR_RESOURCES["company"]
+    numbers = []
+    with open(os.path.join(fixtures, "resources", f"{resource_id}.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            numbers.append(str(json.loads(line)[key_field]))
+            if len(numbers) >= limit:
+                break
+    return numbers
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Get a percentile of a sorted sample list."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    template: str,
+    reg_numbers: List[str],
+    concurrency: int,
+    duration: float,
+    seed: int
+) -> Dict[str, float]:
+    """
+    Drive one endpoint with concurrent clients.
+
+    Returns:
+        Request count, error count, throughput and latency percentiles in ms
+    """
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            reg_number = rng.choice(reg_numbers)
+            url = template.format(reg_number=reg_number, word=reg_number[-4:])
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+async def run(api: str, fixtures: str, endpoints: List[str], concurrency: int, duration: float, seed: int):
+    """Benchmark the chosen endpoints one after another and print a table."""
+    reg_numbers = load_registration_numbers(fixtures)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api, timeout=60, limits=limits) as client:
+        print(f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name in endpoints:
+            result = await run_endpoint(client, ENDPOINTS[name], reg_numbers, concurrency, duration, seed)
+            print(
+                f"{name:<14}{result['requests']:>10}{result['errors']:>8}{result['rps']:>9}"
+                f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            )
+
+
+def main():
+    """Parse command line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Load test the TURBO_AML API")
+    parser.add_argument("--api", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--fixtures", default="benchmarks/fixtures", help="Fixture directory with company records")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.api, args.fixtures, args.endpoints, args.concurrency, args.duration, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Generate synthetic CKAN fixtures for the stand-in server.
+
+Every configured resource gets consistent rows for the same set of
+companies, so every endpoint has data to work on.
+
+Usage:
+    python -m benchmarks.make_fixtures --companies 2000 --years 6
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date
+from app.db.mirror import MIRROR_RESOURCES
+from app.models.financial import BalanceSheet, CashFlowStatement, IncomeStatement
+from app.services import ckan_fields
+
+CITIES = ["Rīga", "Daugavpils", "Liepāja", "Jelgava", "Jūrmala", "Ventspils", "Rēzekne", "Valmiera"]
+WORDS = ["Baltic", "Nord", "Amber", "Koks", "Metāls", "Dati", "Logistika", "Būve", "Agro", "Tehnika", "Serviss"]
+TYPES = [("SIA", "Sabiedrība ar ierobežotu atbildību"), ("AS", "Akciju sabiedrība"), ("IK", "Individuālais komersants")]
+RATINGS = ["A", "B", "C", "N"]
+NACE_ACTIVITIES = [
+    "62.01 Datorprogrammēšana", "41.20 Ēku būvniecība", "46.90 Nespecializētā vairumtirdzniecība",
+    "49.41 Kravu pārvadājumi pa autoceļiem", "56.10 Restorānu darbība", "01.11 Graudaugu audzēšana",
+    "16.10 Zāģēšana, ēvelēšana un impregnēšana", "68.20 Nekustamā īpašuma izīrēšana un pārvaldīšana",
+]
+STATEMENT_COLUMNS = {"statement_id", "file_id", "year", "currency"}
+
+
+def _record_value(rng: random.Random, field: str, name: str):
+    """Get a plausible value for a section column."""
+    if field in ("name", "nosaukums"):
+        return name
+    if field.endswith("_date") or field in ("date_from", "registered_on", "last_modified_at", "informacijas_atjaunosanas_datums"):
+        return date(rng.randint(2000, 2023), rng.randint(1, 12), rng.randint(1, 28)).isoformat()
+    if field in ("amount", "number_of_shares", "votes", "share_nominal_value"):
+        return rng.randint(1, 100000)
+    if field in ("currency", "share_currency"):
+        return "EUR"
+    if field == "entity_type":
+        return rng.choice(["NATURAL_PERSON", "LEGAL_ENTITY"])
+    if field == "reitings":
+        return rng.choice(RATINGS)
+    if field == "area_of_activity":
+        return rng.choice(NACE_ACTIVITIES)
+    return f"{field}-{rng.randint(1, 50)}"
+
+
+def generate(path: str, companies: int, years: int, seed: int = 0):
+    """
+    Write fixture files for every configured resource.
+
+    Args:
+        path: Fixture directory
+        companies: Number of companies
+        years: Annual reports per company
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    rows = {name: [] for name in MIRROR_RESOURCES}
+    section_fields = {
+        "capital": ckan_fields.CAPITAL_FIELDS,
+        "beneficiaries": ckan_fields.BENEFICIARY_FIELDS,
+        "members": ckan_fields.MEMBER_FIELDS,
+        "business": ckan_fields.BUSINESS_FIELDS,
+        "liquidation": ckan_fields.LIQUIDATION_FIELDS,
+        "officers": ckan_fields.OFFICER_FIELDS,
+        "stockholders": ckan_fields.STOCKHOLDER_FIELDS,
+        "taxpayer_ratings": ckan_fields.TAXPAYER_RATING_FIELDS,
+    }
+    statement_models = {
+        "balance_sheets": BalanceSheet,
+        "income_statements": IncomeStatement,
+        "cash_flow_statements": CashFlowStatement,
+    }
+    statement_id = 0
+
+    for n in range(companies):
+        regcode = str(40003000000 + n)
+        in_quotes = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}"
+        company_type, type_text = rng.choice(TYPES)
+        city = rng.choice(CITIES)
+        rows["company"].append({
+            "regcode": regcode, "sepa": f"LV{n:08d}", "name": f'{company_type} "{in_quotes}"',
+            "name_before_quotes": company_type, "name_in_quotes": in_quotes, "name_after_quotes": "",
+            "without_quotes": f"{company_type} {in_quotes}", "regtype": "K", "regtype_text": "Komercreģistrs",
+            "type": company_type, "type_text": type_text,
+            "registered": date(rng.randint(1991, 2022), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+            "terminated": "", "closed": "", "address": f"{city}, Brīvības iela {rng.randint(1, 200)}",
+            "index": rng.randint(1001, 5799), "addressid": rng.randint(100000000, 199999999),
+            "region": rng.randint(1, 999), "city": city, "atvk": f"{rng.randint(1, 9999):07d}",
+        })
+
+        for name, fields in section_fields.items():
+            if name == "liquidation" and rng.random() > 0.03:
+                continue
+            _, key_field = MIRROR_RESOURCES[name]
+            for _ in range(1 if name in ("business", "taxpayer_ratings") else rng.randint(1, 3)):
+                record = {field: _record_value(rng, field, in_quotes) for field in fields}
+                record[key_field] = regcode
+                rows[name].append(record)
+
+        # Annual reports with statements that roughly follow a growth path
+        scale = rng.uniform(1e4, 1e7)
+        for year in range(2023 - years + 1, 2024):
+            statement_id += 1
+            scale *= rng.uniform(0.8, 1.3)
+            rows["financial_statements"].append({
+                "id": statement_id, "file_id": statement_id, "legal_entity_registration_number": regcode,
+                "source_schema": "VID", "source_type": "UGP", "year": year,
+                "year_started_on": f"{year}-01-01T00:00:00", "year_ended_on": f"{year}-12-31T00:00:00",
+                "employees": rng.randint(1, 500), "rounded_to_nearest": "ONES", "currency": "EUR",
+                "created_at": f"{year + 1}-04-30T00:00:00",
+            })
+            for name, model in statement_models.items():
+                record = {"statement_id": statement_id, "file_id": statement_id}
+                for field, info in model.model_fields.items():
+                    if field not in STATEMENT_COLUMNS and "float" in str(info.annotation):
+                        record[field] = round(scale * rng.uniform(-0.2, 1.0), 2)
+                rows[name].append(record)
+
+    os.makedirs(os.path.join(path, "resources"), exist_ok=True)
+    for name, records in rows.items():
+        resource_id, _ = MIRROR_RESOURCES[name]
+        with open(os.path.join(path, "resources", f"{resource_id}.jsonl"), "w", encoding="utf-8") as f:
+            for i, record in enumerate(records, start=1):
+                f.write(json.dumps({"_id": i, **record}, ensure_ascii=False) + "\n")
+        print(f"Wrote {len(records)} {name} records")
+
+
+def main():
+    """Parse command line arguments and write the fixtures."""
+    parser = argparse.ArgumentParser(description="Generate synthetic CKAN fixtures")
+    parser.add_argument("--fixtures", default="benchmarks/fixtures", help="Fixture directory")
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.fixtures, args.companies, args.years, args.seed)
+
+
+if __name__ == "__main__":
+    main()
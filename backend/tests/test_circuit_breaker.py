@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from app.services import circuit_breaker as circuit_breaker_module
+from app.services.ckan_client import CKANError
+from app.services.ckan_service import CKANService
+from app.services.ckan_cache import CKANCache
+
+RESOURCE = "resource"
+
+
+class Clock:
+    """Stand-in for the time module that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module, "time", clock)
+    return clock
+
+
+def _half_open_service(clock) -> CKANService:
+    service = CKANService(cache=CKANCache(redis_client=None, max_entries=100))
+    breaker = service.breakers.for_resource(RESOURCE)
+    breaker.min_calls = 1
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    clock.now += breaker.reset_timeout
+    return service
+
+
+def test_cancelled_probe_releases_half_open_breaker(clock):
+    async def run():
+        service = _half_open_service(clock)
+        breaker = service.breakers.for_resource(RESOURCE)
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.ensure_future(service._fetch("key-1", RESOURCE, hang))
+        await started.wait()
+        assert breaker.state == breaker.HALF_OPEN and breaker.probe_in_flight
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert not breaker.probe_in_flight
+
+        async def ok():
+            return {"records": []}
+
+        assert await service._fetch("key-2", RESOURCE, ok) == {"records": []}
+        assert breaker.state == breaker.CLOSED
+
+    asyncio.run(run())
+
+
+def test_failed_probe_reopens_breaker(clock):
+    async def run():
+        service = _half_open_service(clock)
+        breaker = service.breakers.for_resource(RESOURCE)
+
+        async def fail():
+            raise CKANError("unavailable", status_code=503)
+
+        with pytest.raises(CKANError):
+            await service._fetch("key", RESOURCE, fail)
+        assert breaker.state == breaker.OPEN and not breaker.probe_in_flight
+
+    asyncio.run(run())
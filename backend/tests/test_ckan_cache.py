@@ -0,0 +1,164 @@
+import asyncio
+import fakeredis.aioredis
+import pytest
+from app.services import ckan_cache as ckan_cache_module
+from app.services.ckan_cache import CKANCache
+from app.services.ckan_service import CKANService
+
+FINANCIAL = "financial-resource"
+VOLATILE = "volatile-resource"
+TTLS = {FINANCIAL: 1000, VOLATILE: 10}
+STALE_TTL = 50
+NEGATIVE_TTL = 30
+
+
+class Clock:
+    """Stand-in for the time module that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ckan_cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis()
+
+
+def _cache(redis=None) -> CKANCache:
+    cache = CKANCache(redis_client=redis, max_entries=100, ttls=dict(TTLS))
+    cache.stale_ttl = STALE_TTL
+    cache.negative_ttl = NEGATIVE_TTL
+    return cache
+
+
+def test_l1_hit(clock, redis):
+    async def run():
+        cache = _cache(redis)
+        key = cache.make_key(FINANCIAL, {"q": "1"})
+        await cache.set(key, FINANCIAL, {"records": [1]})
+        entry = await cache.get(key)
+        assert entry.value == {"records": [1]} and entry.fresh
+        assert cache.stats["l1_hits"] == 1 and cache.stats["l2_hits"] == 0
+
+    asyncio.run(run())
+
+
+def test_l2_hit_after_l1_miss(clock, redis):
+    async def run():
+        writer, reader = _cache(redis), _cache(redis)
+        key = writer.make_key(FINANCIAL, {"q": "2"})
+        await writer.set(key, FINANCIAL, {"records": [2]})
+
+        entry = await reader.get(key)
+        assert entry.value == {"records": [2]} and entry.fresh
+        assert reader.stats["l2_hits"] == 1
+        # The L2 hit filled the reader's L1
+        await reader.get(key)
+        assert reader.stats["l1_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_per_resource_ttl_expiry(clock, redis):
+    async def run():
+        cache = _cache(redis)
+        financial = cache.make_key(FINANCIAL, {"q": "3"})
+        volatile = cache.make_key(VOLATILE, {"q": "3"})
+        await cache.set(financial, FINANCIAL, "annual")
+        await cache.set(volatile, VOLATILE, "daily")
+        assert await redis.ttl(financial) == TTLS[FINANCIAL] + STALE_TTL
+        assert await redis.ttl(volatile) == TTLS[VOLATILE] + STALE_TTL
+
+        clock.now += TTLS[VOLATILE] + 1
+        assert (await cache.get(financial)).fresh
+        assert not (await cache.get(volatile)).fresh
+
+        # Past the stale window the volatile entry leaves L1
+        clock.now += STALE_TTL
+        # fakeredis expires keys on the real clock; drop the key as Redis would have
+        await redis.delete(volatile)
+        assert await cache.get(volatile) is None
+        assert (await cache.get(financial)).fresh
+
+    asyncio.run(run())
+
+
+def test_stale_entries_are_served(clock, redis):
+    async def run():
+        cache = _cache(redis)
+        key = cache.make_key(VOLATILE, {"q": "4"})
+        await cache.set(key, VOLATILE, {"records": ["last good"]})
+
+        clock.now += TTLS[VOLATILE] + STALE_TTL / 2
+        entry = await cache.get(key)
+        assert entry.value == {"records": ["last good"]}
+        assert not entry.fresh
+        assert cache.stats["stale_hits"] == 1
+
+        # Another worker gets the stale entry from Redis too
+        other = _cache(redis)
+        entry = await other.get(key)
+        assert entry.value == {"records": ["last good"]} and not entry.fresh
+
+    asyncio.run(run())
+
+
+class RegistryClient:
+    """CKAN client stand-in whose registry knows no company."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def datastore_search(self, resource_id: str, **params) -> dict:
+        self.calls += 1
+        return {"records": [], "total": 0}
+
+
+def test_negative_cache(clock, redis, monkeypatch):
+    async def run():
+        async def round_trip(*args, **kwargs):
+            raise AssertionError("negative lookups must not wait on Redis")
+
+        monkeypatch.setattr(redis, "ttl", round_trip)
+        monkeypatch.setattr(redis, "get", round_trip)
+        cache = _cache(redis)
+        assert not await cache.is_missing("company", "40000000001")
+        await cache.mark_missing("company", "40000000001")
+        assert await cache.is_missing("company", "40000000001")
+        assert not await cache.is_missing("company", "40000000002")
+        assert cache.stats["negative_hits"] == 1
+
+        # Forgotten once the negative TTL has passed
+        clock.now += NEGATIVE_TTL + 1
+        assert not await cache.is_missing("company", "40000000001")
+
+    asyncio.run(run())
+
+
+def test_unknown_company_is_shared_through_the_cached_response(clock, redis):
+    async def run():
+        client = RegistryClient()
+        writer = CKANService(client=client, mode="live", cache=_cache(redis))
+        reader = CKANService(client=client, mode="live", cache=_cache(redis))
+        assert await writer.get_company_by_reg_number("40000000001") is None
+        assert client.calls == 1
+
+        # Another worker reads the empty registry response from Redis, then knows the number locally
+        assert await reader.get_company_by_reg_number("40000000001") is None
+        assert client.calls == 1
+        assert await reader.is_known_missing("40000000001")
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+from app.services.ckan_paging import iter_pages
+
+
+class Datastore:
+    """Stand-in for datastore_search over a fixed number of records."""
+
+    def __init__(self, total: int):
+        self.records = [{"_id": i + 1} for i in range(total)]
+        self.requests = []
+
+    async def search(self, resource_id, limit, offset, **params):
+        self.requests.append((offset, params))
+        return {"records": self.records[offset:offset + limit]}
+
+
+def _pages(datastore: Datastore, page_size: int, parallel: int = 1, **params):
+    async def run():
+        return [records async for records in iter_pages(datastore.search, "resource", page_size, parallel, **params)]
+
+    return asyncio.run(run())
+
+
+def test_short_page_ends_paging():
+    datastore = Datastore(25)
+    pages = _pages(datastore, 10)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [offset for offset, _ in datastore.requests] == [0, 10, 20]
+    assert all(params["sort"] == "_id" for _, params in datastore.requests)
+
+
+def test_empty_page_ends_paging_after_an_exact_multiple():
+    datastore = Datastore(20)
+    pages = _pages(datastore, 10, sort="date")
+
+    assert [len(page) for page in pages] == [10, 10]
+    assert [offset for offset, _ in datastore.requests] == [0, 10, 20]
+    assert datastore.requests[0][1]["sort"] == "date"
+
+
+def test_parallel_pages_stop_at_the_first_short_one():
+    datastore = Datastore(25)
+    pages = _pages(datastore, 10, parallel=2)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [page[0]["_id"] for page in pages] == [1, 11, 21]
+    # The second round's page past the end is requested but yields nothing
+    assert [offset for offset, _ in datastore.requests] == [0, 10, 20, 30]
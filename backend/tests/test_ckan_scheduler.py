@@ -0,0 +1,177 @@
+import asyncio
+import fakeredis.aioredis
+from app.services.ckan_scheduler import BACKGROUND, INTERACTIVE, OutboundScheduler, SharedRateBudget, ckan_priority
+
+
+class FakeClock:
+    """Stand-in for the system clock whose time only moves, and timers only fire, when advanced."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+        self.timers = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, callback):
+        self.timers.append((self.now + delay, callback))
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        self.call_later(seconds, lambda: future.done() or future.set_result(None))
+        await future
+
+    async def advance(self, seconds: float):
+        """Move time on, fire the timers that came due and let the woken tasks run."""
+        self.now += seconds
+        due = sorted((timer for timer in self.timers if timer[0] <= self.now), key=lambda timer: timer[0])
+        self.timers = [timer for timer in self.timers if timer[0] > self.now]
+        for _, callback in due:
+            callback()
+        await _settle()
+
+
+class NoBudget(SharedRateBudget):
+    """Shared budget that never limits, for tests of one process's scheduler."""
+
+    def __init__(self):
+        super().__init__(rate=0)
+
+
+async def _settle():
+    # Enough loop turns for the woken tasks' fake Redis round trips to finish
+    for _ in range(100):
+        await asyncio.sleep(0)
+
+
+def _scheduler(clock: FakeClock, **kwargs) -> OutboundScheduler:
+    return OutboundScheduler(clock=clock, shared_budget=NoBudget(), **kwargs)
+
+
+async def _call(scheduler: OutboundScheduler, priority: int, admitted: list, release: bool = True):
+    with ckan_priority(priority):
+        await scheduler.acquire()
+    admitted.append(priority)
+    if release:
+        scheduler.release()
+
+
+def test_token_bucket_admits_a_burst_then_the_refill_rate():
+    async def run():
+        clock = FakeClock()
+        scheduler = _scheduler(clock, rate=8, burst=2, initial_limit=10)
+        admitted = []
+        tasks = [asyncio.create_task(_call(scheduler, INTERACTIVE, admitted)) for _ in range(4)]
+        await _settle()
+        assert len(admitted) == 2 and scheduler.tokens == 0
+
+        # One token every 0.125 seconds
+        await clock.advance(0.0625)
+        assert len(admitted) == 2
+        await clock.advance(0.0625)
+        assert len(admitted) == 3
+        await clock.advance(0.125)
+        assert len(admitted) == 4
+        await asyncio.gather(*tasks)
+        assert scheduler.stats["admitted"] == 4 and scheduler.stats["queued"] == 2
+
+    asyncio.run(run())
+
+
+def test_aimd_limit_grows_on_success_and_halves_once_per_second_on_overload():
+    async def run():
+        clock = FakeClock()
+        scheduler = _scheduler(clock, rate=1000, burst=100, initial_limit=8, max_limit=64)
+        admitted = []
+        for _ in range(8):
+            await _call(scheduler, INTERACTIVE, admitted)
+        assert 8.9 < scheduler.limit < 9.0
+
+        await _call(scheduler, INTERACTIVE, admitted, release=False)
+        scheduler.release(overloaded=True)
+        halved = scheduler.limit
+        assert 4.4 < halved < 4.5
+        # More errors of the same burst do not halve it again
+        await _call(scheduler, INTERACTIVE, admitted, release=False)
+        scheduler.release(overloaded=True)
+        assert scheduler.limit == halved
+        await clock.advance(1)
+        await _call(scheduler, INTERACTIVE, admitted, release=False)
+        scheduler.release(overloaded=True)
+        assert scheduler.limit == halved / 2
+        assert scheduler.stats["backoffs"] == 2
+
+    asyncio.run(run())
+
+
+def test_waiting_interactive_calls_go_before_background_ones():
+    async def run():
+        clock = FakeClock()
+        scheduler = _scheduler(clock, rate=8, burst=1, initial_limit=10)
+        admitted = []
+        first = asyncio.create_task(_call(scheduler, BACKGROUND, admitted))
+        await _settle()
+        background = asyncio.create_task(_call(scheduler, BACKGROUND, admitted))
+        await _settle()
+        interactive = asyncio.create_task(_call(scheduler, INTERACTIVE, admitted))
+        await _settle()
+        assert admitted == [BACKGROUND]
+
+        await clock.advance(0.125)
+        assert admitted == [BACKGROUND, INTERACTIVE]
+        await clock.advance(0.125)
+        assert admitted == [BACKGROUND, INTERACTIVE, BACKGROUND]
+        await asyncio.gather(first, background, interactive)
+
+    asyncio.run(run())
+
+
+def test_background_calls_leave_the_interactive_share_of_the_concurrency_limit():
+    async def run():
+        clock = FakeClock()
+        scheduler = _scheduler(clock, rate=1000, burst=100, initial_limit=4, interactive_reserve=0.25)
+        admitted = []
+        for _ in range(4):
+            asyncio.create_task(_call(scheduler, BACKGROUND, admitted, release=False))
+        await _settle()
+        # 3 of 4 slots for background calls; the last one stays free for interactive calls
+        assert admitted.count(BACKGROUND) == 3 and scheduler.in_flight == 3
+        await _call(scheduler, INTERACTIVE, admitted, release=False)
+        assert scheduler.in_flight == 4
+
+    asyncio.run(run())
+
+
+def test_shared_budget_keeps_the_interactive_reserve_across_processes():
+    async def run():
+        clock = FakeClock()
+        redis = fakeredis.aioredis.FakeRedis()
+        # One scheduler per process, sharing a budget of 8 calls a second
+        api = OutboundScheduler(
+            rate=100, clock=clock, shared_budget=SharedRateBudget(redis, rate=8, interactive_reserve=0.25, clock=clock)
+        )
+        job = OutboundScheduler(
+            rate=100, clock=clock, shared_budget=SharedRateBudget(redis, rate=8, interactive_reserve=0.25, clock=clock)
+        )
+        admitted = []
+
+        # The job asks first, but may only take 6 of the 8 calls of a second
+        background = [asyncio.create_task(_call(job, BACKGROUND, admitted)) for _ in range(8)]
+        await _settle()
+        interactive = [asyncio.create_task(_call(api, INTERACTIVE, admitted)) for _ in range(2)]
+        await _settle()
+        assert admitted.count(BACKGROUND) == 6
+        assert admitted.count(INTERACTIVE) == 2
+        assert job.get_stats()["shared_waits"] == 2
+        assert int(await redis.get(f"ckan-rate:{int(clock.now)}")) == 8
+
+        # The waiting background calls take their units of the next second
+        await clock.advance(1)
+        assert admitted.count(BACKGROUND) == 8
+        assert int(await redis.get(f"ckan-rate:{int(clock.now)}")) == 2
+        await asyncio.gather(*background, *interactive)
+
+    asyncio.run(run())
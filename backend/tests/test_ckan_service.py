@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from app.services.ckan_cache import CKANCache
+from app.services.ckan_client import CKANError
+from app.services.ckan_service import CKANService
+
+RESOURCE = "capital-resource"
+ROW = {"_id": 1, "legal_entity_registration_number": "40003000000", "equity_capital": 2800, "currency": "EUR"}
+
+
+class ProjectingClient:
+    """CKAN client stand-in that rejects projections onto columns its resource lacks."""
+
+    def __init__(self, status_code: int = 409):
+        self.status_code = status_code
+        self.calls = []
+
+    async def datastore_search(self, resource_id: str, **params) -> dict:
+        self.calls.append(params.get("fields"))
+        fields = params.get("fields")
+        if fields:
+            missing = [field for field in fields if field not in ROW]
+            if missing:
+                raise CKANError(f"field(s) not found: {', '.join(missing)}", status_code=self.status_code)
+            return {"records": [{field: ROW[field] for field in fields}]}
+        return {"records": [dict(ROW)]}
+
+
+def _service(client) -> CKANService:
+    return CKANService(client=client, mode="live", cache=CKANCache(max_entries=100))
+
+
+def test_rejected_projection_falls_back_to_whole_rows():
+    async def run():
+        client = ProjectingClient()
+        service = _service(client)
+        fields = ["equity_capital", "renamed_column"]
+        records = await service._datastore_search(RESOURCE, filters={"id": 1}, fields=fields)
+        assert records["records"] == [ROW]
+        assert client.calls == [fields, None]
+
+        # The resource is remembered, so later projected queries go straight to whole rows
+        records = await service._datastore_search(RESOURCE, filters={"id": 2}, fields=["equity_capital"])
+        assert records["records"] == [ROW]
+        assert client.calls[2:] == [None]
+
+    asyncio.run(run())
+
+
+def test_upstream_failure_is_not_mistaken_for_a_rejected_projection():
+    async def run():
+        client = ProjectingClient(status_code=503)
+        service = _service(client)
+        with pytest.raises(CKANError):
+            await service._datastore_search(RESOURCE, fields=["renamed_column"])
+        assert client.calls == [["renamed_column"]]
+        assert RESOURCE not in service._unprojected_resources
+
+    asyncio.run(run())
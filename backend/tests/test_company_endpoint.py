@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+from starlette.requests import Request
+from app.api.endpoints import company as company_module
+
+REG_NUMBER = "40003000000"
+
+
+class Registry:
+    """Stand-in for the CKAN service whose named sections never finish."""
+
+    def __init__(self, hanging=()):
+        self.hanging = set(hanging)
+        self.cancelled = []
+
+    async def _section(self, name, records):
+        if name in self.hanging:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled.append(name)
+                raise
+        return records
+
+    async def is_known_missing(self, reg_number):
+        return False
+
+    async def get_company_by_reg_number(self, reg_number, fields=None):
+        return await self._section("registry", {"regcode": reg_number, "name": "SIA Tests", "type": "SIA"})
+
+    async def get_company_capital_data(self, reg_number, fields=None):
+        return await self._section("capital", [{"equity_capital": 2800, "currency": "EUR"}])
+
+    async def get_company_beneficiaries(self, reg_number, fields=None):
+        return await self._section("beneficiaries", [{"forename": "Anna"}])
+
+    async def get_company_members(self, reg_number, fields=None):
+        return await self._section("members", [{"name": "Anna", "number_of_shares": 100}])
+
+    async def get_company_business_data(self, reg_number, fields=None):
+        return await self._section("business", [])
+
+    async def get_company_liquidation_data(self, reg_number, fields=None):
+        return await self._section("liquidation", [])
+
+    async def get_company_officers(self, reg_number, fields=None):
+        return await self._section("officers", [{"name": "Anna", "position": "BOARD_MEMBER"}])
+
+    async def get_company_stockholders(self, reg_number, fields=None):
+        return await self._section("stockholders", [])
+
+    async def get_taxpayer_ratings(self, reg_number, fields=None):
+        return await self._section("taxpayer_ratings", [])
+
+
+class Supabase:
+    def get_company_data(self, reg_number):
+        return None
+
+
+class Suggest:
+    async def record_view(self, reg_number):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def deadline(monkeypatch):
+    monkeypatch.setattr(company_module.settings, "COMPANY_DETAILS_TIMEOUT", 0.05)
+
+
+def _details(registry: Registry):
+    request = Request({"type": "http", "method": "GET", "path": f"/company/{REG_NUMBER}", "headers": []})
+    return company_module.get_company_details(
+        request,
+        Response(),
+        BackgroundTasks(),
+        reg_number=REG_NUMBER,
+        ckan_service=registry,
+        supabase_service=Supabase(),
+        suggest_service=Suggest(),
+    )
+
+
+def test_sections_that_miss_the_deadline_are_left_out():
+    registry = Registry(hanging={"capital", "officers"})
+    company = asyncio.run(_details(registry))
+
+    assert company.registration_number == REG_NUMBER and company.name == "SIA Tests"
+    # The slow sections come back empty, the rest in full
+    assert company.capital_data == [] and company.officers_data == []
+    assert company.beneficiary_data == [{"forename": "Anna"}]
+    assert company.members_data == [{"name": "Anna", "number_of_shares": "100"}]
+    assert sorted(registry.cancelled) == ["capital", "officers"]
+
+
+def test_registry_missing_the_deadline_is_a_gateway_timeout():
+    registry = Registry(hanging={"registry"})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_details(registry))
+
+    assert error.value.status_code == 504
+    assert registry.cancelled == ["registry"]
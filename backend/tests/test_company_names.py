@@ -0,0 +1,24 @@
+from app.services.company_names import bounded_edit_distance, fold_diacritics, max_typos, name_words, normalize_name
+
+
+def test_names_fold_diacritics_and_drop_legal_forms():
+    assert fold_diacritics("Ķekavas Būvnieks") == "Kekavas Buvnieks"
+    assert normalize_name('SIA "Latvijas Gāze"') == "latvijas gaze"
+    assert normalize_name('AS "LATVIJAS GAZE"') == "latvijas gaze"
+    # A query of just a legal form still matches
+    assert name_words("SIA") == ["sia"]
+
+
+def test_bounded_edit_distance():
+    assert bounded_edit_distance("gaze", "gaze", 1) == 0
+    assert bounded_edit_distance("gaze", "gazes", 1) == 1
+    assert bounded_edit_distance("gaze", "gaxe", 1) == 1
+    # Swapping adjacent letters is one edit
+    assert bounded_edit_distance("energo", "enrego", 1) == 1
+    # Past the bound the answer is just bound + 1
+    assert bounded_edit_distance("energo", "serviss", 2) == 3
+    assert bounded_edit_distance("gaze", "gazesx", 1) == 2
+
+
+def test_longer_words_may_have_more_typos():
+    assert [max_typos(word) for word in ("sia", "gaze", "latvijas", "buvniecibas")] == [0, 1, 2, 2]
@@ -0,0 +1,85 @@
+import random
+from app.db.statement_store import FinancialStatementStore
+from app.models.financial import BalanceSheet, IncomeStatement
+from app.services.financial_analysis import FinancialAnalysisService
+from app.services.financial_batch import BALANCE_SHEET_COLUMNS, INCOME_STATEMENT_COLUMNS, BatchHealthScorer
+
+
+def _amount(rng: random.Random, scale: float):
+    """A statement amount, sometimes missing, zero or negative."""
+    roll = rng.random()
+    if roll < 0.08:
+        return None
+    if roll < 0.14:
+        return 0.0
+    return round(rng.uniform(-0.2, 1.0) * scale, 2)
+
+
+def _company(rng: random.Random) -> tuple:
+    """Statements of one company over a random, possibly gapped set of years."""
+    scale = 10 ** rng.randint(3, 7)
+    years = sorted(rng.sample(range(2015, 2024), rng.randint(1, 6)), reverse=True)
+    balance_sheets, income_statements = [], []
+    for year in years:
+        if rng.random() < 0.9:
+            balance_sheets.append(BalanceSheet(year=year, **{name: _amount(rng, scale) for name in BALANCE_SHEET_COLUMNS}))
+        if rng.random() < 0.9:
+            income_statements.append(IncomeStatement(year=year, **{name: _amount(rng, scale) for name in INCOME_STATEMENT_COLUMNS}))
+    return balance_sheets or [BalanceSheet(year=years[0])], income_statements or [IncomeStatement(year=years[0])]
+
+
+def test_batch_scores_match_the_scalar_service():
+    rng = random.Random(7)
+    companies = [_company(rng) for _ in range(400)]
+    service = FinancialAnalysisService()
+    scorer = BatchHealthScorer(service)
+
+    balance, income, years_analyzed, trends = scorer.columns_from_statements(companies)
+    batch = scorer.score(balance, income, years_analyzed, trends)
+
+    for index, (balance_sheets, income_statements) in enumerate(companies):
+        regcode = str(40000000000 + index)
+        expected = service.calculate_health_score(regcode, balance_sheets, income_statements)
+        actual = batch.assessment(index, regcode, service)
+        assert actual.model_dump(exclude={"assessment_date"}) == expected.model_dump(exclude={"assessment_date"}), regcode
+
+
+def test_store_batch_scores_match_the_scalar_service(tmp_path):
+    rng = random.Random(11)
+    companies = [_company(rng) for _ in range(150)]
+    store = FinancialStatementStore(str(tmp_path / "statements"))
+    builder = store.start_build()
+    reports, sections = [], {"balance_sheets": [], "income_statements": []}
+    for number, (balance_sheets, income_statements) in enumerate(companies):
+        regcode = str(40000000000 + number)
+        for year in {statement.year for statement in balance_sheets + income_statements}:
+            report_id = len(reports) + 1
+            reports.append({
+                "id": report_id, "legal_entity_registration_number": regcode, "year": year,
+                "currency": "EUR", "rounded_to_nearest": "ONES",
+            })
+            for section, statements in (("balance_sheets", balance_sheets), ("income_statements", income_statements)):
+                sections[section].extend(
+                    {**statement.model_dump(), "statement_id": report_id} for statement in statements if statement.year == year
+                )
+    builder.add_statements(reports)
+    for section, rows in sections.items():
+        builder.add_section(section, rows)
+    builder.finish()
+
+    version = store.current()
+    service = FinancialAnalysisService()
+    scorer = BatchHealthScorer(service)
+    regcodes, balance, income, years_analyzed, trends = scorer.columns_from_store(version, 0, version.rows)
+    batch = scorer.score(balance, income, years_analyzed, trends)
+
+    assert len(batch) == len(companies)
+    for index, regcode in enumerate(reg.decode("utf-8") for reg in regcodes.tolist()):
+        data = store.get_multi_year_financial_data(regcode, 5)
+        expected = service.calculate_health_score(
+            regcode,
+            [BalanceSheet(**row) for row in data["balance_sheets"]],
+            [IncomeStatement(**row) for row in data["income_statements"]],
+        )
+        actual = batch.assessment(index, regcode, service)
+        assert actual.model_dump(exclude={"assessment_date"}) == expected.model_dump(exclude={"assessment_date"}), regcode
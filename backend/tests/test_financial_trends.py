@@ -0,0 +1,40 @@
+import math
+import pytest
+from app.services.financial_trends import TrendEngine
+
+
+def _statements(rows: dict) -> tuple:
+    """Balance sheets and income statements of one company from {year: (revenue, profit, assets)}."""
+    balance_sheets = [{"year": year, "total_assets": assets} for year, (_, _, assets) in rows.items()]
+    income_statements = [
+        {"year": year, "net_turnover": revenue, "net_income": profit} for year, (revenue, profit, _) in rows.items()
+    ]
+    return balance_sheets, income_statements
+
+
+def test_growth_is_only_computed_between_consecutive_years():
+    gapped = _statements({2019: (100.0, 10.0, 500.0), 2020: (110.0, 12.0, 550.0), 2022: (150.0, 15.0, 600.0)})
+    consecutive = _statements({2021: (200.0, 20.0, 1000.0), 2022: (250.0, 10.0, 1000.0)})
+    trends = TrendEngine().from_companies([gapped, consecutive])
+
+    # 2020 -> 2022 is two years apart, so it has no year-over-year growth
+    assert trends.yoy["revenue"][0, 0] == pytest.approx(0.1)
+    assert math.isnan(trends.yoy["revenue"][0, 1])
+    assert trends.company_growth_rates(0) == {}
+    assert not trends.has_growth[0]
+    # The compound growth still spans the whole three years
+    assert trends.cagr["revenue"][0] == pytest.approx(1.5 ** (1 / 3) - 1)
+
+    assert trends.company_growth_rates(1) == pytest.approx(
+        {"revenue_growth": 0.25, "profit_growth": -0.5, "assets_growth": 0.0}
+    )
+
+
+def test_company_trends_leave_the_gap_year_without_growth():
+    trends = TrendEngine().from_statements(*_statements({2020: (100.0, 10.0, 500.0), 2022: (120.0, 12.0, 520.0)}))
+    company = trends.company_trends()
+
+    assert company["years_analyzed"] == [2020, 2022]
+    assert [point["yoy_growth"] for point in company["revenue_trend"]] == [None, None]
+    assert "revenue_growth" not in company["growth_rates"]
+    assert company["growth_rates"]["revenue_cagr"] == pytest.approx(1.2 ** 0.5 - 1)
@@ -0,0 +1,55 @@
+import sqlite3
+from app.db.health_scores import HealthScoreStore, assessment_row
+from app.models.financial import FinancialHealthAssessment
+
+REG_NUMBER = "40003000000"
+
+
+def _assessment() -> FinancialHealthAssessment:
+    return FinancialHealthAssessment(
+        registration_number=REG_NUMBER,
+        health_score=72.5,
+        health_grade="B+",
+        liquidity_score=80.0,
+        risk_level="LOW",
+        strengths=["Strong liquidity position"],
+        trend_direction="IMPROVING",
+        years_analyzed=3,
+    )
+
+
+def test_scores_of_other_scoring_code_are_not_served(tmp_path):
+    store = HealthScoreStore(str(tmp_path / "health_scores.sqlite3"))
+    store.upsert([assessment_row(_assessment(), "inputs")])
+    store.set_state({"scoring_version": "v1"})
+
+    stored = store.get(REG_NUMBER, "v1")
+    assert stored.model_dump(exclude={"assessment_date"}) == _assessment().model_dump(exclude={"assessment_date"})
+    assert store.get("40003000001", "v1") is None
+    # Once the scoring code changes, the table is stale until the next refresh
+    assert store.get(REG_NUMBER, "v2") is None
+
+
+def test_table_of_an_older_model_is_recreated(tmp_path):
+    path = str(tmp_path / "health_scores.sqlite3")
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE health_scores (registration_number TEXT PRIMARY KEY, health_score, inputs_hash TEXT NOT NULL) WITHOUT ROWID;
+        CREATE TABLE health_score_state (key TEXT PRIMARY KEY, value TEXT);
+        INSERT INTO health_scores VALUES ('40003000000', 50.0, 'old');
+        INSERT INTO health_score_state VALUES ('scoring_version', 'v1');
+    """)
+    old.close()
+
+    store = HealthScoreStore(path)
+    # Read as stale instead of failing on the missing columns
+    assert store.get(REG_NUMBER, "v1") is None
+    assert store.prepare("v1")
+    assert store.get_hashes() == {} and store.get_state("scoring_version") is None
+
+    store.upsert([assessment_row(_assessment(), "inputs")])
+    store.set_state({"scoring_version": "v1"})
+    assert store.get(REG_NUMBER, "v1").health_score == 72.5
+    assert not store.prepare("v1")
+    # New scoring code starts over as well
+    assert store.prepare("v2") and store.get_hashes() == {}
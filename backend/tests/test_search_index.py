@@ -0,0 +1,135 @@
+import asyncio
+import time
+import pytest
+from app.core.config import settings
+from app.db.search_index import CompanySearchIndex, RankedResults
+from app.services.ckan_service import CKANService
+
+
+def _company(number: int, name: str) -> dict:
+    return {"regcode": str(40000000000 + number), "name": name, "address": "Rīga, Brīvības iela 1"}
+
+
+def _index(tmp_path, companies: int = 3000) -> CompanySearchIndex:
+    index = CompanySearchIndex(str(tmp_path / "search.sqlite3"))
+    records = [_company(number, f'SIA "Energo Serviss {number}" Latvijas Būvniecības Grupa') for number in range(companies)]
+    # Registered last, so it has the highest rowid
+    records.append(_company(companies, 'AS "Energo"'))
+    index.rebuild([records])
+    index.set_refreshed_at(time.time())
+    return index
+
+
+def test_best_match_with_high_rowid_ranks_first(tmp_path):
+    index = _index(tmp_path)
+    result = index.search("energo", limit=10)
+    assert result["total"] == 3001
+    assert result["records"][0]["name"] == 'AS "Energo"'
+
+
+
+def test_pages_slice_one_globally_ranked_list(tmp_path):
+    index = _index(tmp_path)
+    whole = [record["regcode"] for record in index.search("energo", limit=3001)["records"]]
+    paged = []
+    for offset in range(0, 3001, 500):
+        paged.extend(record["regcode"] for record in index.search("energo", limit=500, offset=offset)["records"])
+    assert paged == whole
+    assert whole[0] == "40000003000"
+
+
+def test_deeper_pages_continue_the_ranking_after_the_top_n(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_RANK_TOP_N", 64)
+    index = _index(tmp_path)
+    whole = [record["regcode"] for record in index.search("energo", limit=3001)["records"]]
+
+    # A fresh instance ranks only the top 64 first, then continues by (rank, rowid) keyset
+    paged_index = CompanySearchIndex(index.path)
+    paged = []
+    for offset in range(0, 3001, 50):
+        result = paged_index.search("energo", limit=50, offset=offset)
+        assert result["total"] == 3001
+        paged.extend(record["regcode"] for record in result["records"])
+    assert paged == whole
+
+
+def test_result_set_cache_is_bounded_by_bytes(tmp_path):
+    index = _index(tmp_path)
+    index._result_sets.max_bytes = 3 * (RankedResults.OVERHEAD + 8 * 100)
+    for number in range(20):
+        index.search(f"serviss {number}", limit=100)
+    assert index._result_sets.bytes <= index._result_sets.max_bytes
+    assert 0 < len(index._result_sets) <= 3
+
+
+def test_cursor_pages_follow_the_ranked_list(tmp_path):
+    index = _index(tmp_path)
+    service = CKANService(search_index=index)
+    whole = [record["regcode"] for record in index.search("energo", limit=3001)["records"]]
+
+    async def follow() -> list:
+        regcodes, cursor = [], None
+        while True:
+            result = await service.search_companies("energo", limit=700, cursor=cursor)
+            regcodes.extend(record["regcode"] for record in result["records"])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                return regcodes
+
+    assert asyncio.run(follow()) == whole
+
+
+def test_facet_bitsets_are_stored_with_the_index(tmp_path):
+    index = _index(tmp_path, companies=300)
+    fresh = CompanySearchIndex(index.path)
+    stored = fresh.connection.execute("SELECT value FROM index_state WHERE key = 'facets_stored'").fetchone()
+    assert stored is not None
+    assert fresh.search("", facets=True)["facets"]["status"] == [{"value": "active", "label": None, "count": 301}]
+
+    # Until the bitsets are stored again, changed companies are counted from their facet values
+    index.upsert([{**_company(1000, 'SIA "Slēgta"'), "closed": "2024-01-01"}])
+    fresh = CompanySearchIndex(index.path)
+    counts = {item["value"]: item["count"] for item in fresh.search("", facets=True)["facets"]["status"]}
+    assert counts == {"active": 301, "closed": 1}
+    index.store_facets()
+    assert CompanySearchIndex(index.path).facet_index().bitmaps == fresh.facet_index().bitmaps
+
+
+def test_text_facets_count_the_best_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_FACET_CANDIDATES", 100)
+    index = _index(tmp_path, companies=300)
+    result = index.search("energo", limit=10, facets=True)
+    assert result["total"] == 301 and result["facets_partial"]
+    assert result["facets"]["status"][0]["count"] == 100
+    assert not index.search("energo serviss 12", facets=True)["facets_partial"]
+
+
+def test_search_folds_diacritics_and_corrects_typos(tmp_path):
+    index = _index(tmp_path, companies=300)
+    assert index.search("Būvniecības", limit=1)["total"] == 300
+    assert index.search("buvniecibas", limit=1)["total"] == 300
+
+    # A misspelled word only matches when fuzzy search corrects it
+    assert index.corrections("enrego") == ["energo"]
+    assert index.search("enrego", limit=1)["total"] == 0
+    assert index.search("enrego", limit=1, fuzzy=True)["total"] == 301
+    assert index.search("latvjias grupa", limit=1, fuzzy=True)["total"] == 300
+    # Words with a prefix match are taken as typed
+    assert index.search("energ", limit=1, fuzzy=True)["total"] == 301
+
+
+def test_cursor_is_rejected_by_another_search(tmp_path):
+    index = _index(tmp_path, companies=300)
+    service = CKANService(search_index=index)
+
+    async def run():
+        first = await service.search_companies("energo", limit=10)
+        cursor = first["next_cursor"]
+        assert (await service.search_companies("energo", limit=10, cursor=cursor))["records"]
+        for query, fuzzy, filters in (("serviss", False, None), ("energo", True, None), ("energo", False, {"status": ["closed"]})):
+            with pytest.raises(ValueError):
+                await service.search_companies(query, limit=10, fuzzy=fuzzy, filters=filters, cursor=cursor)
+        with pytest.raises(ValueError):
+            await service.search_companies("energo", limit=10, cursor="not-a-cursor")
+
+    asyncio.run(run())
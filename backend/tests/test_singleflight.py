@@ -0,0 +1,78 @@
+import asyncio
+from app.services.singleflight import SingleFlight
+
+
+class Upstream:
+    """Stand-in for an upstream call that only answers when released."""
+
+    def __init__(self):
+        self.calls = 0
+        self.released = None
+
+    async def fetch(self):
+        self.calls += 1
+        await self.released.wait()
+        return {"records": [{"regcode": "40003000000"}]}
+
+
+def test_concurrent_callers_share_one_call_and_get_their_own_copy():
+    async def run():
+        flight = SingleFlight()
+        upstream = Upstream()
+        upstream.released = asyncio.Event()
+        callers = [asyncio.create_task(flight.do("key", upstream.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 1
+        upstream.released.set()
+        results = await asyncio.gather(*callers)
+
+        assert upstream.calls == 1
+        assert flight.stats == {"upstream_calls": 1, "coalesced_calls": 4}
+        assert all(result == results[0] for result in results)
+        # Changing one caller's result leaves the others alone
+        results[0]["records"][0]["regcode"] = "changed"
+        assert results[1]["records"][0]["regcode"] == "40003000000"
+        assert flight.in_flight() == 0
+
+        # A call after the shared one finished goes upstream again
+        await flight.do("key", upstream.fetch)
+        assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def run():
+        flight = SingleFlight()
+        upstream = Upstream()
+        upstream.released = asyncio.Event()
+        first = asyncio.create_task(flight.do("key", upstream.fetch))
+        second = asyncio.create_task(flight.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.released.set()
+
+        assert (await second)["records"]
+        assert first.cancelled() and upstream.calls == 1
+
+    asyncio.run(run())
+
+
+def test_failure_reaches_every_caller():
+    async def run():
+        flight = SingleFlight()
+        released = asyncio.Event()
+
+        async def fail():
+            await released.wait()
+            raise ConnectionError("upstream down")
+
+        callers = [asyncio.create_task(flight.do("key", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        released.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert flight.in_flight() == 0
+
+    asyncio.run(run())
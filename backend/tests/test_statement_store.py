@@ -0,0 +1,27 @@
+import pytest
+from app.db.statement_store import LVL_PER_EUR, normalize_statement_record
+from app.models.financial import BalanceSheet
+
+LVL_THOUSANDS = {"id": 7, "year": 2012, "currency": "LVL", "rounded_to_nearest": "THOUSANDS"}
+
+
+def test_normalize_scales_only_amount_columns():
+    row = {
+        "_id": 3, "statement_id": 7, "file_id": 11, "total_assets": "12",
+        "equity": 5, "future_housing_repairs_payments": "12",
+    }
+    normalized = normalize_statement_record(row, LVL_THOUSANDS)
+
+    assert normalized["total_assets"] == pytest.approx(12 * 1e3 / LVL_PER_EUR)
+    assert normalized["equity"] == pytest.approx(5 * 1e3 / LVL_PER_EUR)
+    assert normalized["future_housing_repairs_payments"] == "12"
+    assert (normalized["_id"], normalized["statement_id"], normalized["file_id"]) == (3, 7, 11)
+    assert (normalized["year"], normalized["currency"]) == (2012, "EUR")
+    BalanceSheet(**normalized)
+
+
+def test_normalize_leaves_euro_units_unchanged():
+    row = {"statement_id": 1, "total_assets": 100.0}
+    normalized = normalize_statement_record(row, {"year": 2023, "currency": "EUR", "rounded_to_nearest": "ONES"})
+    assert normalized["total_assets"] == 100.0
+    assert normalized["currency"] == "EUR"
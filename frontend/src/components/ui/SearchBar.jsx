@@ -1,38 +1,83 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
 import { 
   Input, 
   InputGroup, 
   InputRightElement, 
   IconButton, 
-  Box 
+  Box,
+  List,
+  ListItem,
+  Text
 } from '@chakra-ui/react';
+import { suggestCompanies } from '../../services/companyService';
+
+// Wait this long after the last keystroke before asking for suggestions
+const SUGGEST_DELAY_MS = 150;
 
 /**
  * SearchBar component for searching companies
  * 
  * @param {object} props - Component props
  * @param {function} props.onSearch - Function called when search is triggered
+ * @param {function} props.onSelect - Function called with a registration number when a suggestion is picked
  * @returns {JSX.Element} SearchBar component
  */
-const SearchBar = ({ onSearch }) => {
+const SearchBar = ({ onSearch, onSelect }) => {
   const [query, setQuery] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    if (!onSelect || query.trim().length < 2) {
+      setSuggestions([]);
+      return undefined;
+    }
+
+    // Ignore answers for anything but the latest input
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await suggestCompanies(query.trim());
+        if (!cancelled) {
+          setSuggestions(results);
+        }
+      } catch (error) {
+        if (!cancelled) {
+          setSuggestions([]);
+        }
+      }
+    }, SUGGEST_DELAY_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query, onSelect]);
 
   const handleSearch = (e) => {
     e.preventDefault();
+    setSuggestions([]);
     if (query.trim()) {
       onSearch(query);
     }
   };
 
+  const handleSelect = (suggestion) => {
+    setSuggestions([]);
+    setQuery(suggestion.name);
+    onSelect(suggestion.registration_number);
+  };
+
   return (
-    <Box as="form" onSubmit={handleSearch} w="100%">
+    <Box as="form" onSubmit={handleSearch} w="100%" position="relative">
       <InputGroup size="lg">
         <Input
           placeholder="Search for companies by name, registration number..."
           value={query}
           onChange={(e) => setQuery(e.target.value)}
+          onBlur={() => setTimeout(() => setSuggestions([]), 150)}
           borderRadius="md"
           boxShadow="sm"
+          autoComplete="off"
         />
         <InputRightElement>
           <IconButton
@@ -45,8 +90,37 @@ const SearchBar = ({ onSearch }) => {
           />
         </InputRightElement>
       </InputGroup>
+      {suggestions.length > 0 && (
+        <List
+          position="absolute"
+          top="100%"
+          left={0}
+          right={0}
+          mt={1}
+          bg="white"
+          borderWidth="1px"
+          borderRadius="md"
+          boxShadow="md"
+          zIndex={10}
+          textAlign="left"
+        >
+          {suggestions.map((suggestion) => (
+            <ListItem
+              key={suggestion.registration_number}
+              px={4}
+              py={2}
+              cursor="pointer"
+              _hover={{ bg: 'gray.100' }}
+              onMouseDown={() => handleSelect(suggestion)}
+            >
+              <Text fontWeight="medium">{suggestion.name}</Text>
+              <Text fontSize="sm" color="gray.500">{suggestion.registration_number}</Text>
+            </ListItem>
+          ))}
+        </List>
+      )}
     </Box>
   );
 };
 
-export default SearchBar; 
\ No newline at end of file
+export default SearchBar;
@@ -66,7 +66,7 @@ const HomePage = () => {
         <Box mb={6}>
           <HStack spacing={4} align="flex-start">
             <Box flex="1">
-              <SearchBar onSearch={handleSearch} />
+              <SearchBar onSearch={handleSearch} onSelect={handleCompanySelect} />
             </Box>
             <Button 
               rightIcon={<TimeIcon />} 
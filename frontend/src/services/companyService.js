@@ -21,6 +21,25 @@ export const searchCompanies = async (query, limit = 10, offset = 0) => {
   }
 };
 
+/**
+ * Get typeahead suggestions for a partial company name or registration number
+ * 
+ * @param {string} query - What the user typed so far
+ * @param {number} limit - Maximum number of suggestions to return
+ * @returns {Promise} - The suggested companies
+ */
+export const suggestCompanies = async (query, limit = 8) => {
+  try {
+    const response = await api.get('/api/suggest', {
+      params: { q: query, limit }
+    });
+    return response.data.suggestions;
+  } catch (error) {
+    console.error('Error getting suggestions:', error);
+    throw error;
+  }
+};
+
 /**
  * Get company details by registration number
  * 